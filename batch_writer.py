@@ -0,0 +1,91 @@
+import atexit
+import queue
+import threading
+import time
+from logger import logger
+
+
+class BatchWriter:
+    """Write-behind queue that coalesces on-chain prophecy writes.
+
+    Submitted prophecies are collected for up to `window_seconds` after the
+    first one arrives, or until `max_size` are waiting, and then handed to
+    `flush` (NEARHandler.store_prophecies) as a single batch. Items that are
+    still queued remain readable through `pending` so a lookup right after a
+    store does not miss.
+    """
+
+    def __init__(self, flush, window_seconds, max_size):
+        self.flush = flush
+        self.window_seconds = window_seconds
+        self.max_size = max_size
+        self._queue = queue.Queue()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        atexit.register(self.close)
+
+    def submit(self, prophecy_id, prophecy, timestamp):
+        with self._pending_lock:
+            self._pending[prophecy_id] = {"text": prophecy, "timestamp": timestamp}
+        self._ensure_started()
+        self._queue.put((prophecy, timestamp))
+
+    def pending(self, prophecy_id):
+        """Return a queued but not yet flushed prophecy, or None"""
+        with self._pending_lock:
+            return self._pending.get(prophecy_id)
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="near-batch-writer", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the window closes or the batch is full"""
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window_seconds
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Shutdown requested: flush what we have and stop after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            self._flush(batch)
+
+    def _flush(self, batch):
+        try:
+            self.flush(batch)
+        except Exception as e:
+            logger.error(f"Error flushing batch of {len(batch)} prophecies: {str(e)}")
+        finally:
+            with self._pending_lock:
+                for _, timestamp in batch:
+                    self._pending.pop(f"prophecy_{timestamp}", None)
+
+    def close(self, timeout=30):
+        """Flush everything still queued and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
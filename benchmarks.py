@@ -0,0 +1,359 @@
+"""Benchmarks for the storage, web and bot hot paths.
+
+OpenAI, Discord and NEAR are replaced by in-process stubs, so runs are
+reproducible and need no credentials or network. Results are written as
+JSON so they can be compared across versions:
+
+    python benchmarks.py --sizes 1000,10000,100000 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from dedup import MinHashIndex
+from logger import logger
+from prophecy_store import ProphecyStore
+
+
+def _summarize(samples):
+    """Latency summary in milliseconds for a list of durations in seconds"""
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000
+    }
+
+
+def _timed(fn, iterations):
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    summary = _summarize(samples)
+    summary["ops_per_sec"] = iterations / sum(samples)
+    return summary
+
+
+# Vocabulary for varied benchmark prophecies, so search and dedup see realistic text
+WORDS = (
+    "liquidity", "validator", "mempool", "oracle", "bridge", "whale", "token", "gas", "ledger",
+    "consensus", "shard", "staking", "yield", "governance", "airdrop", "rollup", "eclipse",
+    "moon", "forge", "chain", "block", "dragon", "vault", "prophecy", "shadow", "dawn"
+)
+
+
+def _prophecy_text(rng, words=24):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _populate(store, size, rng):
+    """Fill the store with `size` prophecies, one minute apart, ending now"""
+    start = datetime.now() - timedelta(minutes=size)
+
+    def records():
+        for i in range(size):
+            yield f"prophecy_{i}", {
+                "text": f"Benchmark prophecy {i}: {_prophecy_text(rng)}",
+                "timestamp": i,
+                "created_at": (start + timedelta(minutes=i)).isoformat()
+            }
+
+    store.put_many(records())
+
+
+@contextmanager
+def _local_near_handler(store):
+    """A NEARHandler in local-storage mode whose archive is `store`"""
+    with mock.patch.dict(os.environ, {"FORCE_LOCAL_STORAGE": "true"}), \
+            mock.patch("near_handler.ProphecyStore", lambda: store):
+        from near_handler import NEARHandler
+        yield NEARHandler()
+
+
+def bench_storage(store, size, iterations, rng):
+    """store_prophecy and get_prophecy throughput against an archive of `size` records"""
+    with _local_near_handler(store) as handler:
+        reads = [rng.randrange(size) for _ in range(iterations)]
+        handler.prophecy_cache.clear()
+        cold = _timed(lambda i: handler.get_prophecy(reads[i]), iterations)
+        warm = _timed(lambda i: handler.get_prophecy(reads[i]), iterations)
+        misses = _timed(lambda i: handler.get_prophecy(size + 10 * iterations + i), iterations)
+        writes = _timed(lambda i: handler.store_prophecy(f"Fresh prophecy {i}", size + i), iterations)
+        return {
+            "store_prophecy": writes,
+            "get_prophecy_cold": cold,
+            "get_prophecy_warm": warm,
+            "get_prophecy_missing": misses
+        }
+
+
+def bench_web(store, iterations):
+    """Latency of the recent-prophecies view and of rendering / with and without a validator"""
+    import web_app
+
+    with mock.patch.object(web_app, "store", store), \
+            mock.patch.object(web_app, "recent_prophecies", web_app.RecentProphecies(store)):
+        client = web_app.app.test_client()
+        etag = client.get("/").headers["ETag"]
+
+        snapshot = _timed(lambda i: web_app.recent_prophecies.snapshot(), iterations)
+        # A write from another connection invalidates the view before each read
+        other = ProphecyStore(path=store.path, legacy_json_path=None)
+        invalidated = _timed(lambda i: (
+            other.set_meta("benchmark", i), web_app.recent_prophecies.snapshot()
+        ), iterations)
+        rendered = _timed(lambda i: client.get("/"), iterations)
+        revalidated = _timed(lambda i: client.get("/", headers={"If-None-Match": etag}), iterations)
+        api = _timed(lambda i: client.get("/api/prophecies?limit=20"), iterations)
+        other.close()
+        return {
+            "recent_prophecies": snapshot,
+            "recent_prophecies_after_write": invalidated,
+            "index_200": rendered,
+            "index_304": revalidated,
+            "api_prophecies": api
+        }
+
+
+def bench_dedup(store, size, iterations, rng):
+    """Loading the near-duplicate index from the archive, and checking candidates against it"""
+    index = MinHashIndex()
+    started = time.perf_counter()
+    index.add_many(store.iter_texts(indexed=True))
+    load_seconds = time.perf_counter() - started
+
+    # Half fresh prophecies, half archived ones with a word changed
+    candidates = []
+    for i in range(iterations):
+        if i % 2:
+            candidates.append(_prophecy_text(rng))
+        else:
+            words = store.get(f"prophecy_{rng.randrange(size)}")["text"].split()
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+            candidates.append(" ".join(words))
+    return {
+        "load_seconds": load_seconds,
+        "find_duplicate": _timed(lambda i: index.find_duplicate(candidates[i]), iterations)
+    }
+
+
+class StubCompletions:
+    """Chat completions that answer after `latency` seconds, streaming when asked"""
+
+    def __init__(self, latency, chunks=8):
+        self.latency = latency
+        self.chunks = chunks
+
+    async def create(self, stream=False, n=1, **kwargs):
+        await asyncio.sleep(self.latency)
+        text = "The oracle sees blocks of gold rising from the mempool "
+        if not stream:
+            return SimpleNamespace(choices=[
+                SimpleNamespace(message=SimpleNamespace(content=text)) for _ in range(n)
+            ])
+        return self._stream(text)
+
+    async def _stream(self, text):
+        step = max(1, len(text) // self.chunks)
+        for i in range(0, len(text), step):
+            await asyncio.sleep(self.latency / self.chunks)
+            delta = SimpleNamespace(content=text[i:i + step])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+class StubMessage:
+    def __init__(self, channel):
+        self.channel = channel
+
+    async def edit(self, embed=None):
+        self.channel.edits += 1
+
+
+class StubChannel:
+    """Discord channel that records when the first reply was sent"""
+
+    def __init__(self, channel_id):
+        self.id = channel_id
+        self.sends = 0
+        self.edits = 0
+        self.first_reply = None
+
+    async def send(self, content=None, embed=None):
+        self.sends += 1
+        if self.first_reply is None:
+            self.first_reply = time.perf_counter()
+        return StubMessage(self)
+
+
+async def _measure_loop_lag(stop, interval=0.01):
+    """Collect how late a periodic timer fires while the loop is under load"""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def _run_commands(bot, channel_id, concurrency, command):
+    async def one(user_id):
+        channel = StubChannel(channel_id)
+        message = SimpleNamespace(
+            author=SimpleNamespace(id=user_id), guild=None, channel=channel, content=command
+        )
+        started = time.perf_counter()
+        await bot.on_message(message)
+        finished = time.perf_counter()
+        return channel.first_reply - started if channel.first_reply else None, finished - started
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(stop))
+    results = await asyncio.gather(*(one(user_id) for user_id in range(concurrency)))
+    stop.set()
+    lags = await lag_task
+    return results, lags
+
+
+def bench_bot(store, concurrency, rounds, openai_latency):
+    """End-to-end on_message latency for concurrent !prophecy commands, plus event-loop lag"""
+    import discord_handler
+    import prophecy_generator
+    from config import DISCORD_CHANNEL_ID
+    from governor import Backend, RequestGovernor
+
+    # Measure the bot, not the production OpenAI quota
+    unthrottled = RequestGovernor([Backend("openai", rate=1e9, burst=1e9, concurrency=concurrency)])
+    with mock.patch.dict(os.environ, {"FORCE_LOCAL_STORAGE": "true"}), \
+            mock.patch("near_handler.ProphecyStore", lambda: store), \
+            mock.patch.object(prophecy_generator, "governor", unthrottled), \
+            mock.patch.object(prophecy_generator, "DEDUP_ENABLED", False):
+        results = {}
+        for streaming in (True, False):
+            with mock.patch.object(discord_handler, "STREAM_RESPONSES", streaming):
+                bot = discord_handler.ProphetBot()
+                bot.prophecy_generator.async_client = SimpleNamespace(
+                    chat=SimpleNamespace(completions=StubCompletions(openai_latency))
+                )
+
+                async def run():
+                    first, total, lags = [], [], []
+                    for _ in range(rounds):
+                        replies, round_lags = await _run_commands(
+                            bot, DISCORD_CHANNEL_ID, concurrency, "!prophecy defi"
+                        )
+                        first.extend(reply[0] for reply in replies if reply[0] is not None)
+                        total.extend(reply[1] for reply in replies)
+                        lags.extend(round_lags)
+                    return first, total, lags
+
+                first, total, lags = asyncio.run(run())
+                results["streaming" if streaming else "buffered"] = {
+                    "first_reply": _summarize(first),
+                    "end_to_end": _summarize(total),
+                    "event_loop_lag": _summarize(lags or [0.0])
+                }
+        return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(sizes, iterations=1000, concurrency=20, rounds=3, openai_latency=0.05, seed=0):
+    """Run every benchmark and return the results as a JSON-serializable dict"""
+    rng = random.Random(seed)
+    results = {
+        "meta": {
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": datetime.now().isoformat(),
+            "params": {
+                "sizes": sizes,
+                "iterations": iterations,
+                "concurrency": concurrency,
+                "rounds": rounds,
+                "openai_latency": openai_latency,
+                "seed": seed
+            }
+        },
+        "storage": {},
+        "web": {},
+        "dedup": {}
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            store = ProphecyStore(path=os.path.join(tmp, f"bench_{size}.db"), legacy_json_path=None)
+            started = time.perf_counter()
+            _populate(store, size, rng)
+            print(f"Populated {size} records in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+            results["storage"][str(size)] = bench_storage(store, size, iterations, rng)
+            results["web"][str(size)] = bench_web(store, min(iterations, 200))
+            results["dedup"][str(size)] = bench_dedup(store, size, iterations, rng)
+            store.close()
+
+        store = ProphecyStore(path=os.path.join(tmp, "bench_bot.db"), legacy_json_path=None)
+        results["bot"] = bench_bot(store, concurrency, rounds, openai_latency)
+        store.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark storage, web and bot hot paths")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma-separated archive sizes, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--iterations", type=int, default=1000, help="operations per storage measurement")
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent !prophecy commands")
+    parser.add_argument("--rounds", type=int, default=3, help="rounds of concurrent commands")
+    parser.add_argument("--openai-latency", type=float, default=0.05, help="stubbed completion latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # Per-operation info logs would dominate the measurements
+    logger.setLevel(logging.WARNING)
+    results = run(
+        [int(size) for size in args.sizes.split(",")],
+        iterations=args.iterations,
+        concurrency=args.concurrency,
+        rounds=args.rounds,
+        openai_latency=args.openai_latency,
+        seed=args.seed
+    )
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
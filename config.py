@@ -4,6 +4,10 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
+# Logging Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "text" or "json"
+
 # OpenAI Configuration
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
@@ -11,11 +15,101 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 DISCORD_CHANNEL_ID = 1345696402696704002  # Fixed channel ID for the prophecy channel
 
+
+def parse_channel_ids(value, default=DISCORD_CHANNEL_ID):
+    """Channel ids from a DISCORD_CHANNEL_IDS value: None for "all", `default` when unset or empty"""
+    value = (value or "").strip()
+    if value.lower() == "all":
+        return None
+    try:
+        channel_ids = {int(channel_id) for channel_id in value.split(",") if channel_id.strip()}
+    except ValueError:
+        raise ValueError(f'DISCORD_CHANNEL_IDS must be comma-separated channel ids or "all", got {value!r}')
+    return channel_ids or {default}
+
+
+# Channels the bot answers in: comma-separated ids, or "all"; defaults to DISCORD_CHANNEL_ID
+DISCORD_CHANNEL_IDS = parse_channel_ids(os.getenv("DISCORD_CHANNEL_IDS"))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+# Stream completions into a placeholder embed, editing it at most once per interval
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+STREAM_EDIT_INTERVAL_SECONDS = float(os.getenv("STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+# Port for the bot's Prometheus /metrics endpoint; 0 disables it. Sharded workers use
+# consecutive ports starting here
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", "0"))
+# Sharded mode: SHARD_COUNT gateway shards spread over SHARD_WORKERS processes under a
+# supervisor; 0 runs a single unsharded bot. Shards identify SHARD_IDENTIFY_INTERVAL_SECONDS
+# apart (Discord's identify rate limit) and a crashed worker restarts after an
+# exponential backoff starting at SHARD_RESTART_DELAY_SECONDS
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(os.cpu_count() or 1)))
+SHARD_IDENTIFY_INTERVAL_SECONDS = float(os.getenv("SHARD_IDENTIFY_INTERVAL_SECONDS", "5"))
+SHARD_RESTART_DELAY_SECONDS = float(os.getenv("SHARD_RESTART_DELAY_SECONDS", "5"))
+
 # NEAR Configuration
 NEAR_ACCOUNT = os.getenv("NEAR_ACCOUNT")
+NEAR_RPC_URL = os.getenv("NEAR_RPC_URL", "https://rpc.testnet.near.org")
+NEAR_RPC_POOL_SIZE = int(os.getenv("NEAR_RPC_POOL_SIZE", "4"))
+NEAR_RPC_TIMEOUT = float(os.getenv("NEAR_RPC_TIMEOUT", "10"))
+# Write-behind batching of on-chain writes; a window of 0 disables it
+NEAR_BATCH_WINDOW_SECONDS = float(os.getenv("NEAR_BATCH_WINDOW_SECONDS", "0"))
+NEAR_BATCH_MAX_SIZE = int(os.getenv("NEAR_BATCH_MAX_SIZE", "20"))
+# Background back-fill of locally stored prophecies to the chain: a pass every
+# NEAR_SYNC_INTERVAL_SECONDS (0 disables it) compares NEAR_SYNC_DIGEST_RANGE ids per
+# digest view call and uploads missing ones NEAR_SYNC_BATCH_SIZE at a time,
+# NEAR_SYNC_BATCH_DELAY_SECONDS apart
+NEAR_SYNC_INTERVAL_SECONDS = float(os.getenv("NEAR_SYNC_INTERVAL_SECONDS", "300"))
+NEAR_SYNC_DIGEST_RANGE = int(os.getenv("NEAR_SYNC_DIGEST_RANGE", "256"))
+NEAR_SYNC_BATCH_SIZE = int(os.getenv("NEAR_SYNC_BATCH_SIZE", "20"))
+NEAR_SYNC_BATCH_DELAY_SECONDS = float(os.getenv("NEAR_SYNC_BATCH_DELAY_SECONDS", "1"))
+# Read-through cache for get_prophecy: found prophecies never expire, misses for a short while
+PROPHECY_CACHE_SIZE = int(os.getenv("PROPHECY_CACHE_SIZE", "10000"))
+PROPHECY_NEGATIVE_TTL_SECONDS = int(os.getenv("PROPHECY_NEGATIVE_TTL_SECONDS", "30"))
+
+# Storage Configuration
+PROPHECY_DB_PATH = os.getenv("PROPHECY_DB_PATH", "prophecies.db")
+PROPHECY_STORE_CHECKPOINT_INTERVAL = int(os.getenv("PROPHECY_STORE_CHECKPOINT_INTERVAL", "1000"))
+# Results shown for !search; the web /search route takes a `limit` up to SEARCH_MAX_RESULTS
+SEARCH_RESULT_LIMIT = int(os.getenv("SEARCH_RESULT_LIMIT", "5"))
+SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
 
 # Scheduling Configuration
 POSTING_INTERVAL_HOURS = int(os.getenv("POSTING_INTERVAL_HOURS", "4"))
+SCHEDULED_POSTING_ENABLED = os.getenv("SCHEDULED_POSTING_ENABLED", "false").lower() == "true"
+SCHEDULED_POST_TIMEOUT_SECONDS = float(os.getenv("SCHEDULED_POST_TIMEOUT_SECONDS", "30"))
+
+# Outbound request governor: per-backend quotas, retries and circuit breaking
+TWITTER_REQUESTS_PER_MINUTE = float(os.getenv("TWITTER_REQUESTS_PER_MINUTE", "5"))
+NEAR_REQUESTS_PER_SECOND = float(os.getenv("NEAR_REQUESTS_PER_SECOND", "10"))
+NEAR_MAX_CONCURRENCY = int(os.getenv("NEAR_MAX_CONCURRENCY", "4"))
+GOVERNOR_MAX_RETRIES = int(os.getenv("GOVERNOR_MAX_RETRIES", "3"))
+GOVERNOR_FAILURE_THRESHOLD = int(os.getenv("GOVERNOR_FAILURE_THRESHOLD", "5"))
+GOVERNOR_RESET_SECONDS = float(os.getenv("GOVERNOR_RESET_SECONDS", "60"))
+
+# Twitter Configuration (scheduled posts also go to Twitter when these are set)
+TWITTER_API_KEY = os.getenv("TWITTER_API_KEY")
+TWITTER_API_SECRET = os.getenv("TWITTER_API_SECRET")
+TWITTER_ACCESS_TOKEN = os.getenv("TWITTER_ACCESS_TOKEN")
+TWITTER_ACCESS_TOKEN_SECRET = os.getenv("TWITTER_ACCESS_TOKEN_SECRET")
 
 # Prophecy Configuration
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4"))
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "1000"))
+CONTEXT_CACHE_TTL_SECONDS = int(os.getenv("CONTEXT_CACHE_TTL_SECONDS", str(24 * 60 * 60)))
+MAX_FOLLOW_UPS = int(os.getenv("MAX_FOLLOW_UPS", "5"))
+INSIGHT_CACHE_SIZE = int(os.getenv("INSIGHT_CACHE_SIZE", "1000"))
+INSIGHT_CACHE_TTL_SECONDS = int(os.getenv("INSIGHT_CACHE_TTL_SECONDS", str(6 * 60 * 60)))
+INSIGHT_CACHE_PERSIST = os.getenv("INSIGHT_CACHE_PERSIST", "true").lower() == "true"
+# Pre-generated prophecies kept ready per theme; a size of 0 disables the pool
+PROPHECY_POOL_SIZE = int(os.getenv("PROPHECY_POOL_SIZE", "0"))
+PROPHECY_POOL_LOW_WATER = int(os.getenv("PROPHECY_POOL_LOW_WATER", str(PROPHECY_POOL_SIZE // 2)))
+# Bulk generation: completions requested per API call (the `n` parameter) and request rate
+PROPHECY_BATCH_CHOICES = int(os.getenv("PROPHECY_BATCH_CHOICES", "5"))
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60"))
+# Prophecies whose character shingles overlap an archived one by at least DEDUP_THRESHOLD
+# (estimated Jaccard similarity) are regenerated, at most DEDUP_MAX_RETRIES times
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.6"))
+DEDUP_MAX_RETRIES = int(os.getenv("DEDUP_MAX_RETRIES", "2"))
 MAX_PROPHECY_LENGTH = 2000  # Discord message length limit
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""Near-duplicate detection for prophecy text.
+
+Each text is reduced to a MinHash signature over its character shingles,
+computed with NumPy, and the signatures are kept in a banded LSH index:
+texts whose signatures agree on every row of some band share a bucket, so
+checking a candidate only compares it against the handful of texts in its
+buckets rather than the whole archive.
+
+    python -m dedup            # report near-duplicates in the local archive
+    python -m dedup --apply    # and delete the later copies
+"""
+import argparse
+import re
+import threading
+import numpy as np
+from logger import logger
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize(text):
+    """Lowercase and collapse punctuation and whitespace so only wording matters"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+class MinHashIndex:
+    """Banded MinHash LSH index of texts by id.
+
+    `num_perm` hash functions are split into `bands` bands; two texts with
+    Jaccard similarity s share at least one bucket with probability
+    1 - (1 - s**r)**bands, r = num_perm / bands. The defaults (64, 16) put
+    the midpoint of that curve at 0.5, below the usual match threshold, and
+    every bucket hit is confirmed against `threshold` using the signatures.
+    """
+
+    def __init__(self, threshold=0.6, num_perm=64, bands=16, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        if not 1 <= shingle_size <= 8:
+            raise ValueError("shingle_size must be between 1 and 8 characters")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # x -> a * x + b modulo 2**32 with odd a permutes 32-bit integers; the
+        # overflow of uint32 arithmetic is the modulo, so hashing is one
+        # multiply and one add per shingle and permutation
+        rng = np.random.default_rng(seed)
+        self._a = (rng.integers(0, 1 << 32, num_perm, dtype=np.uint64) | 1).astype(np.uint32)[:, None]
+        self._b = rng.integers(0, 1 << 32, num_perm, dtype=np.uint64).astype(np.uint32)[:, None]
+        # Weights folding a band's rows into a single 64-bit bucket key
+        self._band_weights = rng.integers(1, 1 << 63, self.rows, dtype=np.uint64)
+
+        self._lock = threading.Lock()
+        self._ids = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self):
+        return len(self._ids)
+
+    def signatures(self, texts):
+        """MinHash signatures of several texts, one row each.
+
+        Texts are normalized and concatenated so each step runs once over the
+        whole batch. Every character shingle is packed into one integer and
+        folded to 32 bits; repeated shingles are left in, as they cannot
+        change a minimum.
+        """
+        k = self.shingle_size
+        encoded = [normalize(text).encode().ljust(k) for text in texts]
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint64)
+        windows = len(data) - k + 1
+        packed = data[:windows].copy()
+        for offset in range(1, k):
+            packed |= data[offset:offset + windows] << np.uint64(8 * offset)
+
+        # Keep only the windows lying entirely inside one text
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        counts = lengths - k + 1
+        firsts = np.cumsum(counts) - counts
+        starts = np.cumsum(lengths) - lengths
+        packed = packed[np.arange(counts.sum()) + np.repeat(starts - firsts, counts)]
+        shingles = (packed ^ (packed >> np.uint64(32))).astype(np.uint32)
+
+        # One row per permutation keeps the per-text minimum a contiguous reduction
+        hashed = self._a * shingles
+        hashed += self._b
+        return np.minimum.reduceat(hashed, firsts, axis=1).T.copy()
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+    def _band_keys(self, signature):
+        bands = signature.reshape(self.bands, self.rows).astype(np.uint64)
+        return [int(key) for key in (bands * self._band_weights).sum(axis=1)]
+
+    def add(self, text_id, text, signature=None):
+        """Index a text under `text_id`"""
+        signature = self.signature(text) if signature is None else signature
+        with self._lock:
+            row = len(self._ids)
+            if row == len(self._signatures):
+                self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+            self._signatures[row] = signature
+            self._ids.append(text_id)
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                buckets.setdefault(key, []).append(row)
+
+    def add_many(self, items, batch_size=32):
+        """Index (text_id, text) pairs, hashing them a batch at a time; returns how many were added"""
+        added = 0
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) == batch_size:
+                added += self._add_batch(batch)
+                batch = []
+        return added + (self._add_batch(batch) if batch else 0)
+
+    def _add_batch(self, batch):
+        for (text_id, _), signature in zip(batch, self.signatures([text for _, text in batch])):
+            self.add(text_id, None, signature)
+        return len(batch)
+
+    def query(self, text, signature=None):
+        """(text_id, estimated similarity) of indexed texts at or above the threshold, best first"""
+        signature = self.signature(text) if signature is None else signature
+        with self._lock:
+            rows = set()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                rows.update(buckets.get(key, ()))
+            if not rows:
+                return []
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+            similarity = (self._signatures[rows] == signature).mean(axis=1)
+            ids = [self._ids[row] for row in rows]
+        matches = [(ids[i], float(similarity[i])) for i in np.flatnonzero(similarity >= self.threshold)]
+        return sorted(matches, key=lambda match: -match[1])
+
+    def find_duplicate(self, text):
+        """The most similar indexed (text_id, similarity), or None if the text is new"""
+        matches = self.query(text)
+        return matches[0] if matches else None
+
+
+def find_duplicates(items, threshold=0.6):
+    """Scan (text_id, text) pairs in order; returns (duplicate_id, original_id, similarity)
+    for every text that nearly repeats one seen before it"""
+    index = MinHashIndex(threshold)
+    duplicates = []
+    for text_id, text in items:
+        signature = index.signature(text)
+        matches = index.query(text, signature)
+        if matches:
+            duplicates.append((text_id, *matches[0]))
+        else:
+            index.add(text_id, text, signature)
+    return duplicates
+
+
+if __name__ == "__main__":
+    import time
+    from config import DEDUP_THRESHOLD
+    from prophecy_store import ProphecyStore
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate prophecies in the local archive")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD, help="estimated Jaccard similarity")
+    parser.add_argument("--apply", action="store_true", help="delete every duplicate, keeping the oldest copy")
+    args = parser.parse_args()
+
+    store = ProphecyStore(legacy_json_path=None)
+    started = time.perf_counter()
+    duplicates = find_duplicates(store.iter_texts(), args.threshold)
+    for duplicate_id, original_id, similarity in duplicates:
+        print(f"{duplicate_id} repeats {original_id} ({similarity:.0%})")
+    print(f"Found {len(duplicates)} near-duplicates among {store.count()} prophecies "
+          f"in {time.perf_counter() - started:.1f}s")
+    if args.apply and duplicates:
+        deleted = store.delete_many(duplicate_id for duplicate_id, _, _ in duplicates)
+        logger.info(f"Deleted {deleted} near-duplicate prophecies from {store.path}")
+        print(f"Deleted {deleted} prophecies")
@@ -1,67 +1,288 @@
+import asyncio
+import time
 import discord
-from config import DISCORD_CHANNEL_ID
+from config import (
+    DISCORD_CHANNEL_ID,
+    DISCORD_CHANNEL_IDS,
+    MAX_CONCURRENT_GENERATIONS,
+    SESSION_CACHE_SIZE,
+    SESSION_TTL_SECONDS,
+    POSTING_INTERVAL_HOURS,
+    SCHEDULED_POSTING_ENABLED,
+    SCHEDULED_POST_TIMEOUT_SECONDS,
+    STREAM_RESPONSES,
+    STREAM_EDIT_INTERVAL_SECONDS,
+    BOT_METRICS_PORT,
+    SEARCH_RESULT_LIMIT,
+    TWITTER_API_KEY
+)
+import metrics
 from prophecy_generator import ProphecyGenerator
 from logger import logger
+from scheduler import PostingScheduler
+from session_state import SessionStore, SharedSessionStore
+from startup import startup_timer
+
+class StreamingEmbed:
+    """An embed sent as a placeholder and edited as streamed text arrives.
+
+    Partial updates are dropped if the last edit was less than `interval`
+    seconds ago, keeping within Discord's message edit rate limit; `finish`
+    always writes the final text.
+    """
+
+    def __init__(self, channel, embed, interval=STREAM_EDIT_INTERVAL_SECONDS, clock=time.monotonic):
+        self.channel = channel
+        self.embed = embed
+        self.interval = interval
+        self.clock = clock
+        self.message = None
+        self._last_edit = None
+
+    async def start(self):
+        self.message = await self.channel.send(embed=self.embed)
+        self._last_edit = self.clock()
+
+    async def update(self, text):
+        if self.clock() - self._last_edit < self.interval:
+            return
+        try:
+            await self._edit(text)
+        except discord.HTTPException as e:
+            # A missed partial edit is harmless; finish writes the full text
+            logger.warning(f"Failed to update streaming embed: {str(e)}")
+
+    async def finish(self, text):
+        await self._edit(text)
+
+    async def _edit(self, text):
+        self.embed.description = text[:4096]  # Discord's embed description limit
+        self._last_edit = self.clock()
+        await self.message.edit(embed=self.embed)
+
 
 class ProphetBot(discord.Client):
-    def __init__(self):
+    def __init__(self, worker_index=0, **options):
         intents = discord.Intents.default()
         intents.message_content = True
-        super().__init__(intents=intents)
+        super().__init__(intents=intents, **options)
+        # Position among sharded worker processes; 0 when running unsharded
+        self.worker_index = worker_index
         self.prophecy_generator = ProphecyGenerator()
-        self.last_prophecy_timestamp = None
+        # Last prophecy per (guild, channel, user) so !insight follows the right one
+        self.sessions = self._build_sessions()
+        # Caps in-flight OpenAI requests; extra commands wait without blocking the loop
+        self.generation_slots = asyncio.Semaphore(MAX_CONCURRENT_GENERATIONS)
+
+    def _build_sessions(self):
+        return SessionStore(SESSION_CACHE_SIZE, ttl=SESSION_TTL_SECONDS)
+
+    async def setup_hook(self):
+        if BOT_METRICS_PORT:
+            self.metrics_runner = await metrics.start_http_server(BOT_METRICS_PORT + self.worker_index)
+        # One scheduler per deployment, not one per worker
+        if SCHEDULED_POSTING_ENABLED and self.worker_index == 0:
+            self.scheduler = self._build_scheduler()
+            self.scheduler_task = asyncio.create_task(self.scheduler.run())
+
+    def _build_scheduler(self):
+        sinks = {"discord": self._post_to_discord}
+        if TWITTER_API_KEY:
+            from twitter_handler import TwitterHandler
+            twitter = TwitterHandler()
+            # tweepy is synchronous; keep it off the event loop
+            sinks["twitter"] = lambda prophecy: asyncio.to_thread(twitter.post_tweet, prophecy)
+
+        return PostingScheduler(
+            self._scheduled_prophecy,
+            sinks,
+            POSTING_INTERVAL_HOURS * 60 * 60,
+            self.prophecy_generator.near_handler.store,
+            sink_timeout=SCHEDULED_POST_TIMEOUT_SECONDS
+        )
+
+    async def _prophecy_channel(self):
+        return self.get_channel(DISCORD_CHANNEL_ID) or await self.fetch_channel(DISCORD_CHANNEL_ID)
+
+    async def _scheduled_prophecy(self):
+        async with self.generation_slots:
+            prophecy, timestamp = await self.prophecy_generator.generate_prophecy_async()
+        # Let !insight in the prophecy channel refer to the scheduled post
+        channel = await self._prophecy_channel()
+        guild_id = channel.guild.id if getattr(channel, "guild", None) else None
+        await asyncio.to_thread(self.sessions.record_channel, guild_id, channel.id, timestamp)
+        return prophecy
+
+    async def _post_to_discord(self, prophecy):
+        channel = await self._prophecy_channel()
+        prophecy_embed = discord.Embed(
+            title="🔮 Web3 Prophecy 🔮",
+            description=prophecy,
+            color=0xff69b4
+        )
+        prophecy_embed.set_footer(text="Use !insight to reveal deeper meanings...")
+        await channel.send(embed=prophecy_embed)
+
+    async def _send_error(self, channel, streamed, text):
+        """Replace a streaming placeholder with the error, or send it as a new message"""
+        if streamed and streamed.message:
+            await streamed.finish(text)
+        else:
+            await channel.send(text)
 
     async def on_ready(self):
         logger.info(f"Bot connected as {self.user}")
+        if not startup_timer.reported:
+            startup_timer.report()
 
     async def on_message(self, message):
         # Don't respond to our own messages
         if message.author == self.user:
             return
 
-        # Only respond in the designated channel
-        if message.channel.id != DISCORD_CHANNEL_ID:
+        # Only respond in the designated channels
+        if DISCORD_CHANNEL_IDS is not None and message.channel.id not in DISCORD_CHANNEL_IDS:
             return
 
         # Process commands
         if message.content.startswith('!prophecy'):
-            try:
-                # Extract theme if provided
-                parts = message.content.split(maxsplit=1)
-                theme = parts[1] if len(parts) > 1 else None
-
-                # Generate prophecy
-                prophecy, timestamp = self.prophecy_generator.generate_prophecy(theme)
-                self.last_prophecy_timestamp = timestamp
-
-                # Create and send embed
-                theme_str = f" [{theme.upper()}]" if theme else ""
-                prophecy_embed = discord.Embed(
-                    title=f"🔮 Web3 Prophecy{theme_str} 🔮",
-                    description=prophecy,
-                    color=0xff69b4
+            command, handler = "prophecy", self._handle_prophecy
+        elif message.content == '!insight':
+            command, handler = "insight", self._handle_insight
+        elif message.content == '!search' or message.content.startswith('!search '):
+            command, handler = "search", self._handle_search
+        else:
+            return
+
+        started = time.perf_counter()
+        outcome = await handler(message)
+        elapsed = time.perf_counter() - started
+        metrics.discord_command_seconds.observe(elapsed, command=command)
+        metrics.discord_commands.inc(command=command, outcome=outcome)
+        # Parsed by log_analyzer for command latency
+        logger.info(f"Command !{command} {outcome} in {elapsed * 1000:.0f}ms")
+
+    async def _handle_prophecy(self, message):
+        """Answer !prophecy [theme]; returns the outcome for metrics"""
+        streamed = None
+        try:
+            # Extract theme if provided
+            parts = message.content.split(maxsplit=1)
+            theme = parts[1] if len(parts) > 1 else None
+
+            theme_str = f" [{theme.upper()}]" if theme else ""
+            prophecy_embed = discord.Embed(
+                title=f"🔮 Web3 Prophecy{theme_str} 🔮",
+                description="*The oracle gazes into the mists...*",
+                color=0xff69b4
+            )
+
+            # Show a placeholder straight away and fill it in as tokens arrive
+            if STREAM_RESPONSES:
+                streamed = StreamingEmbed(message.channel, prophecy_embed)
+                await streamed.start()
+
+            # Generate prophecy
+            async with self.generation_slots:
+                prophecy, timestamp = await self.prophecy_generator.generate_prophecy_async(
+                    theme, on_partial=streamed.update if streamed else None
                 )
-                prophecy_embed.set_footer(text="Use !insight to reveal deeper meanings...")
+            await asyncio.to_thread(self.sessions.record, *SessionStore.key_for(message), timestamp)
+
+            prophecy_embed.set_footer(text="Use !insight to reveal deeper meanings...")
+            if streamed:
+                await streamed.finish(prophecy)
+            else:
+                prophecy_embed.description = prophecy
                 await message.channel.send(embed=prophecy_embed)
+            return "ok"
 
-            except Exception as e:
-                logger.error(f"Error in prophecy command: {str(e)}")
-                await message.channel.send("⚠️ The mystic forces are clouded. Please try again later.")
+        except Exception as e:
+            logger.error(f"Error in prophecy command: {str(e)}")
+            await self._send_error(message.channel, streamed, "⚠️ The mystic forces are clouded. Please try again later.")
+            return "error"
 
-        elif message.content == '!insight':
-            if not self.last_prophecy_timestamp:
-                await message.channel.send("🔮 No recent prophecies to analyze. Request a prophecy first using `!prophecy`")
-                return
-
-            try:
-                insight = self.prophecy_generator.get_insight(self.last_prophecy_timestamp)
-                insight_embed = discord.Embed(
-                    title="✨ Mystical Insight ✨",
-                    description=insight,
-                    color=0x4a90e2
+    async def _handle_insight(self, message):
+        """Answer !insight for the user's last prophecy; returns the outcome for metrics"""
+        timestamp = await asyncio.to_thread(self.sessions.lookup, *SessionStore.key_for(message))
+        if not timestamp:
+            await message.channel.send("🔮 No recent prophecies to analyze. Request a prophecy first using `!prophecy`")
+            return "no_session"
+
+        streamed = None
+        try:
+            insight_embed = discord.Embed(
+                title="✨ Mystical Insight ✨",
+                description="*The veil begins to part...*",
+                color=0x4a90e2
+            )
+            if STREAM_RESPONSES:
+                streamed = StreamingEmbed(message.channel, insight_embed)
+                await streamed.start()
+
+            async with self.generation_slots:
+                insight = await self.prophecy_generator.get_insight_async(
+                    timestamp, on_partial=streamed.update if streamed else None
                 )
+            if streamed:
+                await streamed.finish(insight)
+            else:
+                insight_embed.description = insight
                 await message.channel.send(embed=insight_embed)
+            return "ok"
+
+        except Exception as e:
+            logger.error(f"Error in insight command: {str(e)}")
+            await self._send_error(message.channel, streamed, "⚠️ The mystic forces are unable to provide deeper insights at this time.")
+            return "error"
+
+    async def _handle_search(self, message):
+        """Answer !search <terms> with the best-matching stored prophecies"""
+        parts = message.content.split(maxsplit=1)
+        if len(parts) < 2:
+            await message.channel.send("🔮 Tell the oracle what to seek, e.g. `!search liquidity`")
+            return "no_query"
+
+        try:
+            # SQLite work stays off the event loop
+            results = await asyncio.to_thread(
+                self.prophecy_generator.near_handler.search_prophecies, parts[1], SEARCH_RESULT_LIMIT
+            )
+            if not results:
+                await message.channel.send(f"🔮 The archive holds no prophecies about *{parts[1]}*.")
+                return "no_results"
+
+            search_embed = discord.Embed(title=f"📜 Prophecies of {parts[1]} 📜", color=0x9b59b6)
+            for result in results:
+                created_at = (result["created_at"] or "")[:16].replace("T", " ")
+                # Discord's embed field name and value limits
+                search_embed.add_field(
+                    name=f"{result['id']} {created_at}"[:256], value=result["text"][:1024], inline=False
+                )
+            await message.channel.send(embed=search_embed)
+            return "ok"
+
+        except Exception as e:
+            logger.error(f"Error in search command: {str(e)}")
+            await message.channel.send("⚠️ The archive is veiled. Please try again later.")
+            return "error"
+
+
+class ShardedProphetBot(ProphetBot, discord.AutoShardedClient):
+    """ProphetBot serving `shard_ids` out of `shard_count` gateway shards.
+
+    One of several worker processes started by shards.ShardSupervisor.
+    Sessions go through the shared prophecy store so that a restarted worker
+    picks up where the crashed one left off.
+    """
+
+    def __init__(self, shard_ids, shard_count, worker_index=0):
+        super().__init__(worker_index=worker_index, shard_ids=list(shard_ids), shard_count=shard_count)
+
+    def _build_sessions(self):
+        return SharedSessionStore(
+            self.prophecy_generator.near_handler.store, SESSION_CACHE_SIZE, ttl=SESSION_TTL_SECONDS
+        )
 
-            except Exception as e:
-                logger.error(f"Error in insight command: {str(e)}")
-                await message.channel.send("⚠️ The mystic forces are unable to provide deeper insights at this time.")
\ No newline at end of file
+    async def on_shard_ready(self, shard_id):
+        logger.info(f"Shard {shard_id}/{self.shard_count} ready in worker {self.worker_index}")
@@ -0,0 +1,268 @@
+import asyncio
+import http.client
+import random
+import threading
+import time
+from config import (
+    OPENAI_REQUESTS_PER_MINUTE,
+    MAX_CONCURRENT_GENERATIONS,
+    TWITTER_REQUESTS_PER_MINUTE,
+    NEAR_REQUESTS_PER_SECOND,
+    NEAR_MAX_CONCURRENCY,
+    GOVERNOR_MAX_RETRIES,
+    GOVERNOR_FAILURE_THRESHOLD,
+    GOVERNOR_RESET_SECONDS
+)
+from logger import logger
+from rate_limit import TokenBucket
+
+# HTTP statuses worth retrying: rate limited or a transient server-side failure
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the backend while its circuit breaker is open"""
+
+
+def _status_of(exc):
+    status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(exc):
+    """Seconds requested by a Retry-After (or retry-after-ms) header, if any"""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def is_retryable(exc):
+    if _status_of(exc) in RETRYABLE_STATUS:
+        return True
+    if isinstance(exc, (ConnectionError, TimeoutError, http.client.HTTPException)):
+        return True
+    # The OpenAI SDK's connection/timeout errors do not derive from the builtins
+    return any(cls.__name__ == "APIConnectionError" for cls in type(exc).__mro__)
+
+
+class Backend:
+    """Quota, concurrency limit, retry policy and circuit breaker for one backend"""
+
+    def __init__(self, name, rate, burst=None, concurrency=4, max_retries=3,
+                 base_delay=0.5, max_delay=30.0, failure_threshold=5, reset_timeout=60.0,
+                 clock=time.monotonic):
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity=burst, clock=clock)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._async_slots = None
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._half_open_trial = False
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rejected = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def async_slots(self):
+        # Created on first async use; the bot runs a single event loop
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(self.concurrency)
+        return self._async_slots
+
+    def check_circuit(self):
+        """Raise CircuitOpenError while open; after reset_timeout allow one trial call"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self.clock() - self._opened_at < self.reset_timeout or self._half_open_trial:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self._half_open_trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._half_open_trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._consecutive_failures += 1
+            if self._half_open_trial or self._consecutive_failures >= self.failure_threshold:
+                if self._opened_at is None or self._half_open_trial:
+                    logger.warning(f"Circuit for {self.name} opened after {self._consecutive_failures} failures")
+                self._opened_at = self.clock()
+                self._half_open_trial = False
+
+    def record_wait(self, seconds):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def backoff(self, exc, attempt):
+        """Delay before the next attempt, honouring Retry-After when the backend sends one"""
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return delay * (0.5 + random.random() / 2)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "wait_seconds_total": self.wait_seconds_total,
+                "wait_seconds_max": self.wait_seconds_max,
+                "circuit_open": self._opened_at is not None
+            }
+
+
+class RequestGovernor:
+    """Routes outbound calls through per-backend quotas.
+
+    Each call waits for a token from the backend's bucket and a concurrency
+    slot, is retried with exponential backoff (or the server's Retry-After)
+    on rate limiting and transient failures, and fails fast with
+    CircuitOpenError while the backend's circuit breaker is open.
+    """
+
+    def __init__(self, backends, sleep=time.sleep, async_sleep=asyncio.sleep):
+        self.backends = {backend.name: backend for backend in backends}
+        self.sleep = sleep
+        self.async_sleep = async_sleep
+
+    def call(self, name, fn, *args, **kwargs):
+        backend = self.backends[name]
+        for attempt in range(backend.max_retries + 1):
+            backend.check_circuit()
+            with backend._lock:
+                backend.waiting += 1
+            started = time.monotonic()
+            try:
+                backend.bucket.acquire()
+                backend._slots.acquire()
+            finally:
+                with backend._lock:
+                    backend.waiting -= 1
+            backend.record_wait(time.monotonic() - started)
+
+            try:
+                with backend._lock:
+                    backend.calls += 1
+                    backend.in_flight += 1
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The backend answered; the request itself was bad
+                    backend.record_success()
+                    raise
+                backend.record_failure()
+                if attempt == backend.max_retries:
+                    raise
+                delay = backend.backoff(e, attempt)
+                with backend._lock:
+                    backend.retries += 1
+                logger.warning(f"{name} call failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                backend.record_success()
+                return result
+            finally:
+                with backend._lock:
+                    backend.in_flight -= 1
+                backend._slots.release()
+            self.sleep(delay)
+
+    async def acall(self, name, fn, *args, **kwargs):
+        """Async variant of call; fn must return an awaitable"""
+        backend = self.backends[name]
+        for attempt in range(backend.max_retries + 1):
+            backend.check_circuit()
+            with backend._lock:
+                backend.waiting += 1
+            started = time.monotonic()
+            try:
+                while True:
+                    delay = backend.bucket.try_acquire()
+                    if not delay:
+                        break
+                    await self.async_sleep(delay)
+                await backend.async_slots().acquire()
+            finally:
+                with backend._lock:
+                    backend.waiting -= 1
+            backend.record_wait(time.monotonic() - started)
+
+            try:
+                with backend._lock:
+                    backend.calls += 1
+                    backend.in_flight += 1
+                result = await fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    # The backend answered; the request itself was bad
+                    backend.record_success()
+                    raise
+                backend.record_failure()
+                if attempt == backend.max_retries:
+                    raise
+                delay = backend.backoff(e, attempt)
+                with backend._lock:
+                    backend.retries += 1
+                logger.warning(f"{name} call failed ({str(e)}), retrying in {delay:.1f}s")
+            else:
+                backend.record_success()
+                return result
+            finally:
+                with backend._lock:
+                    backend.in_flight -= 1
+                backend.async_slots().release()
+            await self.async_sleep(delay)
+
+    def stats(self):
+        return {name: backend.stats() for name, backend in self.backends.items()}
+
+
+governor = RequestGovernor([
+    Backend("openai", OPENAI_REQUESTS_PER_MINUTE / 60.0, burst=MAX_CONCURRENT_GENERATIONS,
+            concurrency=MAX_CONCURRENT_GENERATIONS, max_retries=GOVERNOR_MAX_RETRIES,
+            failure_threshold=GOVERNOR_FAILURE_THRESHOLD, reset_timeout=GOVERNOR_RESET_SECONDS),
+    Backend("twitter", TWITTER_REQUESTS_PER_MINUTE / 60.0, burst=1,
+            concurrency=1, max_retries=GOVERNOR_MAX_RETRIES,
+            failure_threshold=GOVERNOR_FAILURE_THRESHOLD, reset_timeout=GOVERNOR_RESET_SECONDS),
+    Backend("near", NEAR_REQUESTS_PER_SECOND, burst=NEAR_MAX_CONCURRENCY,
+            concurrency=NEAR_MAX_CONCURRENCY, max_retries=GOVERNOR_MAX_RETRIES,
+            failure_threshold=GOVERNOR_FAILURE_THRESHOLD, reset_timeout=GOVERNOR_RESET_SECONDS),
+])
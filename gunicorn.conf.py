@@ -0,0 +1,14 @@
+# Production server for the web interface: gunicorn -c gunicorn.conf.py web_app:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+# Threaded workers: requests mostly wait on SQLite reads, so threads are cheap concurrency
+worker_class = "gthread"
+workers = int(os.getenv("WEB_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("WEB_THREADS", "4"))
+timeout = 30
+keepalive = 5
+# Each worker imports the app itself so SQLite connections are never shared across a fork
+preload_app = False
+accesslog = "-"
@@ -0,0 +1,309 @@
+"""Summarize web3_prophet.log and its rotations.
+
+    python -m log_analyzer --since "2025-03-02 12:00" --interval hour
+
+Files are memory-mapped and parsed a chunk at a time with compiled byte
+regexes, so memory stays flat however large the logs are. A sidecar index
+(<log>.index.json) records the first timestamp of every chunk, keyed by a
+fingerprint of each file's first bytes so it survives rotation renames;
+time-range queries use it to seek straight to the first relevant chunk.
+
+Only the text log format (asctime - levelname - message) is understood.
+"""
+import argparse
+import bisect
+import glob
+import hashlib
+import json
+import mmap
+import os
+import re
+import time
+from collections import Counter, defaultdict
+
+DEFAULT_LOG = "web3_prophet.log"
+CHUNK_SIZE = 1024 * 1024
+
+# Message fragments worth counting, by category, exactly as the bot logs them
+CATEGORIES = {
+    "storage_fallback": [b"falling back to local", b"Falling back to local", b"trying local storage"],
+    "openai_failure": [
+        b"openai call failed", b"Error generating prophecy", b"Error generating insight",
+        b"Error in bulk prophecy request"
+    ],
+    "circuit_open": [b"circuit is open", b"Circuit for "],
+    "command_error": [b"Error in prophecy command", b"Error in insight command", b"Error in search command"],
+}
+
+# (minute, first letter of the level) for every record. Anchoring on the
+# preceding newline rather than ^ in multiline mode lets the regex engine
+# jump between lines with memchr, which is several times faster.
+# Tracebacks and other continuation lines have no timestamp and are skipped.
+RECORD = re.compile(rb"\n(\d{4}-\d\d-\d\d \d\d:\d\d):\d\d,\d{3} - ([A-Z])")
+FIRST_RECORD = re.compile(rb"(\d{4}-\d\d-\d\d \d\d:\d\d):\d\d,\d{3} - ([A-Z])")
+TIMESTAMP = re.compile(rb"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+COMMAND = re.compile(rb" - Command !(\w+) (\w+) in (\d+)ms")
+COMMAND_PREFIX = b" - Command !"
+LEVELS = {b"D": "DEBUG", b"I": "INFO", b"W": "WARNING", b"E": "ERROR", b"C": "CRITICAL"}
+
+# Characters of the minute key kept per reporting interval
+INTERVALS = {"minute": 16, "hour": 13, "day": 10}
+
+
+def log_files(base):
+    """The base log and its numbered rotations, oldest first"""
+    rotated = [path for path in glob.glob(f"{glob.escape(base)}.*") if path.rsplit(".", 1)[1].isdigit()]
+    rotated.sort(key=lambda path: int(path.rsplit(".", 1)[1]), reverse=True)
+    return rotated + ([base] if os.path.exists(base) else [])
+
+
+class TimeIndex:
+    """Sidecar map from file fingerprint to [first timestamp, offset] chunk points"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        try:
+            with open(path) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def fingerprint(mm):
+        return hashlib.sha1(mm[:256]).hexdigest()
+
+    def seek(self, key, since):
+        """Offset of the last indexed chunk that starts before `since` (0 if unknown)"""
+        entry = self.entries.get(key)
+        if not entry or not since:
+            return 0
+        stamps = [point[0] for point in entry["points"]]
+        position = bisect.bisect_left(stamps, since) - 1
+        return entry["points"][position][1] if position >= 0 else 0
+
+    def extend(self, key, start, end, points):
+        """Record points from a scan of [start, end) if it continues the indexed prefix"""
+        entry = self.entries.setdefault(key, {"size": 0, "points": []})
+        if start > entry["size"] or end <= entry["size"]:
+            return
+        entry["points"].extend(point for point in points if point[1] >= entry["size"])
+        entry["size"] = end
+        self.dirty = True
+
+    def save(self, keep):
+        # Forget files that have rotated out of existence
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keep}
+        if not self.dirty:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+class Report:
+    def __init__(self, interval):
+        self.key_length = INTERVALS[interval]
+        self.interval = interval
+        self.records = 0
+        self.levels = Counter()
+        self.categories = Counter()
+        self.per_interval = defaultdict(Counter)
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self.files = []
+
+    def add_records(self, rows):
+        """Fold in a Counter of (minute, level letter) pairs"""
+        key_length = self.key_length
+        for (minute, letter), count in rows.items():
+            bucket = self.per_interval[minute[:key_length].decode()]
+            bucket["records"] += count
+            self.records += count
+            self.levels[LEVELS.get(letter, letter.decode())] += count
+            if letter in (b"E", b"C"):
+                bucket["errors"] += count
+
+    def add_category(self, category, minutes):
+        """Fold in a Counter of minute keys for one category"""
+        for minute, count in minutes.items():
+            self.categories[category] += count
+            self.per_interval[minute[:self.key_length].decode()][category] += count
+
+    def add_command(self, command, outcome, millis):
+        self.latencies[command].append(millis)
+        self.outcomes[(command, outcome)] += 1
+
+    def as_dict(self):
+        def rate(count):
+            return count / self.records if self.records else 0.0
+
+        errors = self.levels["ERROR"] + self.levels["CRITICAL"]
+        latency = {}
+        for command, samples in self.latencies.items():
+            samples.sort()
+            latency[command] = {
+                "count": len(samples),
+                "p50_ms": samples[len(samples) // 2],
+                "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+                "max_ms": samples[-1],
+                "outcomes": {outcome: n for (name, outcome), n in self.outcomes.items() if name == command}
+            }
+        return {
+            "files": self.files,
+            "records": self.records,
+            "levels": dict(self.levels),
+            "error_rate": rate(errors),
+            "categories": {category: self.categories[category] for category in CATEGORIES},
+            "fallback_rate": rate(self.categories["storage_fallback"]),
+            "openai_failure_rate": rate(self.categories["openai_failure"]),
+            "command_latency": latency,
+            "interval": self.interval,
+            "per_interval": {key: dict(counts) for key, counts in sorted(self.per_interval.items())}
+        }
+
+
+def _chunk_end(mm, start, size):
+    """End of the chunk starting at `start`, just past a newline"""
+    end = min(start + CHUNK_SIZE, size)
+    if end < size:
+        newline = mm.find(b"\n", end)
+        end = size if newline == -1 else newline + 1
+    return end
+
+
+def _minute_of_line(mm, lower, offset):
+    """Minute key of the record line containing `offset`, or None for continuation lines"""
+    line_start = mm.rfind(b"\n", lower, offset) + 1 or lower
+    if TIMESTAMP.match(mm, line_start):
+        return line_start, mm[line_start:line_start + 16]
+    return line_start, None
+
+
+def _time_span(mm, size):
+    """First and last timestamps in the file, from its first and last few KB"""
+    first = TIMESTAMP.search(mm, 0, min(size, 8192))
+    last = None
+    for last in TIMESTAMP.finditer(mm, max(0, size - 8192), size):
+        pass
+    return (first.group(0) if first else None), (last.group(0) if last else None)
+
+
+def _scan_chunk(mm, position, end, report, in_range):
+    if position == 0:
+        head = FIRST_RECORD.match(mm, 0, end)
+        rows = Counter([head.groups()] if head else [])
+    else:
+        rows = Counter()
+    # position - 1 is the newline ending the previous chunk
+    rows.update(RECORD.findall(mm, max(position - 1, 0), end))
+    report.add_records(Counter({row: count for row, count in rows.items() if in_range(row[0])}))
+
+    # Plain substring search is the fastest way through the chunk; a line
+    # matching several fragments of one category is counted once
+    for category, fragments in CATEGORIES.items():
+        lines = {}
+        for fragment in fragments:
+            found = mm.find(fragment, position, end)
+            while found != -1:
+                line_start, minute = _minute_of_line(mm, position, found)
+                if minute is not None:
+                    lines[line_start] = minute
+                found = mm.find(fragment, found + len(fragment), end)
+        report.add_category(category, Counter(minute for minute in lines.values() if in_range(minute)))
+
+    found = mm.find(COMMAND_PREFIX, position, end)
+    while found != -1:
+        match = COMMAND.match(mm, found, end)
+        _, minute = _minute_of_line(mm, position, found)
+        if match and minute is not None and in_range(minute):
+            command, outcome, millis = match.groups()
+            report.add_command(command.decode(), outcome.decode(), int(millis))
+        found = mm.find(COMMAND_PREFIX, found + len(COMMAND_PREFIX), end)
+
+
+def scan_file(path, report, index, since=None, until=None):
+    """Add one log file's records in [since, until] to the report; returns its fingerprint"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return None
+    since_key = since.encode()[:16] if since else None
+    until_key = until.encode()[:16] if until else None
+
+    def in_range(minute):
+        return (not since_key or minute >= since_key) and (not until_key or minute <= until_key)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        key = TimeIndex.fingerprint(mm)
+        first, last = _time_span(mm, size)
+        if (since_key and last and last[:16] < since_key) or (until_key and first and first[:16] > until_key):
+            report.files.append({"path": path, "bytes": size, "scanned_bytes": 0})
+            return key
+
+        start = index.seek(key, since) if index else 0
+        position = start
+        points = []
+        while position < size:
+            end = _chunk_end(mm, position, size)
+            first = TIMESTAMP.search(mm, position, end)
+            if first:
+                points.append([first.group(0).decode(), position])
+                if until_key and first.group(0)[:16] > until_key:
+                    break
+            _scan_chunk(mm, position, end, report, in_range)
+            position = end
+
+        if index:
+            index.extend(key, start, position, points)
+        report.files.append({"path": path, "bytes": size, "scanned_bytes": position - start})
+        return key
+
+
+def analyze(base=DEFAULT_LOG, since=None, until=None, interval="hour", use_index=True):
+    """Scan every rotation of `base` and return the report as a dict"""
+    started = time.perf_counter()
+    report = Report(interval)
+    index = TimeIndex(f"{base}.index.json") if use_index else None
+    keys = set()
+    for path in log_files(base):
+        keys.add(scan_file(path, report, index, since, until))
+    if index:
+        index.save(keys)
+    result = report.as_dict()
+    result["elapsed_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _print_text(result):
+    print(f"Scanned {len(result['files'])} files, {result['records']} records "
+          f"in {result['elapsed_seconds'] * 1000:.0f}ms")
+    print(f"Levels: {', '.join(f'{level} {count}' for level, count in sorted(result['levels'].items()))}")
+    print(f"Error rate: {result['error_rate']:.2%}  Fallback rate: {result['fallback_rate']:.2%}  "
+          f"OpenAI failure rate: {result['openai_failure_rate']:.2%}")
+    print(f"Categories: {', '.join(f'{name} {count}' for name, count in result['categories'].items())}")
+    for command, stats in result["command_latency"].items():
+        print(f"!{command}: {stats['count']} commands, p50 {stats['p50_ms']}ms, "
+              f"p95 {stats['p95_ms']}ms, max {stats['max_ms']}ms, outcomes {stats['outcomes']}")
+    print(f"Per {result['interval']}:")
+    for key, counts in result["per_interval"].items():
+        details = ", ".join(f"{name} {count}" for name, count in sorted(counts.items()) if name != "records")
+        print(f"  {key}  {counts['records']:>8} records  {details}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize errors, fallbacks and latency in the bot's logs")
+    parser.add_argument("--log", default=DEFAULT_LOG, help="base log file; rotations .1, .2, ... are included")
+    parser.add_argument("--since", help='start time, e.g. "2025-03-02 12:00" (minute resolution)')
+    parser.add_argument("--until", help="end time, inclusive, same format as --since")
+    parser.add_argument("--interval", choices=sorted(INTERVALS), default="hour")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--no-index", action="store_true", help="neither read nor update the time index")
+    args = parser.parse_args()
+
+    result = analyze(args.log, args.since, args.until, args.interval, use_index=not args.no_index)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        _print_text(result)
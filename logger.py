@@ -1,17 +1,66 @@
+import atexit
+import json
 import logging
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import LOG_LEVEL, LOG_FORMAT
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as one JSON object per line"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+class LazyQueueHandler(QueueHandler):
+    """Enqueue records untouched.
+
+    The stock QueueHandler formats each record on the calling thread so it can
+    be pickled; our listener lives in the same process, so message formatting
+    is left to the listener thread and the caller only pays for the enqueue.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+# The background listener writing setup_logger's handlers, until forward_to replaces it
+_listener = None
+
+
+def _level(name):
+    """The numeric level for a level name, or None if logging does not know it"""
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else None
+
 
 # Configure logging
 def setup_logger():
+    global _listener
     logger = logging.getLogger('web3_prophet')
-    logger.setLevel(logging.INFO)
+    level = _level(LOG_LEVEL)
+    if level is None:
+        level = logging.INFO
+    logger.setLevel(level)
+
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
 
     # Console handler
     console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    console_handler.setFormatter(console_formatter)
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
 
     # File handler
     file_handler = RotatingFileHandler(
@@ -19,14 +68,39 @@ def setup_logger():
         maxBytes=1024 * 1024,  # 1MB
         backupCount=5
     )
-    file_handler.setLevel(logging.INFO)
-    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(file_formatter)
+    file_handler.setLevel(level)
+    file_handler.setFormatter(formatter)
 
-    # Add handlers
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Handlers run on a background listener thread; callers only enqueue
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+    logger.addHandler(LazyQueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
+    _listener = listener
 
+    if _level(LOG_LEVEL) is None:
+        logger.warning(f"Unknown LOG_LEVEL {LOG_LEVEL!r}, logging at INFO")
     return logger
 
 logger = setup_logger()
+
+
+def forward_to(log_queue):
+    """Send this process's records to `log_queue` instead of the console and log file.
+
+    Sharded bot workers use this so that only the supervisor writes (and
+    rotates) web3_prophet.log. The stock QueueHandler formats each message
+    so the record can be pickled across processes. The local listener is
+    stopped once it has drained, and its console and file handlers closed.
+    """
+    global _listener
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(QueueHandler(log_queue))
+    if _listener is not None:
+        atexit.unregister(_listener.stop)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
@@ -1,10 +1,23 @@
+import time
+
+# Timed from here, since startup itself imports config and logger
+_imports_started = time.perf_counter()
+from startup import startup_timer
 from discord_handler import ProphetBot
-from config import DISCORD_TOKEN
+from config import DISCORD_TOKEN, SHARD_COUNT
 from logger import logger
+startup_timer.started = _imports_started
+startup_timer.record("imports", time.perf_counter() - _imports_started)
 
 def main():
+    if SHARD_COUNT:
+        from shards import ShardSupervisor
+        logger.info(f"Starting Web3 Prophet Bot with {SHARD_COUNT} shards...")
+        ShardSupervisor().run()
+        return
     try:
-        bot = ProphetBot()
+        with startup_timer.phase("bot construction"):
+            bot = ProphetBot()
         logger.info("Starting Web3 Prophet Bot...")
         bot.run(DISCORD_TOKEN)
     except Exception as e:
@@ -12,4 +25,4 @@ def main():
         raise
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,259 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from governor import governor
+from logger import logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers cache hits through slow model completions and CLI fallbacks
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts plus +Inf, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Values read from `collect()` at scrape time, as {label values tuple: value}"""
+
+    def __init__(self, name, help, labelnames, collect, kind="gauge"):
+        super().__init__(name, help, labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def _samples(self):
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in self.collect().items()
+        ]
+
+
+class Registry:
+    """Metrics of this process; under gunicorn each worker reports its own"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, labelnames, collect, kind="gauge"):
+        return self.register(CallbackMetric(name, help, labelnames, collect, kind))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning(f"Failed to collect metric {metric.name}: {str(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# Prophecy generation
+generation_seconds = registry.histogram(
+    "prophecy_generation_seconds", "Time to produce and store a prophecy", ["mode", "source"]
+)
+insight_seconds = registry.histogram(
+    "prophecy_insight_seconds", "Time to answer an insight request", ["mode"]
+)
+openai_request_seconds = registry.histogram(
+    "openai_request_seconds", "OpenAI chat completion latency, including streaming", ["kind", "stream"]
+)
+prophecy_duplicates = registry.counter(
+    "prophecy_duplicates_total", "Near-duplicate prophecies caught before storing", ["action"]
+)
+openai_tokens = registry.counter(
+    "openai_tokens_total", "Tokens reported in OpenAI response usage", ["kind", "type"]
+)
+
+# NEAR storage
+near_operation_seconds = registry.histogram(
+    "near_operation_seconds", "Latency of prophecy storage backends", ["operation", "backend"]
+)
+near_operations = registry.counter(
+    "near_operations_total", "Prophecy storage backend calls", ["operation", "backend", "outcome"]
+)
+near_local_fallbacks = registry.counter(
+    "near_local_fallbacks_total", "Prophecy reads and writes served by local storage", ["operation", "reason"]
+)
+near_reconciled = registry.counter(
+    "near_reconciled_total", "Locally stored prophecies reconciled with the chain", ["outcome"]
+)
+
+# Discord and web
+discord_command_seconds = registry.histogram(
+    "discord_command_seconds", "Discord command handling time", ["command"]
+)
+discord_commands = registry.counter(
+    "discord_commands_total", "Discord commands handled", ["command", "outcome"]
+)
+http_request_seconds = registry.histogram(
+    "http_request_seconds", "Web request handling time", ["endpoint"]
+)
+http_requests = registry.counter(
+    "http_requests_total", "Web requests served", ["endpoint", "status"]
+)
+
+
+def record_usage(kind, usage):
+    """Count prompt and completion tokens from an OpenAI `usage` object"""
+    if usage is None:
+        return
+    openai_tokens.inc(getattr(usage, "prompt_tokens", 0) or 0, kind=kind, type="prompt")
+    openai_tokens.inc(getattr(usage, "completion_tokens", 0) or 0, kind=kind, type="completion")
+
+
+def record_near(operation, backend, started, outcome):
+    """Record one storage backend call that began at perf_counter() `started`"""
+    near_operation_seconds.observe(time.perf_counter() - started, operation=operation, backend=backend)
+    near_operations.inc(operation=operation, backend=backend, outcome=outcome)
+
+
+def _governor_stat(field):
+    def collect():
+        return {(name,): stats[field] for name, stats in governor.stats().items()}
+    return collect
+
+
+# Request governor state, read from governor.stats() on each scrape
+for _name, _field, _kind, _help in (
+    ("governor_calls_total", "calls", "counter", "Calls made through the request governor"),
+    ("governor_retries_total", "retries", "counter", "Retries made by the request governor"),
+    ("governor_failures_total", "failures", "counter", "Retryable failures seen by the request governor"),
+    ("governor_rejected_total", "rejected", "counter", "Calls rejected while a circuit was open"),
+    ("governor_wait_seconds_total", "wait_seconds_total", "counter", "Time calls spent waiting for quota"),
+    ("governor_queue_depth", "queue_depth", "gauge", "Calls waiting for a token or concurrency slot"),
+    ("governor_in_flight", "in_flight", "gauge", "Calls currently running"),
+    ("governor_circuit_open", "circuit_open", "gauge", "1 while the backend's circuit breaker is open"),
+):
+    registry.callback(_name, _help, ["backend"], _governor_stat(_field), kind=_kind)
+
+
+async def start_http_server(port, host="0.0.0.0"):
+    """Serve /metrics from the running event loop; returns the aiohttp runner"""
+    from aiohttp import web
+
+    async def handle(request):
+        return web.Response(body=registry.render().encode(), headers={"Content-Type": CONTENT_TYPE})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Metrics endpoint listening on {host}:{port}/metrics")
+    return runner
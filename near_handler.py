@@ -1,37 +1,122 @@
 import os
 import subprocess
 import json
+import hashlib
+import socket
 import tempfile
+import threading
+import time
 from datetime import datetime
+from batch_writer import BatchWriter
+from cache import LRUCache
+from config import (
+    NEAR_BATCH_WINDOW_SECONDS,
+    NEAR_BATCH_MAX_SIZE,
+    NEAR_SYNC_INTERVAL_SECONDS,
+    PROPHECY_CACHE_SIZE,
+    PROPHECY_NEGATIVE_TTL_SECONDS
+)
+from governor import CircuitOpenError, governor
 from logger import logger
+import metrics
+from near_rpc import NearRpcClient
+from prophecy_store import ProphecyStore
+from reconciler import ChainReconciler
+from startup import startup_timer
+
+CONTRACT_DIR = "prophecy-contract"
+WASM_PATH = "prophecy-contract/target/wasm32-unknown-unknown/release/prophecy_contract.wasm"
+# code_hash NEAR reports for an account with no contract deployed
+EMPTY_CODE_HASH = "11111111111111111111111111111111"
+
+# Serializes account setup, build and deploy across processes sharing a store.
+# Held for the whole setup, so it has to outlast a cargo build
+SETUP_LEASE_NAME = "near-setup"
+SETUP_LEASE_SECONDS = 1800
+SETUP_LEASE_POLL_SECONDS = 5
+
+# Cached in place of a prophecy that neither backend has
+NOT_FOUND = object()
 
 class NEARHandler:
-    def __init__(self):
+    def __init__(self, background_setup=True):
         self.account = os.getenv("NEAR_ACCOUNT")
         self.private_key = os.getenv("NEAR_PRIVATE_KEY")
-        self.local_storage_path = "prophecies.json"
         self.blockchain_enabled = False
         
         # Environment variable to force local storage mode
         self.force_local_storage = os.getenv("FORCE_LOCAL_STORAGE", "true").lower() == "true"
 
-        # Initialize local storage if needed
-        if not os.path.exists(self.local_storage_path):
-            with open(self.local_storage_path, 'w') as f:
-                json.dump({}, f)
+        # Initialize local storage (imports a legacy prophecies.json on first run)
+        self.store = ProphecyStore()
+        self.local_storage_path = self.store.path
+
+        # Prophecies are immutable once stored, so found ones are cached for
+        # good; misses are cached briefly in case another process stores them
+        self.prophecy_cache = LRUCache(PROPHECY_CACHE_SIZE)
+
+        # Pooled JSON-RPC client; the near CLI remains as a fallback path
+        self.rpc = NearRpcClient(self.account, self.private_key)
+
+        # Optional write-behind queue that coalesces on-chain writes into batches
+        self.batch_writer = None
+        if NEAR_BATCH_WINDOW_SECONDS > 0:
+            self.batch_writer = BatchWriter(
+                self.store_prophecies, NEAR_BATCH_WINDOW_SECONDS, NEAR_BATCH_MAX_SIZE
+            )
+
+        # Back-fills prophecies that only reached local storage once the chain is up
+        self.reconciler = None
 
         # Skip blockchain setup if we're forcing local storage
         if self.force_local_storage:
             logger.info("FORCE_LOCAL_STORAGE is enabled, using local storage only")
             return
             
-        # Try to initialize NEAR connection
+        # Account checks, build and deploy can take minutes, so by default they
+        # run in the background while writes go to local storage
+        if background_setup:
+            self._setup_thread = threading.Thread(
+                target=self.enable_blockchain, name="near-setup", daemon=True
+            )
+            self._setup_thread.start()
+        else:
+            self.enable_blockchain()
+
+    def enable_blockchain(self):
+        """Initialize the NEAR connection and switch storage to the blockchain"""
+        started = time.perf_counter()
         try:
-            self._setup_near_account()
+            self._setup_once()
             self.blockchain_enabled = True
+            if NEAR_SYNC_INTERVAL_SECONDS > 0:
+                self.reconciler = ChainReconciler(self)
+                self.reconciler.start()
         except Exception as e:
             logger.warning(f"Failed to initialize NEAR blockchain connection: {str(e)}")
             logger.info("Falling back to local storage")
+        finally:
+            elapsed = time.perf_counter() - started
+            startup_timer.record("blockchain enablement", elapsed)
+            logger.info(f"Blockchain enablement finished in {elapsed:.1f}s (enabled: {self.blockchain_enabled})")
+        return self.blockchain_enabled
+
+    def _setup_once(self):
+        """Run _setup_near_account while holding the store's setup lease.
+
+        Sharded workers share one store, so only one of them generates keys,
+        builds and deploys at a time. The others wait for the lease and then
+        find the WASM fresh and the deployed code hash current.
+        """
+        owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        if not self.store.acquire_lease(SETUP_LEASE_NAME, owner, SETUP_LEASE_SECONDS):
+            logger.info("Another process is setting up the NEAR contract, waiting for it")
+            while not self.store.acquire_lease(SETUP_LEASE_NAME, owner, SETUP_LEASE_SECONDS):
+                time.sleep(SETUP_LEASE_POLL_SECONDS)
+        try:
+            self._setup_near_account()
+        finally:
+            self.store.release_lease(SETUP_LEASE_NAME, owner)
 
     def _setup_near_account(self):
         """Setup NEAR account using environment credentials"""
@@ -52,7 +137,7 @@ class NEARHandler:
                 text=True,
                 check=False
             )
-            logger.info(f"Account state check result: {check_account.stdout}")
+            logger.debug("Account state check result: %s", check_account.stdout)
 
             if check_account.returncode != 0:
                 logger.error(f"Account state check failed: {check_account.stderr}")
@@ -65,7 +150,7 @@ class NEARHandler:
                 text=True,
                 check=False
             )
-            logger.info(f"Key generation result: {generate_key.stdout}")
+            logger.debug("Key generation result: %s", generate_key.stdout)
 
             if generate_key.returncode != 0:
                 logger.error(f"Key generation failed: {generate_key.stderr}")
@@ -81,32 +166,81 @@ class NEARHandler:
             logger.exception("Full traceback:")
             raise
 
+    def _wasm_is_stale(self):
+        """True if the WASM is missing or older than any contract source file"""
+        if not os.path.exists(WASM_PATH):
+            return True
+        built_at = os.path.getmtime(WASM_PATH)
+        sources = [os.path.join(CONTRACT_DIR, "Cargo.toml")]
+        for root, _, files in os.walk(os.path.join(CONTRACT_DIR, "src")):
+            sources.extend(os.path.join(root, name) for name in files)
+        return any(os.path.getmtime(path) > built_at for path in sources if os.path.exists(path))
+
+    @staticmethod
+    def _local_code_hash(wasm_path):
+        """Code hash as reported by NEAR: base58 of the WASM's SHA-256"""
+        import base58
+        with open(wasm_path, 'rb') as f:
+            return base58.b58encode(hashlib.sha256(f.read()).digest()).decode()
+
+    def _deployed_code_hash(self):
+        """Code hash currently deployed on the account, or None if unknown"""
+        try:
+            account_state = self.rpc.request("query", {
+                "request_type": "view_account",
+                "finality": "final",
+                "account_id": self.account
+            })
+            return account_state.get("code_hash")
+        except Exception as e:
+            logger.warning(f"Could not read deployed code hash: {str(e)}")
+            return None
+
     def _deploy_contract(self):
-        """Deploy the Rust prophecy contract to NEAR testnet"""
+        """Deploy the Rust prophecy contract to NEAR testnet unless it is already current"""
         try:
-            logger.info("Building and deploying Rust prophecy contract...")
+            if self._wasm_is_stale():
+                logger.info("Building Rust prophecy contract...")
 
-            # Build the contract
-            build_result = subprocess.run(
-                ["cargo", "build", "--target", "wasm32-unknown-unknown", "--release"],
-                cwd="prophecy-contract",
-                capture_output=True,
-                text=True
-            )
+                # Build the contract
+                build_result = subprocess.run(
+                    ["cargo", "build", "--target", "wasm32-unknown-unknown", "--release"],
+                    cwd=CONTRACT_DIR,
+                    capture_output=True,
+                    text=True
+                )
 
-            if build_result.returncode != 0:
-                logger.error(f"Failed to build Rust contract: {build_result.stderr}")
-                raise ValueError("Failed to build Rust contract")
+                if build_result.returncode != 0:
+                    logger.error(f"Failed to build Rust contract: {build_result.stderr}")
+                    raise ValueError("Failed to build Rust contract")
 
-            logger.info("Contract built successfully")
+                logger.info("Contract built successfully")
 
             # Get the WASM file path
-            wasm_path = "prophecy-contract/target/wasm32-unknown-unknown/release/prophecy_contract.wasm"
+            wasm_path = WASM_PATH
 
             if not os.path.exists(wasm_path):
                 logger.error(f"WASM file not found at {wasm_path}")
                 raise FileNotFoundError(f"Compiled WASM file not found")
 
+            # Deploy once: skip if the account already runs this exact code
+            local_hash = self._local_code_hash(wasm_path)
+            deployed_hash = self._deployed_code_hash()
+            if deployed_hash == local_hash:
+                logger.info(f"Deployed contract matches local WASM ({local_hash}), skipping deploy")
+                return
+            if deployed_hash is None:
+                # new panics on existing state and migrate on a fresh account, so don't guess
+                raise ValueError("Cannot tell whether the contract is already initialized")
+
+            # A fresh account is initialized; an upgrade migrates the existing state
+            if deployed_hash == EMPTY_CODE_HASH:
+                init_function, init_args = "new", {"owner_id": self.account}
+            else:
+                init_function, init_args = "migrate", {}
+
+            logger.info("Deploying Rust prophecy contract...")
+
             # Deploy the contract
             deploy_command = [
                 "near",
@@ -116,9 +250,9 @@ class NEARHandler:
                 "--wasmFile",
                 wasm_path,
                 "--initFunction",
-                "new",
+                init_function,
                 "--initArgs",
-                json.dumps({"owner_id": self.account})
+                json.dumps(init_args)
             ]
 
             logger.info(f"Deploying contract with command: {' '.join(deploy_command)}")
@@ -133,7 +267,8 @@ class NEARHandler:
                 logger.error(f"Contract deployment failed: {result.stderr}")
                 raise ValueError(f"Failed to deploy contract: {result.stderr}")
 
-            logger.info(f"Contract deployment successful: {result.stdout}")
+            logger.info("Contract deployment successful")
+            logger.debug("Deployment output: %s", result.stdout)
 
         except Exception as e:
             logger.error(f"Error deploying contract: {str(e)}")
@@ -142,98 +277,376 @@ class NEARHandler:
 
     def _save_local(self, prophecy_id, prophecy_data):
         """Save prophecy to local storage"""
+        started = time.perf_counter()
         try:
-            with open(self.local_storage_path, 'r') as f:
-                prophecies = json.load(f)
-            prophecies[prophecy_id] = prophecy_data
-            with open(self.local_storage_path, 'w') as f:
-                json.dump(prophecies, f)
+            self.store.put(prophecy_id, prophecy_data)
+            metrics.record_near("store_prophecy", "local", started, "ok")
             return True
         except Exception as e:
             logger.error(f"Error saving to local storage: {str(e)}")
+            metrics.record_near("store_prophecy", "local", started, "error")
             return False
 
     def _get_local(self, prophecy_id):
         """Get prophecy from local storage"""
+        started = time.perf_counter()
         try:
-            with open(self.local_storage_path, 'r') as f:
-                prophecies = json.load(f)
-            return prophecies.get(prophecy_id)
+            prophecy = self.store.get(prophecy_id)
+            metrics.record_near("get_prophecy", "local", started, "ok" if prophecy is not None else "miss")
+            return prophecy
         except Exception as e:
             logger.error(f"Error reading from local storage: {str(e)}")
+            metrics.record_near("get_prophecy", "local", started, "error")
             return None
 
+    def _fallback_reason(self):
+        return "failed" if self.blockchain_enabled else "disabled"
+
+    def _call_via_cli(self, method, args):
+        """Submit a change call through the near CLI; returns True on success"""
+        command = [
+            "near",
+            "call",
+            self.account,
+            method,
+            json.dumps(args),
+            "--accountId",
+            self.account
+        ]
+
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True
+        )
+
+        if result.returncode == 0:
+            logger.info(f"{method} succeeded on blockchain via NEAR CLI")
+            logger.debug("NEAR CLI output: %s", result.stdout)
+            return True
+        logger.warning(f"Blockchain {method} failed: {result.stderr}")
+        return False
+
+    def _call_on_chain(self, method, args):
+        """Run a change call via RPC, then the CLI; returns True on success"""
+        started = time.perf_counter()
+        try:
+            governor.call("near", self.rpc.call, self.account, method, args)
+            metrics.record_near(method, "rpc", started, "ok")
+            logger.info(f"{method} succeeded on blockchain via RPC")
+            return True
+        except CircuitOpenError as e:
+            # The node is known to be failing; don't spend a CLI call on it too
+            metrics.record_near(method, "rpc", started, "rejected")
+            logger.warning(f"Skipping blockchain {method}: {str(e)}")
+            return False
+        except Exception as e:
+            metrics.record_near(method, "rpc", started, "error")
+            logger.warning(f"RPC {method} failed, trying NEAR CLI: {str(e)}")
+
+        started = time.perf_counter()
+        try:
+            stored = self._call_via_cli(method, args)
+        except Exception as e:
+            logger.warning(f"Error in blockchain {method}: {str(e)}")
+            stored = False
+        metrics.record_near(method, "cli", started, "ok" if stored else "error")
+        return stored
+
+    @staticmethod
+    def _local_record(prophecy, timestamp):
+        return {
+            "text": prophecy,
+            "timestamp": timestamp,
+            "created_at": datetime.now().isoformat()
+        }
+
+    def _get_via_cli(self, prophecy_id):
+        """Read a prophecy through the near CLI; returns None on failure"""
+        command = [
+            "near",
+            "view",
+            self.account,
+            "get_prophecy",
+            json.dumps({
+                "prophecy_id": prophecy_id
+            })
+        ]
+
+        result = subprocess.run(
+            command,
+            capture_output=True,
+            text=True
+        )
+
+        if result.returncode == 0:
+            return json.loads(result.stdout)
+        logger.warning(f"Blockchain retrieval failed, trying local storage: {result.stderr}")
+        return None
+
+    def _index_for_search(self, records):
+        """Make (prophecy_id, record) pairs stored on chain searchable locally"""
+        try:
+            self.store.index_documents(
+                (prophecy_id, record["text"], record["created_at"]) for prophecy_id, record in records
+            )
+        except Exception as e:
+            logger.error(f"Error indexing prophecies for search: {str(e)}")
+
     def store_prophecy(self, prophecy, timestamp):
         """Store a prophecy with fallback to local storage"""
         prophecy_id = f"prophecy_{timestamp}"
+        record = self._local_record(prophecy, timestamp)
 
         # Try blockchain storage first if enabled
         if self.blockchain_enabled:
-            try:
-                command = [
-                    "near",
-                    "call",
-                    self.account,
-                    "store_prophecy",
-                    json.dumps({
-                        "prophecy_id": prophecy_id,
-                        "text": prophecy
-                    }),
-                    "--accountId",
-                    self.account
-                ]
-
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True
-                )
+            if self.batch_writer:
+                # Reads are served from the writer's queue until the batch lands
+                self.prophecy_cache.pop(prophecy_id)
+                self.batch_writer.submit(prophecy_id, prophecy, timestamp)
+                self._index_for_search([(prophecy_id, record)])
+                return True
+
+            if self._call_on_chain("store_prophecy", {"prophecy_id": prophecy_id, "text": prophecy}):
+                self._cache_stored([(prophecy_id, record)])
+                self._index_for_search([(prophecy_id, record)])
+                return True
+            logger.warning("Blockchain storage failed, falling back to local")
+
+        # Fall back to local storage, which indexes the prophecy as it writes it
+        metrics.near_local_fallbacks.inc(operation="store_prophecy", reason=self._fallback_reason())
+        if self._save_local(prophecy_id, record):
+            self._cache_stored([(prophecy_id, record)])
+            return True
+        self.prophecy_cache.pop(prophecy_id)
+        return False
+
+    def _cache_stored(self, records):
+        """Cache (prophecy_id, record) pairs once they are persisted somewhere"""
+        for prophecy_id, record in records:
+            self.prophecy_cache.set(prophecy_id, record)
+
+    def store_prophecies(self, items):
+        """Store (prophecy, timestamp) pairs in one transaction.
+
+        If the batch transaction fails, each item is retried on its own and
+        whatever still fails falls back to local storage in a single write.
+        """
+        items = list(items)
+        if not items:
+            return True
+        records = {
+            f"prophecy_{timestamp}": self._local_record(prophecy, timestamp) for prophecy, timestamp in items
+        }
 
-                if result.returncode == 0:
-                    logger.info(f"Prophecy stored successfully on blockchain: {result.stdout}")
-                    return True
+        if self.blockchain_enabled:
+            batch = [[f"prophecy_{timestamp}", prophecy] for prophecy, timestamp in items]
+            if self._call_on_chain("store_prophecies_batch", {"prophecies": batch}):
+                self._cache_stored(records.items())
+                self._index_for_search(records.items())
+                return True
+
+            logger.warning(f"Batch of {len(items)} failed on chain, retrying individually")
+            stored, failed = [], []
+            for prophecy, timestamp in items:
+                prophecy_id = f"prophecy_{timestamp}"
+                if self._call_on_chain("store_prophecy", {"prophecy_id": prophecy_id, "text": prophecy}):
+                    stored.append((prophecy_id, records[prophecy_id]))
                 else:
-                    logger.warning(f"Blockchain storage failed, falling back to local: {result.stderr}")
-            except Exception as e:
-                logger.warning(f"Error in blockchain storage, falling back to local: {str(e)}")
+                    failed.append((prophecy, timestamp))
+            self._cache_stored(stored)
+            self._index_for_search(stored)
+            items = failed
+            if not items:
+                return True
+            logger.warning(f"{len(items)} prophecies falling back to local storage")
+
+        metrics.near_local_fallbacks.inc(
+            len(items), operation="store_prophecies_batch", reason=self._fallback_reason()
+        )
+        started = time.perf_counter()
+        local = [(f"prophecy_{timestamp}", records[f"prophecy_{timestamp}"]) for _, timestamp in items]
+        try:
+            self.store.put_many(local)
+            metrics.record_near("store_prophecies_batch", "local", started, "ok")
+            self._cache_stored(local)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving batch to local storage: {str(e)}")
+            metrics.record_near("store_prophecies_batch", "local", started, "error")
+            for prophecy_id, _ in local:
+                self.prophecy_cache.pop(prophecy_id)
+            return False
 
-        # Fall back to local storage
-        prophecy_data = {
-            "text": prophecy,
-            "timestamp": timestamp,
-            "created_at": datetime.now().isoformat()
-        }
-        return self._save_local(prophecy_id, prophecy_data)
+    def chain_digest(self, prophecy_ids):
+        """The contract's {"found", "digest"} for a range of ids; see reconciler.range_digest"""
+        started = time.perf_counter()
+        try:
+            digest = governor.call(
+                "near", self.rpc.view, self.account, "get_prophecies_digest", {"prophecy_ids": list(prophecy_ids)}
+            )
+            metrics.record_near("get_prophecies_digest", "rpc", started, "ok")
+            return digest
+        except Exception:
+            metrics.record_near("get_prophecies_digest", "rpc", started, "error")
+            raise
+
+    def upload_prophecies(self, entries):
+        """Copy locally stored (prophecy_id, text) pairs to the chain in one transaction.
+
+        Unlike store_prophecies there is no local fallback: the records are
+        already local, so this only reports whether the chain accepted them.
+        """
+        if not self.blockchain_enabled:
+            return False
+        return self._call_on_chain(
+            "store_prophecies_batch", {"prophecies": [[prophecy_id, text] for prophecy_id, text in entries]}
+        )
 
     def get_prophecy(self, timestamp):
-        """Get a prophecy with fallback to local storage"""
+        """Get a prophecy, reading through the cache to the blockchain and local storage"""
         prophecy_id = f"prophecy_{timestamp}"
+        cached = self.prophecy_cache.get(prophecy_id)
+        if cached is not None:
+            metrics.near_operations.inc(
+                operation="get_prophecy", backend="cache", outcome="miss" if cached is NOT_FOUND else "ok"
+            )
+            return None if cached is NOT_FOUND else cached
+
+        prophecy = self._lookup_prophecy(prophecy_id)
+        if prophecy is None:
+            self.prophecy_cache.set(prophecy_id, NOT_FOUND, ttl=PROPHECY_NEGATIVE_TTL_SECONDS)
+        else:
+            self.prophecy_cache.set(prophecy_id, prophecy)
+        return prophecy
+
+    def search_prophecies(self, query, limit=10, offset=0):
+        """Full-text search over stored prophecies, best match first"""
+        started = time.perf_counter()
+        try:
+            results = self.store.search(query, limit, offset)
+            metrics.record_near("search_prophecies", "local", started, "ok" if results else "miss")
+            return results
+        except Exception as e:
+            logger.error(f"Error searching prophecies: {str(e)}")
+            metrics.record_near("search_prophecies", "local", started, "error")
+            return []
 
-        # Try blockchain first if enabled
+    def rebuild_search_index(self, page_size=100):
+        """Rebuild the search index from local storage plus, when enabled, the chain"""
+        self.store.rebuild_search_index()
         if self.blockchain_enabled:
+            batch = []
+            for prophecy_id, prophecy in self.iter_latest_prophecies(page_size=page_size):
+                batch.append((prophecy_id, prophecy.get("text", ""), prophecy.get("created_at")))
+                if len(batch) >= page_size:
+                    self.store.index_documents(batch)
+                    batch = []
+            self.store.index_documents(batch)
+            self.store.optimize_search_index()
+        return self.store.search_count()
+
+    def prophecy_cache_stats(self):
+        """Hit/miss counters for the get_prophecy cache"""
+        return self.prophecy_cache.stats()
+
+    def _lookup_prophecy(self, prophecy_id):
+        """Get a prophecy with fallback to local storage"""
+        # Try blockchain first if enabled: RPC, then the CLI
+        if self.blockchain_enabled:
+            if self.batch_writer:
+                queued = self.batch_writer.pending(prophecy_id)
+                if queued is not None:
+                    return queued
+
+            started = time.perf_counter()
             try:
-                command = [
-                    "near",
-                    "view",
-                    self.account,
-                    "get_prophecy",
-                    json.dumps({
-                        "prophecy_id": prophecy_id
-                    })
-                ]
-
-                result = subprocess.run(
-                    command,
-                    capture_output=True,
-                    text=True
+                prophecy = governor.call(
+                    "near", self.rpc.view, self.account, "get_prophecy", {"prophecy_id": prophecy_id}
                 )
-
-                if result.returncode == 0:
-                    return json.loads(result.stdout)
-                else:
-                    logger.warning(f"Blockchain retrieval failed, trying local storage: {result.stderr}")
+                metrics.record_near("get_prophecy", "rpc", started, "ok" if prophecy is not None else "miss")
+                if prophecy is not None:
+                    return prophecy
+            except CircuitOpenError as e:
+                metrics.record_near("get_prophecy", "rpc", started, "rejected")
+                logger.warning(f"Skipping blockchain retrieval: {str(e)}")
             except Exception as e:
-                logger.warning(f"Error in blockchain retrieval, trying local storage: {str(e)}")
-
-        # Fall back to local storage
-        return self._get_local(prophecy_id)
\ No newline at end of file
+                metrics.record_near("get_prophecy", "rpc", started, "error")
+                logger.warning(f"RPC retrieval failed, trying NEAR CLI: {str(e)}")
+
+                started = time.perf_counter()
+                try:
+                    prophecy = self._get_via_cli(prophecy_id)
+                    metrics.record_near("get_prophecy", "cli", started, "ok" if prophecy is not None else "miss")
+                    if prophecy is not None:
+                        return prophecy
+                except Exception as e:
+                    metrics.record_near("get_prophecy", "cli", started, "error")
+                    logger.warning(f"Error in blockchain retrieval, trying local storage: {str(e)}")
+
+        # Fall back to local storage (prophecies that never reached the chain live here)
+        metrics.near_local_fallbacks.inc(operation="get_prophecy", reason=self._fallback_reason())
+        return self._get_local(prophecy_id)
+
+    def iter_prophecies_in_range(self, start_time, end_time, page_size=50):
+        """Yield (prophecy_id, prophecy) pairs with start_time <= timestamp < end_time, oldest first.
+
+        Times are block timestamps in nanoseconds, as the contract records
+        them, so this reads the chain only and yields nothing while the
+        blockchain is disabled. One view call per page of `page_size`.
+        """
+        if not self.blockchain_enabled:
+            logger.warning("Prophecies can only be read by block time from the blockchain, which is disabled")
+            return
+        cursor = None
+        while True:
+            page = governor.call(
+                "near", self.rpc.view, self.account, "get_prophecies_in_range",
+                {"start_time": start_time, "end_time": end_time, "from_cursor": cursor, "limit": page_size}
+            )
+            for prophecy_id, prophecy in page["prophecies"]:
+                yield prophecy_id, prophecy
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+
+    def iter_latest_prophecies(self, page_size=50, limit=None):
+        """Yield (prophecy_id, prophecy) pairs newest first, one page per view call.
+
+        Pages come from the contract's time index while the blockchain is
+        enabled, otherwise (or if the first page cannot be read) from local
+        storage. `limit` caps the total number of prophecies yielded.
+        """
+        yielded = 0
+        if self.blockchain_enabled:
+            cursor = None
+            try:
+                while limit is None or yielded < limit:
+                    size = page_size if limit is None else min(page_size, limit - yielded)
+                    page = governor.call(
+                        "near", self.rpc.view, self.account, "get_latest_prophecies",
+                        {"from_cursor": cursor, "limit": size}
+                    )
+                    for prophecy_id, prophecy in page["prophecies"]:
+                        yield prophecy_id, prophecy
+                    yielded += len(page["prophecies"])
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        break
+                return
+            except Exception as e:
+                if yielded:
+                    raise
+                logger.warning(f"Paging prophecies from the blockchain failed, using local storage: {str(e)}")
+
+        before = None
+        while limit is None or yielded < limit:
+            size = page_size if limit is None else min(page_size, limit - yielded)
+            page = self.store.latest_page(size, before)
+            for prophecy_id, prophecy in page:
+                yield prophecy_id, prophecy
+            yielded += len(page)
+            if len(page) < size:
+                break
+            last_id, last = page[-1]
+            before = (last.get("created_at"), last_id)
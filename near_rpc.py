@@ -0,0 +1,191 @@
+import base64
+import http.client
+import itertools
+import json
+import queue
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from config import NEAR_RPC_URL, NEAR_RPC_POOL_SIZE, NEAR_RPC_TIMEOUT
+from logger import logger
+
+# Gas attached to change calls (100 TGas), matching the near CLI default
+DEFAULT_ATTACHED_GAS = 100000000000000
+
+
+class NearRpcError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class NearRpcClient:
+    """JSON-RPC client for a NEAR node.
+
+    Requests go over a small pool of keep-alive HTTP connections instead of a
+    fresh `near` CLI process per call. View calls need nothing but the pool;
+    change calls sign the transaction locally with NEAR_PRIVATE_KEY using the
+    near-api-py transaction helpers.
+    """
+
+    def __init__(self, account_id=None, private_key=None, rpc_url=None, pool_size=None, timeout=None):
+        self.account_id = account_id
+        self.private_key = private_key
+        self.rpc_url = rpc_url or NEAR_RPC_URL
+        self.timeout = timeout or NEAR_RPC_TIMEOUT
+
+        parts = urlsplit(self.rpc_url)
+        self._scheme = parts.scheme
+        self._host = parts.hostname
+        self._port = parts.port
+        self._path = parts.path or "/"
+        self._pool = queue.LifoQueue(maxsize=pool_size or NEAR_RPC_POOL_SIZE)
+
+        self._signer = None
+        self._nonce = None
+        self._nonce_lock = threading.Lock()
+        # next() on a count is atomic, so concurrent requests never share an id
+        self._request_ids = itertools.count(1)
+
+    def _new_connection(self):
+        if self._scheme == "https":
+            return http.client.HTTPSConnection(self._host, self._port, timeout=self.timeout)
+        return http.client.HTTPConnection(self._host, self._port, timeout=self.timeout)
+
+    @contextmanager
+    def _connection(self):
+        """Check a connection out of the pool, returning it only if it is still usable"""
+        try:
+            conn = self._pool.get_nowait()
+            reused = True
+        except queue.Empty:
+            conn = self._new_connection()
+            reused = False
+
+        try:
+            yield conn, reused
+        except Exception:
+            conn.close()
+            raise
+
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, params):
+        """Send a JSON-RPC request and return its `result`"""
+        body = json.dumps({
+            "jsonrpc": "2.0",
+            "id": next(self._request_ids),
+            "method": method,
+            "params": params
+        })
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+
+        # A pooled connection may have been closed by the server while idle;
+        # retry once on a fresh connection in that case.
+        for attempt in range(2):
+            try:
+                with self._connection() as (conn, reused):
+                    conn.request("POST", self._path, body=body, headers=headers)
+                    response = conn.getresponse()
+                    data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if attempt or not reused:
+                    raise
+
+        if response.status != 200:
+            retry_after = response.getheader("Retry-After")
+            raise NearRpcError(
+                f"RPC {method} returned HTTP {response.status}: {data[:200]!r}",
+                status=response.status,
+                retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+            )
+
+        payload = json.loads(data)
+        if "error" in payload:
+            raise NearRpcError(f"RPC {method} failed: {payload['error']}")
+        return payload["result"]
+
+    def view(self, contract_id, method_name, args):
+        """Call a view method and return its JSON-decoded result"""
+        result = self.request("query", {
+            "request_type": "call_function",
+            "finality": "optimistic",
+            "account_id": contract_id,
+            "method_name": method_name,
+            "args_base64": base64.b64encode(json.dumps(args).encode()).decode()
+        })
+        if "error" in result:
+            raise NearRpcError(f"View {method_name} failed: {result['error']}")
+        raw = bytes(result["result"])
+        return json.loads(raw) if raw else None
+
+    def _get_signer(self):
+        if self._signer is None:
+            if not self.account_id or not self.private_key:
+                raise NearRpcError("NEAR_ACCOUNT and NEAR_PRIVATE_KEY are required for change calls")
+            try:
+                from near_api.signer import KeyPair, Signer
+            except ImportError as e:
+                raise NearRpcError(f"near-api-py is required for change calls: {str(e)}")
+            self._signer = Signer(self.account_id, KeyPair(self.private_key))
+        return self._signer
+
+    def _next_nonce(self, signer):
+        with self._nonce_lock:
+            if self._nonce is None:
+                access_key = self.request("query", {
+                    "request_type": "view_access_key",
+                    "finality": "optimistic",
+                    "account_id": self.account_id,
+                    "public_key": "ed25519:" + signer.key_pair.encoded_public_key()
+                })
+                self._nonce = access_key["nonce"]
+            self._nonce += 1
+            return self._nonce
+
+    def call(self, contract_id, method_name, args, gas=DEFAULT_ATTACHED_GAS, deposit=0):
+        """Sign and submit a function call, waiting for the outcome.
+
+        Returns the JSON-decoded return value of the method (None for unit).
+        """
+        import base58
+        from near_api import transactions
+
+        signer = self._get_signer()
+        nonce = self._next_nonce(signer)
+        block = self.request("block", {"finality": "final"})
+        block_hash = base58.b58decode(block["header"]["hash"])
+
+        action = transactions.create_function_call_action(
+            method_name, json.dumps(args).encode(), gas, deposit
+        )
+        signed_tx = transactions.sign_and_serialize_transaction(
+            contract_id, nonce, [action], block_hash, signer
+        )
+
+        try:
+            result = self.request("broadcast_tx_commit", [base64.b64encode(signed_tx).decode()])
+        except NearRpcError:
+            # The cached nonce may be stale (e.g. the CLI used the same key); refetch next time
+            self._nonce = None
+            raise
+
+        status = result.get("status", {})
+        if "Failure" in status:
+            raise NearRpcError(f"Transaction {method_name} failed: {status['Failure']}")
+
+        value = status.get("SuccessValue")
+        logger.debug(f"Transaction {method_name} committed: {result.get('transaction', {}).get('hash')}")
+        return json.loads(base64.b64decode(value)) if value else None
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -1,7 +1,7 @@
 use near_sdk::borsh::{self, BorshDeserialize, BorshSerialize};
 use near_sdk::serde::{Deserialize, Serialize};
 use near_sdk::{env, near_bindgen, AccountId, PanicOnDefault};
-use near_sdk::collections::UnorderedMap;
+use near_sdk::collections::{UnorderedMap, Vector};
 
 #[derive(BorshDeserialize, BorshSerialize, Serialize, Deserialize)]
 #[serde(crate = "near_sdk::serde")]
@@ -11,9 +11,37 @@ pub struct Prophecy {
     pub creator: AccountId,
 }
 
+/// One page of prophecies plus the cursor to pass back for the next page
+/// (None once there is nothing left).
+#[derive(Serialize, Deserialize)]
+#[serde(crate = "near_sdk::serde")]
+pub struct ProphecyPage {
+    pub prophecies: Vec<(String, Prophecy)>,
+    pub next_cursor: Option<u64>,
+}
+
+/// How many of a set of prophecy ids are stored, and a SHA-256 (hex) over
+/// `id \0 text \0` of each stored one, in the order given.
+#[derive(Serialize, Deserialize)]
+#[serde(crate = "near_sdk::serde")]
+pub struct RangeDigest {
+    pub found: u64,
+    pub digest: String,
+}
+
 #[near_bindgen]
 #[derive(BorshDeserialize, BorshSerialize, PanicOnDefault)]
 pub struct ProphecyOracle {
+    prophecies: UnorderedMap<String, Prophecy>,
+    // Prophecy ids in storage order. Block timestamps never decrease, so this
+    // is also timestamp order and a position in it serves as a page cursor.
+    order: Vector<String>,
+    owner_id: AccountId,
+}
+
+/// State layout before the `order` index was added, read by `migrate`
+#[derive(BorshDeserialize)]
+struct OldProphecyOracle {
     prophecies: UnorderedMap<String, Prophecy>,
     owner_id: AccountId,
 }
@@ -24,36 +52,177 @@ impl ProphecyOracle {
     pub fn new(owner_id: AccountId) -> Self {
         Self {
             prophecies: UnorderedMap::new(b"p"),
+            order: Vector::new(b"o"),
             owner_id,
         }
     }
 
+    /// Rebuild the time index for state written by the previous version.
+    /// Called in the same transaction as every code upgrade; state that
+    /// already has the index is kept as it is.
+    #[private]
+    #[init(ignore_state)]
+    pub fn migrate() -> Self {
+        let state = env::storage_read(b"STATE").expect("No contract state to migrate");
+        if let Ok(current) = Self::try_from_slice(&state) {
+            return current;
+        }
+        let old = OldProphecyOracle::try_from_slice(&state).expect("Unrecognised contract state");
+        let mut entries: Vec<(String, u64)> = old
+            .prophecies
+            .iter()
+            .map(|(prophecy_id, prophecy)| (prophecy_id, prophecy.timestamp))
+            .collect();
+        entries.sort_by_key(|(_, timestamp)| *timestamp);
+
+        let mut order = Vector::new(b"o");
+        for (prophecy_id, _) in entries {
+            order.push(&prophecy_id);
+        }
+        env::log_str(&format!("Indexed {} prophecies", order.len()));
+
+        Self {
+            prophecies: old.prophecies,
+            order,
+            owner_id: old.owner_id,
+        }
+    }
+
     pub fn store_prophecy(&mut self, prophecy_id: String, text: String) {
+        self.assert_owner();
+        self.insert_prophecy(prophecy_id.clone(), text);
+        env::log_str(&format!("Stored prophecy: {}", prophecy_id));
+    }
+
+    /// Store several prophecies in one transaction. Returns how many were stored.
+    pub fn store_prophecies_batch(&mut self, prophecies: Vec<(String, String)>) -> u64 {
+        self.assert_owner();
+        let count = prophecies.len() as u64;
+        for (prophecy_id, text) in prophecies {
+            self.insert_prophecy(prophecy_id, text);
+        }
+        env::log_str(&format!("Stored {} prophecies", count));
+        count
+    }
+
+    pub fn get_prophecy(&self, prophecy_id: String) -> Option<Prophecy> {
+        self.prophecies.get(&prophecy_id)
+    }
+
+    /// Newest prophecies first. Pass the returned `next_cursor` as
+    /// `from_cursor` to continue with older ones; reads are O(limit).
+    pub fn get_latest_prophecies(&self, from_cursor: Option<u64>, limit: u64) -> ProphecyPage {
+        let end = from_cursor.unwrap_or(self.order.len()).min(self.order.len());
+        let start = end.saturating_sub(limit);
+        let prophecies = (start..end).rev().filter_map(|index| self.entry_at(index)).collect();
+
+        ProphecyPage {
+            prophecies,
+            next_cursor: if start > 0 { Some(start) } else { None },
+        }
+    }
+
+    /// Prophecies with start_time <= timestamp < end_time, oldest first.
+    /// The first position is found by binary search over the index, so the
+    /// cost is O(log n + limit).
+    pub fn get_prophecies_in_range(
+        &self,
+        start_time: u64,
+        end_time: u64,
+        from_cursor: Option<u64>,
+        limit: u64,
+    ) -> ProphecyPage {
+        let start = from_cursor.unwrap_or_else(|| self.first_at_or_after(start_time));
+        let mut prophecies = Vec::new();
+        let mut index = start;
+        while index < self.order.len() && (prophecies.len() as u64) < limit {
+            match self.entry_at(index) {
+                Some(entry) if entry.1.timestamp >= end_time => break,
+                Some(entry) => prophecies.push(entry),
+                None => {}
+            }
+            index += 1;
+        }
+
+        let more = index < self.order.len()
+            && self.entry_at(index).map_or(false, |(_, prophecy)| prophecy.timestamp < end_time);
+        ProphecyPage {
+            prophecies,
+            next_cursor: if more { Some(index) } else { None },
+        }
+    }
+
+    pub fn get_prophecy_count(&self) -> u64 {
+        self.order.len()
+    }
+
+    /// Digest of a range of prophecies, so a client holding copies can check
+    /// hundreds of ids against the contract in one view call.
+    pub fn get_prophecies_digest(&self, prophecy_ids: Vec<String>) -> RangeDigest {
+        let mut found = 0;
+        let mut bytes = Vec::new();
+        for prophecy_id in prophecy_ids {
+            if let Some(prophecy) = self.prophecies.get(&prophecy_id) {
+                found += 1;
+                bytes.extend_from_slice(prophecy_id.as_bytes());
+                bytes.push(0);
+                bytes.extend_from_slice(prophecy.text.as_bytes());
+                bytes.push(0);
+            }
+        }
+        let digest = env::sha256(&bytes).iter().map(|byte| format!("{:02x}", byte)).collect();
+        RangeDigest { found, digest }
+    }
+}
+
+impl ProphecyOracle {
+    fn assert_owner(&self) {
         assert_eq!(
             env::predecessor_account_id(),
             self.owner_id,
             "Only the owner can store prophecies"
         );
+    }
 
-        let prophecy = Prophecy {
-            text,
-            timestamp: env::block_timestamp(),
-            creator: env::predecessor_account_id(),
+    fn insert_prophecy(&mut self, prophecy_id: String, text: String) {
+        // Re-storing an id replaces the text but keeps its original time and
+        // index position, so the index stays in timestamp order
+        let prophecy = match self.prophecies.get(&prophecy_id) {
+            Some(existing) => Prophecy { text, ..existing },
+            None => {
+                self.order.push(&prophecy_id);
+                Prophecy {
+                    text,
+                    timestamp: env::block_timestamp(),
+                    creator: env::predecessor_account_id(),
+                }
+            }
         };
 
         self.prophecies.insert(&prophecy_id, &prophecy);
-        env::log_str(&format!("Stored prophecy: {}", prophecy_id));
     }
 
-    pub fn get_prophecy(&self, prophecy_id: String) -> Option<Prophecy> {
-        self.prophecies.get(&prophecy_id)
+    fn entry_at(&self, index: u64) -> Option<(String, Prophecy)> {
+        let prophecy_id = self.order.get(index)?;
+        let prophecy = self.prophecies.get(&prophecy_id)?;
+        Some((prophecy_id, prophecy))
     }
 
-    pub fn get_latest_prophecies(&self, limit: u64) -> Vec<(String, Prophecy)> {
-        self.prophecies
-            .iter()
-            .take(limit as usize)
-            .collect()
+    /// Index of the first prophecy stored at or after `timestamp`
+    fn first_at_or_after(&self, timestamp: u64) -> u64 {
+        let (mut low, mut high) = (0, self.order.len());
+        while low < high {
+            let mid = low + (high - low) / 2;
+            let before = self
+                .entry_at(mid)
+                .map_or(false, |(_, prophecy)| prophecy.timestamp < timestamp);
+            if before {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        low
     }
 }
 
@@ -84,4 +253,114 @@ mod tests {
         let stored_prophecy = contract.get_prophecy(prophecy_id).unwrap();
         assert_eq!(stored_prophecy.text, prophecy_text);
     }
+
+    #[test]
+    fn test_store_prophecies_batch() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        let context = get_context(owner.clone());
+        testing_env!(context.build());
+
+        let mut contract = ProphecyOracle::new(owner);
+        let stored = contract.store_prophecies_batch(vec![
+            ("prophecy_1".to_string(), "Liquidity rises".to_string()),
+            ("prophecy_2".to_string(), "The DAO awakens".to_string()),
+        ]);
+
+        assert_eq!(stored, 2);
+        assert_eq!(contract.get_prophecy("prophecy_2".to_string()).unwrap().text, "The DAO awakens");
+    }
+
+    fn store_at(contract: &mut ProphecyOracle, owner: &AccountId, timestamp: u64, prophecy_id: &str) {
+        let mut context = get_context(owner.clone());
+        context.block_timestamp(timestamp);
+        testing_env!(context.build());
+        contract.store_prophecy(prophecy_id.to_string(), format!("Prophecy {}", prophecy_id));
+    }
+
+    #[test]
+    fn test_get_latest_prophecies_pages_newest_first() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        testing_env!(get_context(owner.clone()).build());
+        let mut contract = ProphecyOracle::new(owner.clone());
+        for (timestamp, prophecy_id) in [(10, "a"), (20, "b"), (30, "c"), (40, "d"), (50, "e")] {
+            store_at(&mut contract, &owner, timestamp, prophecy_id);
+        }
+
+        let first = contract.get_latest_prophecies(None, 2);
+        let ids: Vec<&str> = first.prophecies.iter().map(|(id, _)| id.as_str()).collect();
+        assert_eq!(ids, vec!["e", "d"]);
+
+        let second = contract.get_latest_prophecies(first.next_cursor, 2);
+        let ids: Vec<&str> = second.prophecies.iter().map(|(id, _)| id.as_str()).collect();
+        assert_eq!(ids, vec!["c", "b"]);
+
+        let last = contract.get_latest_prophecies(second.next_cursor, 2);
+        assert_eq!(last.prophecies.len(), 1);
+        assert_eq!(last.next_cursor, None);
+    }
+
+    #[test]
+    fn test_get_prophecies_in_range() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        testing_env!(get_context(owner.clone()).build());
+        let mut contract = ProphecyOracle::new(owner.clone());
+        for (timestamp, prophecy_id) in [(10, "a"), (20, "b"), (30, "c"), (40, "d"), (50, "e")] {
+            store_at(&mut contract, &owner, timestamp, prophecy_id);
+        }
+
+        let page = contract.get_prophecies_in_range(15, 45, None, 2);
+        let ids: Vec<&str> = page.prophecies.iter().map(|(id, _)| id.as_str()).collect();
+        assert_eq!(ids, vec!["b", "c"]);
+
+        let rest = contract.get_prophecies_in_range(15, 45, page.next_cursor, 2);
+        let ids: Vec<&str> = rest.prophecies.iter().map(|(id, _)| id.as_str()).collect();
+        assert_eq!(ids, vec!["d"]);
+        assert_eq!(rest.next_cursor, None);
+    }
+
+    #[test]
+    fn test_restore_keeps_index_position() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        testing_env!(get_context(owner.clone()).build());
+        let mut contract = ProphecyOracle::new(owner.clone());
+        store_at(&mut contract, &owner, 10, "a");
+        store_at(&mut contract, &owner, 20, "b");
+        store_at(&mut contract, &owner, 30, "a");
+
+        assert_eq!(contract.get_prophecy_count(), 2);
+        assert_eq!(contract.get_prophecy("a".to_string()).unwrap().timestamp, 10);
+    }
+
+    #[test]
+    fn test_get_prophecies_digest_covers_stored_ids() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        testing_env!(get_context(owner.clone()).build());
+        let mut contract = ProphecyOracle::new(owner);
+        contract.store_prophecy("prophecy_1".to_string(), "Liquidity rises".to_string());
+
+        let partial = contract.get_prophecies_digest(vec!["prophecy_1".to_string(), "prophecy_2".to_string()]);
+        assert_eq!(partial.found, 1);
+        // sha256("prophecy_1\0Liquidity rises\0"), as reconciler.range_digest computes it
+        let expected: String = env::sha256(b"prophecy_1\0Liquidity rises\0")
+            .iter()
+            .map(|byte| format!("{:02x}", byte))
+            .collect();
+        assert_eq!(partial.digest, expected);
+
+        contract.store_prophecy("prophecy_2".to_string(), "The DAO awakens".to_string());
+        let full = contract.get_prophecies_digest(vec!["prophecy_1".to_string(), "prophecy_2".to_string()]);
+        assert_eq!(full.found, 2);
+        assert_ne!(full.digest, partial.digest);
+    }
+
+    #[test]
+    #[should_panic(expected = "Only the owner can store prophecies")]
+    fn test_store_prophecies_batch_requires_owner() {
+        let owner: AccountId = "oracle.near".parse().unwrap();
+        testing_env!(get_context(owner.clone()).build());
+        let mut contract = ProphecyOracle::new(owner);
+
+        testing_env!(get_context("intruder.near".parse().unwrap()).build());
+        contract.store_prophecies_batch(vec![("prophecy_1".to_string(), "Forged".to_string())]);
+    }
 }
\ No newline at end of file
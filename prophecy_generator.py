@@ -1,18 +1,83 @@
+import asyncio
 import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from openai import OpenAI
-from config import OPENAI_API_KEY, MAX_PROPHECY_LENGTH
+from functools import cached_property
+from cache import LRUCache, SingleFlight
+from config import (
+    OPENAI_API_KEY,
+    MAX_PROPHECY_LENGTH,
+    CONTEXT_CACHE_SIZE,
+    CONTEXT_CACHE_TTL_SECONDS,
+    MAX_FOLLOW_UPS,
+    INSIGHT_CACHE_SIZE,
+    INSIGHT_CACHE_TTL_SECONDS,
+    INSIGHT_CACHE_PERSIST,
+    PROPHECY_POOL_SIZE,
+    PROPHECY_POOL_LOW_WATER,
+    PROPHECY_BATCH_CHOICES,
+    MAX_CONCURRENT_GENERATIONS,
+    DEDUP_ENABLED,
+    DEDUP_THRESHOLD,
+    DEDUP_MAX_RETRIES
+)
+from dedup import MinHashIndex
 from logger import logger
+import metrics
 from near_handler import NEARHandler
+from prophecy_pool import ProphecyPool
+from governor import governor
+
+# Themes understood by _get_theme_prompt; anything else is treated as "general"
+THEMES = ("defi", "nft", "dao", "general")
+
+# Bump whenever the insight prompt changes so cached insights are not reused
+INSIGHT_PROMPT_VERSION = 1
 
 class ProphecyGenerator:
     def __init__(self):
-        self.client = OpenAI(api_key=OPENAI_API_KEY)
         self.model = "gpt-4"  # Using standard GPT-4 model
         self.near_handler = NEARHandler()
-        self.context = {}  # Store prophecy context for follow-up questions
+        # Prophecy context for follow-up questions, bounded by size and age
+        self.context = LRUCache(CONTEXT_CACHE_SIZE, ttl=CONTEXT_CACHE_TTL_SECONDS)
+        self._last_timestamp = 0
+        self._timestamp_lock = threading.Lock()
+        # Insights keyed by (prophecy id, prompt version); concurrent misses share one request
+        self.insights = LRUCache(INSIGHT_CACHE_SIZE, ttl=INSIGHT_CACHE_TTL_SECONDS)
+        self._insight_flights = SingleFlight()
+        # MinHash index of every archived prophecy, built on first use
+        self._duplicates = None
+        self._duplicates_lock = threading.Lock()
+
+        # Optional pool of ready prophecies per theme, refilled in the background
+        self.pool = None
+        if PROPHECY_POOL_SIZE > 0:
+            self.pool = ProphecyPool(
+                self.near_handler.store,
+                self._request_prophecies,
+                THEMES,
+                PROPHECY_POOL_SIZE,
+                PROPHECY_POOL_LOW_WATER
+            )
+            self.pool.start()
         logger.info("ProphecyGenerator initialized with local storage fallback")
 
+    # The openai package takes over a second to import, so the clients are
+    # built on first use rather than while the bot is starting up
+    @cached_property
+    def client(self):
+        from openai import OpenAI
+        # Retries are handled by the request governor
+        return OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
+    @cached_property
+    def async_client(self):
+        from openai import AsyncOpenAI
+        return AsyncOpenAI(api_key=OPENAI_API_KEY, max_retries=0)
+
     def _get_theme_prompt(self, theme=None):
         """Generate a theme-specific prompt"""
         base_prompt = (
@@ -31,45 +96,302 @@ class ProphecyGenerator:
 
         return theme_prompts.get(theme.lower(), theme_prompts["general"]) if theme else theme_prompts["general"]
 
+    def _prophecy_request(self, theme=None):
+        """Chat completion arguments for a new prophecy"""
+        return dict(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": self._get_theme_prompt(theme)
+                },
+                {
+                    "role": "user",
+                    "content": "Channel your mystic powers and reveal a prophecy about the future of Web3."
+                }
+            ],
+            max_tokens=150,
+            temperature=0.8
+        )
+
+    def _insight_request(self, prophecy):
+        """Chat completion arguments for an insight into a prophecy"""
+        return dict(
+            model=self.model,
+            messages=[
+                {
+                    "role": "system",
+                    "content": "You are a mystical oracle providing deeper insights into previous prophecies. Explain the hidden meanings and implications while maintaining a mystical tone."
+                },
+                {
+                    "role": "user",
+                    "content": f"Reveal deeper insights about this prophecy: {prophecy}"
+                }
+            ],
+            max_tokens=200,
+            temperature=0.7
+        )
+
+    @staticmethod
+    def _theme_key(theme):
+        """Normalize a user-supplied theme to one of THEMES"""
+        theme = theme.lower() if theme else "general"
+        return theme if theme in THEMES else "general"
+
+    def _request_prophecy(self, theme=None):
+        """Ask the model for a fresh prophecy and return its text"""
+        return self._request_prophecies(theme, 1)[0]
+
+    def _request_prophecies(self, theme=None, count=1):
+        """Ask the model for `count` prophecies in a single multi-choice request"""
+        with metrics.openai_request_seconds.time(kind="prophecy", stream="false"):
+            response = governor.call(
+                "openai", self.client.chat.completions.create, n=count, **self._prophecy_request(theme)
+            )
+        metrics.record_usage("prophecy", getattr(response, "usage", None))
+        return [choice.message.content.strip() for choice in response.choices]
+
+    async def _complete_async(self, kind, request):
+        """Run a chat completion on the event loop and return its text"""
+        with metrics.openai_request_seconds.time(kind=kind, stream="false"):
+            response = await governor.acall("openai", self.async_client.chat.completions.create, **request)
+        metrics.record_usage(kind, getattr(response, "usage", None))
+        return response.choices[0].message.content.strip()
+
+    async def _stream_completion(self, kind, request, on_partial):
+        """Stream a chat completion, passing the text so far to `on_partial` as it grows"""
+        with metrics.openai_request_seconds.time(kind=kind, stream="true"):
+            stream = await governor.acall(
+                "openai", self.async_client.chat.completions.create,
+                stream=True, stream_options={"include_usage": True}, **request
+            )
+            text = ""
+            async for chunk in stream:
+                # The final chunk carries usage and no choices
+                metrics.record_usage(kind, getattr(chunk, "usage", None))
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    text += delta
+                    await on_partial(text)
+        return text.strip()
+
+    def _take_pooled(self, theme):
+        """Serve a pre-generated prophecy if the pool has one"""
+        if self.pool is None:
+            return None
+        prophecy = self.pool.take(self._theme_key(theme))
+        if prophecy is not None:
+            logger.info(f"Serving pre-generated prophecy for theme: {theme}")
+        return prophecy
+
+    def _duplicate_index(self):
+        """The archive's near-duplicate index, loaded from the search index on first use"""
+        with self._duplicates_lock:
+            if self._duplicates is None:
+                started = time.perf_counter()
+                index = MinHashIndex(DEDUP_THRESHOLD)
+                count = index.add_many(self.near_handler.store.iter_texts(indexed=True))
+                logger.info(f"Loaded {count} prophecies into the duplicate index in "
+                            f"{time.perf_counter() - started:.2f}s")
+                self._duplicates = index
+            return self._duplicates
+
+    def _find_duplicate(self, prophecy):
+        """(prophecy id, similarity) of an archived near-duplicate, or None"""
+        if not DEDUP_ENABLED:
+            return None
+        try:
+            return self._duplicate_index().find_duplicate(prophecy)
+        except Exception as e:
+            logger.error(f"Error checking for duplicate prophecy: {str(e)}")
+            return None
+
+    def _is_repeat(self, prophecy, attempt):
+        """Whether to regenerate `prophecy`, which was attempt number `attempt`"""
+        duplicate = self._find_duplicate(prophecy)
+        if duplicate is None:
+            return False
+        prophecy_id, similarity = duplicate
+        if attempt >= DEDUP_MAX_RETRIES:
+            logger.warning(f"Keeping prophecy {similarity:.0%} similar to {prophecy_id} "
+                           f"after {attempt} regenerations")
+            metrics.prophecy_duplicates.inc(action="accepted")
+            return False
+        logger.info(f"Prophecy is {similarity:.0%} similar to {prophecy_id}, regenerating")
+        metrics.prophecy_duplicates.inc(action="regenerated")
+        return True
+
+    def _store_prophecy(self, prophecy, timestamp):
+        """Persist a prophecy; blocking, so async callers run it in an executor"""
+        stored = self.near_handler.store_prophecy(prophecy, timestamp)
+        if stored:
+            self._index_stored([(prophecy, timestamp)])
+            logger.info(f"Prophecy stored successfully with timestamp {timestamp}")
+        else:
+            logger.warning("Failed to store prophecy, but continuing with generation")
+        return stored
+
+    def _index_stored(self, items):
+        """Add stored (prophecy, timestamp) pairs to the duplicate index; unstored text must not block new prophecies"""
+        if not DEDUP_ENABLED:
+            return
+        try:
+            self._duplicate_index().add_many((f"prophecy_{timestamp}", prophecy) for prophecy, timestamp in items)
+        except Exception as e:
+            logger.error(f"Error indexing stored prophecies for deduplication: {str(e)}")
+
+    def _next_timestamp(self):
+        """Allocate a unique prophecy timestamp.
+
+        Two prophecies in the same second would otherwise share an id, so the
+        value is bumped past the last one handed out, by this or any other
+        process sharing the store (sharded bot workers, bulk generation).
+        """
+        with self._timestamp_lock:
+            timestamp = max(int(datetime.now().timestamp()), self._last_timestamp + 1)
+            try:
+                timestamp = self.near_handler.store.allocate_timestamp(timestamp)
+            except Exception as e:
+                logger.warning(f"Could not allocate a shared timestamp, using a local one: {str(e)}")
+            self._last_timestamp = timestamp
+            return timestamp
+
+    def _remember(self, prophecy, theme, timestamp):
+        """Store context for follow-up questions"""
+        context = {
+            'prophecy': prophecy,
+            'theme': theme,
+            'follow_ups': deque(maxlen=MAX_FOLLOW_UPS)
+        }
+        self.context.set(timestamp, context)
+        return context
+
+    def _rehydrate(self, timestamp):
+        """Rebuild an evicted context from storage; returns None if the prophecy is unknown"""
+        stored = self.near_handler.get_prophecy(timestamp)
+        if not stored or not stored.get('text'):
+            return None
+        logger.info(f"Rehydrated context for prophecy {timestamp} from storage")
+        return self._remember(stored['text'], None, timestamp)
+
+    def context_stats(self):
+        """Hit/miss counters for the context cache"""
+        return self.context.stats()
+
     def generate_prophecy(self, theme=None):
         """Generate a mystic Web3 prophecy using OpenAI"""
+        started = time.perf_counter()
         try:
-            logger.info(f"Generating new prophecy with theme: {theme}")
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._get_theme_prompt(theme)
-                    },
-                    {
-                        "role": "user",
-                        "content": "Channel your mystic powers and reveal a prophecy about the future of Web3."
-                    }
-                ],
-                max_tokens=150,
-                temperature=0.8
-            )
-
-            # Extract and clean up the prophecy text
-            prophecy = response.choices[0].message.content.strip()
-            logger.info(f"Generated prophecy: {prophecy}")
+            prophecy = self._take_pooled(theme)
+            source = "pool" if prophecy is not None else "openai"
+            attempt = 0
+            while prophecy is None or self._is_repeat(prophecy, attempt):
+                if prophecy is not None:
+                    attempt += 1
+                    source = "openai"
+                logger.info(f"Generating new prophecy with theme: {theme}")
+                prophecy = self._request_prophecy(theme)
+                logger.debug("Generated prophecy: %s", prophecy)
 
             # Store prophecy with timestamp
-            timestamp = int(datetime.now().timestamp())
-            stored = self.near_handler.store_prophecy(prophecy, timestamp)
+            timestamp = self._next_timestamp()
+            self._store_prophecy(prophecy, timestamp)
+            self._remember(prophecy, theme, timestamp)
+            metrics.generation_seconds.observe(time.perf_counter() - started, mode="sync", source=source)
+
+            return prophecy, timestamp
+
+        except Exception as e:
+            logger.error(f"Error generating prophecy: {str(e)}")
+            raise Exception(f"Failed to generate prophecy: {str(e)}")
+
+    def generate_prophecies(self, theme=None, count=1):
+        """Generate `count` prophecies in bulk and store them in one batched write.
+
+        Requests ask for up to PROPHECY_BATCH_CHOICES completions each and run
+        in parallel under the request governor's OpenAI quota. Returns a list of
+        (prophecy, timestamp) pairs; failed requests and near-duplicates,
+        which are dropped rather than regenerated, only shorten the list.
+        """
+        if count < 1:
+            raise ValueError(f"count must be at least 1, got {count}")
+        sizes = [PROPHECY_BATCH_CHOICES] * (count // PROPHECY_BATCH_CHOICES)
+        if count % PROPHECY_BATCH_CHOICES:
+            sizes.append(count % PROPHECY_BATCH_CHOICES)
 
-            # Store context for follow-up questions
-            self.context[timestamp] = {
-                'prophecy': prophecy,
-                'theme': theme,
-                'follow_ups': []
-            }
+        logger.info(f"Generating {count} prophecies with theme {theme} in {len(sizes)} requests")
+        prophecies = []
+        errors = []
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS) as executor:
+            futures = [executor.submit(self._request_prophecies, theme, size) for size in sizes]
+            for future in as_completed(futures):
+                try:
+                    prophecies.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Error in bulk prophecy request: {str(e)}")
+                    errors.append(e)
 
-            if stored:
-                logger.info(f"Prophecy stored successfully with timestamp {timestamp}")
-            else:
-                logger.warning("Failed to store prophecy, but continuing with generation")
+        if not prophecies and errors:
+            raise Exception(f"Failed to generate prophecies: {str(errors[0])}")
+
+        # Drop repeats of the archive or of earlier prophecies in this batch
+        items = []
+        batch = MinHashIndex(DEDUP_THRESHOLD)
+        for prophecy in prophecies:
+            # Checked against this batch too, since nothing in it is indexed until it is stored
+            if self._find_duplicate(prophecy) is not None or (DEDUP_ENABLED and batch.find_duplicate(prophecy)):
+                metrics.prophecy_duplicates.inc(action="dropped")
+                continue
+            timestamp = self._next_timestamp()
+            if DEDUP_ENABLED:
+                batch.add(f"prophecy_{timestamp}", prophecy)
+            items.append((prophecy, timestamp))
+        if len(items) < len(prophecies):
+            logger.info(f"Dropped {len(prophecies) - len(items)} near-duplicate prophecies from the batch")
+
+        if self.near_handler.store_prophecies(items):
+            self._index_stored(items)
+        else:
+            logger.warning(f"Failed to store batch of {len(items)} prophecies")
+        for prophecy, timestamp in items:
+            self._remember(prophecy, theme, timestamp)
+        return items
+
+    async def generate_prophecy_async(self, theme=None, on_partial=None):
+        """Non-blocking variant of generate_prophecy for use on the bot's event loop.
+
+        With `on_partial`, the completion is streamed and the coroutine is
+        awaited with the text received so far; the prophecy is only stored
+        once the stream has finished. A regenerated near-duplicate streams
+        again from the start.
+        """
+        started = time.perf_counter()
+        try:
+            prophecy = None
+            if self.pool is not None:
+                prophecy = await asyncio.to_thread(self._take_pooled, theme)
+            source = "pool" if prophecy is not None else "openai"
+            attempt = 0
+            # The first check may load the duplicate index, so keep it off the loop
+            while prophecy is None or await asyncio.to_thread(self._is_repeat, prophecy, attempt):
+                if prophecy is not None:
+                    attempt += 1
+                    source = "openai"
+                logger.info(f"Generating new prophecy with theme: {theme}")
+                request = self._prophecy_request(theme)
+                if on_partial is not None:
+                    prophecy = await self._stream_completion("prophecy", request, on_partial)
+                else:
+                    prophecy = await self._complete_async("prophecy", request)
+                logger.debug("Generated prophecy: %s", prophecy)
+
+            # Storage may shell out to the NEAR CLI or hit the disk, so keep it off the loop
+            timestamp = await asyncio.to_thread(self._next_timestamp)
+            await asyncio.to_thread(self._store_prophecy, prophecy, timestamp)
+            self._remember(prophecy, theme, timestamp)
+            metrics.generation_seconds.observe(
+                time.perf_counter() - started, mode="stream" if on_partial else "async", source=source
+            )
 
             return prophecy, timestamp
 
@@ -77,35 +399,123 @@ class ProphecyGenerator:
             logger.error(f"Error generating prophecy: {str(e)}")
             raise Exception(f"Failed to generate prophecy: {str(e)}")
 
+    def _persisted_insight(self, key):
+        """Look up an insight persisted by this or another process.
+
+        get_insight* has already missed the in-memory cache, so it is not
+        consulted again here; that would count every miss twice.
+        """
+        if not INSIGHT_CACHE_PERSIST:
+            return None
+        insight = self.near_handler.store.get_insight(*key, max_age=INSIGHT_CACHE_TTL_SECONDS)
+        if insight is not None:
+            self.insights.set(key, insight)
+        return insight
+
+    def _cache_insight(self, key, insight):
+        self.insights.set(key, insight)
+        if INSIGHT_CACHE_PERSIST:
+            self.near_handler.store.put_insight(*key, insight)
+
+    def _compute_insight(self, timestamp, key):
+        """Return a cached insight or ask the model; None if the prophecy is unknown"""
+        insight = self._persisted_insight(key)
+        if insight is not None:
+            return insight
+
+        context = self.context.get(timestamp) or self._rehydrate(timestamp)
+        if context is None:
+            return None
+
+        with metrics.openai_request_seconds.time(kind="insight", stream="false"):
+            response = governor.call(
+                "openai", self.client.chat.completions.create, **self._insight_request(context['prophecy'])
+            )
+        metrics.record_usage("insight", getattr(response, "usage", None))
+
+        insight = response.choices[0].message.content.strip()
+        context['follow_ups'].append(insight)
+        self._cache_insight(key, insight)
+        return insight
+
+    async def _compute_insight_async(self, timestamp, key, on_partial=None):
+        insight = await asyncio.to_thread(self._persisted_insight, key)
+        if insight is not None:
+            return insight
+
+        context = self.context.get(timestamp)
+        if context is None:
+            context = await asyncio.to_thread(self._rehydrate, timestamp)
+        if context is None:
+            return None
+
+        request = self._insight_request(context['prophecy'])
+        if on_partial is not None:
+            insight = await self._stream_completion("insight", request, on_partial)
+        else:
+            insight = await self._complete_async("insight", request)
+        context['follow_ups'].append(insight)
+        await asyncio.to_thread(self._cache_insight, key, insight)
+        return insight
+
     def get_insight(self, timestamp):
         """Generate additional insight for a previous prophecy"""
         try:
-            if timestamp not in self.context:
+            key = (f"prophecy_{timestamp}", INSIGHT_PROMPT_VERSION)
+            with metrics.insight_seconds.time(mode="sync"):
+                insight = self.insights.get(key)
+                if insight is None:
+                    insight = self._insight_flights.do(key, lambda: self._compute_insight(timestamp, key))
+            if insight is None:
                 return "I cannot recall the prophecy you're referring to. Please request a new prophecy."
+            return insight
 
-            context = self.context[timestamp]
-            prophecy = context['prophecy']
-
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a mystical oracle providing deeper insights into previous prophecies. Explain the hidden meanings and implications while maintaining a mystical tone."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Reveal deeper insights about this prophecy: {prophecy}"
-                    }
-                ],
-                max_tokens=200,
-                temperature=0.7
-            )
+        except Exception as e:
+            logger.error(f"Error generating insight: {str(e)}")
+            return "The mystic forces are clouded. I cannot provide further insights at this moment."
 
-            insight = response.choices[0].message.content.strip()
-            context['follow_ups'].append(insight)
+    async def get_insight_async(self, timestamp, on_partial=None):
+        """Non-blocking variant of get_insight for use on the bot's event loop.
+
+        `on_partial` streams a freshly generated insight as in
+        generate_prophecy_async; callers that join an in-flight request only
+        receive the final text.
+        """
+        try:
+            key = (f"prophecy_{timestamp}", INSIGHT_PROMPT_VERSION)
+            with metrics.insight_seconds.time(mode="stream" if on_partial else "async"):
+                insight = self.insights.get(key)
+                if insight is None:
+                    insight = await self._insight_flights.do_async(
+                        key, lambda: self._compute_insight_async(timestamp, key, on_partial)
+                    )
+            if insight is None:
+                return "I cannot recall the prophecy you're referring to. Please request a new prophecy."
             return insight
 
         except Exception as e:
             logger.error(f"Error generating insight: {str(e)}")
-            return "The mystic forces are clouded. I cannot provide further insights at this moment."
\ No newline at end of file
+            return "The mystic forces are clouded. I cannot provide further insights at this moment."
+
+    def insight_stats(self):
+        """Hit/miss counters for the in-memory insight cache"""
+        return self.insights.stats()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def positive_int(value):
+        number = int(value)
+        if number < 1:
+            raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+        return number
+
+    parser = argparse.ArgumentParser(description="Generate prophecies in bulk into the prophecy store")
+    parser.add_argument("--count", type=positive_int, default=10, help="number of prophecies to generate")
+    parser.add_argument("--theme", default=None, help="defi, nft, dao or general")
+    args = parser.parse_args()
+
+    generator = ProphecyGenerator()
+    for prophecy, timestamp in generator.generate_prophecies(args.theme, args.count):
+        print(f"prophecy_{timestamp}: {prophecy}")
@@ -0,0 +1,86 @@
+import os
+import socket
+import threading
+from logger import logger
+
+LEASE_NAME = "prophecy-pool"
+# Renewed before each theme, so it only has to outlast one theme's requests
+LEASE_SECONDS = 600
+
+
+class ProphecyPool:
+    """Per-theme pool of pre-generated prophecies.
+
+    Ready prophecies live in the store's prophecy_pool table, so the pool
+    survives restarts and is shared by every process using the same store.
+    A background thread keeps each theme topped up to `size` and wakes early
+    whenever a take leaves a theme below `low_water`. `fetch(theme, count)`
+    returns a list of new prophecies for a theme. A lease in the store lets
+    only one process refill at a time, so sharded workers don't overfill it.
+    """
+
+    def __init__(self, store, fetch, themes, size, low_water, retry_seconds=30):
+        self.store = store
+        self.fetch = fetch
+        self.themes = list(themes)
+        self.size = size
+        self.low_water = low_water
+        self.retry_seconds = retry_seconds
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prophecy-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def take(self, theme):
+        """Pop the oldest ready prophecy for theme, or None if the pool is empty"""
+        prophecy = self.store.pool_pop(theme)
+        if prophecy is None or self.store.pool_count(theme) < self.low_water:
+            self._wake.set()
+        return prophecy
+
+    def levels(self):
+        return {theme: self.store.pool_count(theme) for theme in self.themes}
+
+    def refill(self):
+        """Top every theme up to the target size.
+
+        Returns how many were added, or None while another process holds the
+        refill lease.
+        """
+        added = 0
+        try:
+            for theme in self.themes:
+                if not self.store.acquire_lease(LEASE_NAME, self.owner, LEASE_SECONDS):
+                    return None
+                missing = self.size - self.store.pool_count(theme)
+                if missing <= 0 or self._stopped.is_set():
+                    continue
+                for prophecy in self.fetch(theme, missing):
+                    self.store.pool_push(theme, prophecy)
+                    added += 1
+        finally:
+            self.store.release_lease(LEASE_NAME, self.owner)
+        return added
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                added = self.refill()
+                if added:
+                    logger.info(f"Prophecy pool refilled with {added} prophecies: {self.levels()}")
+                # Another process is refilling; check again later in case it stops
+                timeout = self.retry_seconds if added is None else None
+            except Exception as e:
+                logger.warning(f"Prophecy pool refill failed, retrying in {self.retry_seconds}s: {str(e)}")
+                timeout = self.retry_seconds
+            self._wake.wait(timeout)
@@ -0,0 +1,550 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from config import PROPHECY_DB_PATH, PROPHECY_STORE_CHECKPOINT_INTERVAL
+from logger import logger
+
+# Words as the FTS5 unicode61 tokenizer sees them; everything else is dropped from queries
+SEARCH_TERM = re.compile(r"\w+")
+CREATE_SEARCH_INDEX = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS prophecy_search"
+    " USING fts5(text, tokenize = 'porter unicode61 remove_diacritics 2')"
+)
+
+
+class ProphecyStore:
+    """Local prophecy archive backed by a SQLite table in WAL mode.
+
+    Each write touches a single row instead of rewriting the whole archive,
+    point lookups go through the primary key index, and WAL mode lets the bot
+    and the web app read and write the same file concurrently.
+    """
+
+    def __init__(self, path=None, legacy_json_path="prophecies.json"):
+        self.path = path or PROPHECY_DB_PATH
+        self.checkpoint_interval = PROPHECY_STORE_CHECKPOINT_INTERVAL
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writes_since_checkpoint = 0
+
+        self._init_schema()
+        if legacy_json_path:
+            self.migrate_json(legacy_json_path)
+
+    def _connect(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS prophecies ("
+            " id TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " timestamp INTEGER,"
+            " created_at TEXT,"
+            " data TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_prophecies_created_at ON prophecies(created_at)"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS insights ("
+            " prophecy_id TEXT NOT NULL,"
+            " prompt_version INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (prophecy_id, prompt_version))"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS prophecy_pool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " theme TEXT NOT NULL,"
+            " text TEXT NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_prophecy_pool_theme ON prophecy_pool(theme, id)")
+        # Last prophecy per (guild, channel, user), shared by every bot process;
+        # 0 stands for "none" (DMs have no guild, channel entries no user)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " guild_id INTEGER NOT NULL,"
+            " channel_id INTEGER NOT NULL,"
+            " user_id INTEGER NOT NULL,"
+            " timestamp INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL,"
+            " PRIMARY KEY (guild_id, channel_id, user_id))"
+        )
+
+        # Ids of archived prophecies not yet confirmed on chain, worked off by
+        # the reconciler. Only fallback writes land in the archive, so on first
+        # creation every existing record is queued.
+        outbox_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sync_outbox'"
+        ).fetchone()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_outbox ("
+            " id TEXT PRIMARY KEY,"
+            " timestamp INTEGER,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_outbox_order ON sync_outbox(attempts, timestamp)")
+        if not outbox_exists:
+            conn.execute("INSERT OR IGNORE INTO sync_outbox (id, timestamp) SELECT id, timestamp FROM prophecies")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            " name TEXT PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " expires_at REAL NOT NULL)"
+        )
+
+        # Full-text index: an FTS5 table (postings plus per-document lengths for
+        # BM25) whose integer rowids map to prophecy ids through search_docs.
+        # It also covers prophecies that live only on chain, so it is kept
+        # apart from the prophecies table rather than as external content.
+        indexed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'prophecy_search'"
+        ).fetchone()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_docs ("
+            " doc INTEGER PRIMARY KEY,"
+            " id TEXT NOT NULL UNIQUE,"
+            " created_at TEXT)"
+        )
+        conn.execute(CREATE_SEARCH_INDEX)
+        if not indexed:
+            self.rebuild_search_index()
+
+    @staticmethod
+    def _row(prophecy_id, prophecy_data):
+        return (
+            prophecy_id,
+            prophecy_data.get("text", ""),
+            prophecy_data.get("timestamp"),
+            prophecy_data.get("created_at"),
+            json.dumps(prophecy_data),
+        )
+
+    def put(self, prophecy_id, prophecy_data):
+        """Insert or replace a single prophecy record"""
+        self.put_many([(prophecy_id, prophecy_data)])
+
+    def put_many(self, items):
+        """Insert or replace several (prophecy_id, prophecy_data) pairs in one transaction.
+
+        Archived records exist only locally, so each is also queued in the sync outbox.
+        """
+        rows = [self._row(prophecy_id, data) for prophecy_id, data in items]
+        if not rows:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO prophecies (id, text, timestamp, created_at, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._index(conn, [(row[0], row[1], row[3]) for row in rows])
+            self._queue_sync(conn, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_write(len(rows))
+
+    @staticmethod
+    def _queue_sync(conn, rows):
+        conn.executemany(
+            "INSERT OR IGNORE INTO sync_outbox (id, timestamp) VALUES (?, ?)", [(row[0], row[2]) for row in rows]
+        )
+
+    @staticmethod
+    def _index(conn, documents):
+        """Add or replace (prophecy_id, text, created_at) documents in the search index"""
+        documents = list(documents)
+        conn.executemany(
+            "INSERT INTO search_docs (id, created_at) VALUES (?, ?)"
+            " ON CONFLICT(id) DO UPDATE SET created_at = coalesce(excluded.created_at, created_at)",
+            [(prophecy_id, created_at) for prophecy_id, _, created_at in documents]
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO prophecy_search (rowid, text)"
+            " VALUES ((SELECT doc FROM search_docs WHERE id = ?), ?)",
+            [(prophecy_id, text) for prophecy_id, text, _ in documents]
+        )
+
+    def index_documents(self, documents):
+        """Index (prophecy_id, text, created_at) for prophecies stored elsewhere, e.g. on chain"""
+        documents = list(documents)
+        if not documents:
+            return
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._index(conn, documents)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def rebuild_search_index(self):
+        """Rebuild the search index from the local archive, then merge its b-trees.
+
+        Documents indexed through index_documents that are not in the archive
+        are dropped; NEARHandler.rebuild_search_index adds them back from the chain.
+        """
+        conn = self._connect()
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Dropping the table is far cheaper than deleting every row, which
+            # would re-tokenize each document to remove its postings
+            conn.execute("DROP TABLE prophecy_search")
+            conn.execute(CREATE_SEARCH_INDEX)
+            conn.execute("DELETE FROM search_docs")
+            conn.execute(
+                "INSERT INTO search_docs (id, created_at) SELECT id, created_at FROM prophecies"
+            )
+            conn.execute(
+                "INSERT INTO prophecy_search (rowid, text)"
+                " SELECT search_docs.doc, prophecies.text FROM search_docs"
+                " JOIN prophecies ON prophecies.id = search_docs.id"
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self.optimize_search_index()
+        count = self.search_count()
+        if count:
+            logger.info(f"Indexed {count} prophecies for search in {time.perf_counter() - started:.2f}s")
+        return count
+
+    def optimize_search_index(self):
+        """Merge the index segments into one, keeping it compact and queries fast"""
+        self._connect().execute("INSERT INTO prophecy_search (prophecy_search) VALUES ('optimize')")
+
+    def search_count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM search_docs").fetchone()[0]
+
+    def search(self, query, limit=10, offset=0):
+        """Return prophecies matching every word of `query`, best BM25 match first.
+
+        Each result is a dict with id, text, created_at and score (higher is better).
+        """
+        terms = SEARCH_TERM.findall(query)
+        if not terms:
+            return []
+        # Quoting each word keeps FTS5 query syntax (AND, NEAR, *, ...) out of user input
+        match = " ".join(f'"{term}"' for term in terms)
+        rows = self._connect().execute(
+            "SELECT search_docs.id, hits.text, search_docs.created_at, hits.rank FROM"
+            " (SELECT rowid, text, rank FROM prophecy_search WHERE prophecy_search MATCH ?"
+            "  ORDER BY rank LIMIT ? OFFSET ?) AS hits"
+            " JOIN search_docs ON search_docs.doc = hits.rowid ORDER BY hits.rank",
+            (match, limit, offset)
+        ).fetchall()
+        return [
+            {"id": row[0], "text": row[1], "created_at": row[2], "score": -row[3]}
+            for row in rows
+        ]
+
+    def get(self, prophecy_id):
+        """Return the stored record for prophecy_id, or None"""
+        row = self._connect().execute(
+            "SELECT data FROM prophecies WHERE id = ?", (prophecy_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def latest(self, limit):
+        """Return the newest records by created_at, newest first"""
+        rows = self._connect().execute(
+            "SELECT data FROM prophecies ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def latest_page(self, limit, before=None):
+        """Return (prophecy_id, record) pairs newest first.
+
+        `before` is the (created_at, id) of the last pair of the previous page.
+        """
+        if before is None:
+            rows = self._connect().execute(
+                "SELECT id, data FROM prophecies ORDER BY created_at DESC, id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                "SELECT id, data FROM prophecies WHERE (created_at, id) < (?, ?)"
+                " ORDER BY created_at DESC, id DESC LIMIT ?", (*before, limit)
+            ).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def iter_texts(self, indexed=False, batch_size=1000):
+        """Yield (prophecy_id, text) oldest first.
+
+        With `indexed`, read the search index instead of the archive, which
+        also covers prophecies stored only on chain.
+        """
+        if indexed:
+            sql = ("SELECT search_docs.id, prophecy_search.text FROM search_docs"
+                   " JOIN prophecy_search ON prophecy_search.rowid = search_docs.doc"
+                   " ORDER BY search_docs.created_at, search_docs.id")
+        else:
+            sql = "SELECT id, text FROM prophecies ORDER BY created_at, id"
+        cursor = self._connect().execute(sql)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def delete_many(self, prophecy_ids):
+        """Remove prophecies from the archive and the search index; returns how many were removed"""
+        ids = [(prophecy_id,) for prophecy_id in prophecy_ids]
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            before = conn.total_changes
+            conn.executemany("DELETE FROM prophecies WHERE id = ?", ids)
+            deleted = conn.total_changes - before
+            conn.executemany(
+                "DELETE FROM prophecy_search WHERE rowid = (SELECT doc FROM search_docs WHERE id = ?)", ids
+            )
+            conn.executemany("DELETE FROM search_docs WHERE id = ?", ids)
+            conn.executemany("DELETE FROM sync_outbox WHERE id = ?", ids)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return deleted
+
+    def count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM prophecies").fetchone()[0]
+
+    def get_meta(self, key, default=None):
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def allocate_timestamp(self, at_least):
+        """Atomically hand out a prophecy timestamp >= at_least, above any handed out before.
+
+        A single upsert, so processes sharing the store never receive the same value.
+        """
+        row = self._connect().execute(
+            "INSERT INTO meta (key, value) VALUES ('last_timestamp', ?)"
+            " ON CONFLICT(key) DO UPDATE"
+            " SET value = max(CAST(value AS INTEGER) + 1, CAST(excluded.value AS INTEGER))"
+            " RETURNING CAST(value AS INTEGER)",
+            (at_least,)
+        ).fetchone()
+        return row[0]
+
+    def acquire_lease(self, name, owner, ttl):
+        """Take or renew the named lease for ttl seconds; False while another owner holds it"""
+        now = time.time()
+        row = self._connect().execute(
+            "INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+            " WHERE leases.owner = excluded.owner OR leases.expires_at < ?"
+            " RETURNING owner",
+            (name, owner, now + ttl, now)
+        ).fetchone()
+        return row is not None
+
+    def release_lease(self, name, owner):
+        self._connect().execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+
+    def outbox_count(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sync_outbox").fetchone()[0]
+
+    def outbox_page(self, limit):
+        """Up to `limit` queued (prophecy_id, text) pairs, least-tried and oldest first"""
+        return self._connect().execute(
+            "SELECT sync_outbox.id, prophecies.text FROM sync_outbox"
+            " JOIN prophecies ON prophecies.id = sync_outbox.id"
+            " ORDER BY sync_outbox.attempts, sync_outbox.timestamp LIMIT ?",
+            (limit,)
+        ).fetchall()
+
+    def mark_synced(self, prophecy_ids):
+        """Drop ids confirmed on chain from the outbox; returns how many were queued"""
+        return self._connect().execute(
+            "DELETE FROM sync_outbox WHERE id IN (SELECT value FROM json_each(?))", (json.dumps(list(prophecy_ids)),)
+        ).rowcount
+
+    def mark_sync_failed(self, prophecy_ids):
+        """Count a failed upload, moving the ids behind the rest of the outbox"""
+        self._connect().execute(
+            "UPDATE sync_outbox SET attempts = attempts + 1 WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(prophecy_ids)),)
+        )
+
+    def put_sessions(self, sessions):
+        """Record (guild_id, channel_id, user_id, timestamp) sessions; None ids are stored as 0"""
+        now = time.time()
+        self._connect().executemany(
+            "INSERT OR REPLACE INTO sessions (guild_id, channel_id, user_id, timestamp, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            [(guild_id or 0, channel_id, user_id or 0, timestamp, now)
+             for guild_id, channel_id, user_id, timestamp in sessions]
+        )
+
+    def get_session(self, guild_id, channel_id, user_id, max_age=None):
+        """Timestamp of a recorded session, ignoring it if older than max_age seconds"""
+        row = self._connect().execute(
+            "SELECT timestamp, updated_at FROM sessions WHERE guild_id = ? AND channel_id = ? AND user_id = ?",
+            (guild_id or 0, channel_id, user_id or 0)
+        ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return row[0]
+
+    def prune_sessions(self, max_age):
+        """Delete sessions not updated for max_age seconds; returns how many were removed"""
+        return self._connect().execute(
+            "DELETE FROM sessions WHERE updated_at < ?", (time.time() - max_age,)
+        ).rowcount
+
+    def get_insight(self, prophecy_id, prompt_version, max_age=None):
+        """Return a persisted insight, ignoring it if older than max_age seconds"""
+        row = self._connect().execute(
+            "SELECT text, created_at FROM insights WHERE prophecy_id = ? AND prompt_version = ?",
+            (prophecy_id, prompt_version)
+        ).fetchone()
+        if row is None or (max_age is not None and time.time() - row[1] > max_age):
+            return None
+        return row[0]
+
+    def put_insight(self, prophecy_id, prompt_version, text):
+        self._connect().execute(
+            "INSERT OR REPLACE INTO insights (prophecy_id, prompt_version, text, created_at)"
+            " VALUES (?, ?, ?, ?)",
+            (prophecy_id, prompt_version, text, time.time())
+        )
+
+    def pool_push(self, theme, text):
+        """Add a ready prophecy to the theme's pool"""
+        self._connect().execute("INSERT INTO prophecy_pool (theme, text) VALUES (?, ?)", (theme, text))
+
+    def pool_pop(self, theme):
+        """Atomically remove and return the oldest pooled prophecy for theme"""
+        row = self._connect().execute(
+            "DELETE FROM prophecy_pool WHERE id ="
+            " (SELECT id FROM prophecy_pool WHERE theme = ? ORDER BY id LIMIT 1)"
+            " RETURNING text",
+            (theme,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def pool_count(self, theme):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM prophecy_pool WHERE theme = ?", (theme,)
+        ).fetchone()[0]
+
+    def _after_write(self, count):
+        """Checkpoint the WAL back into the main file every checkpoint_interval writes"""
+        with self._write_lock:
+            self._writes_since_checkpoint += count
+            if self._writes_since_checkpoint < self.checkpoint_interval:
+                return
+            self._writes_since_checkpoint = 0
+        try:
+            self._connect().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.Error as e:
+            logger.warning(f"WAL checkpoint failed: {str(e)}")
+
+    def compact(self):
+        """Fold the WAL into the database and reclaim free pages"""
+        conn = self._connect()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.optimize_search_index()
+        conn.execute("VACUUM")
+
+    def migrate_json(self, json_path):
+        """One-shot import of the legacy prophecies.json archive.
+
+        The import and the "migrated" marker commit in the same transaction,
+        so concurrent processes starting up at once import the file only once.
+        Afterwards the legacy file is renamed to <json_path>.migrated.
+        """
+        if not os.path.exists(json_path):
+            return 0
+
+        try:
+            with open(json_path, 'r') as f:
+                prophecies = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading legacy prophecy file {json_path}: {str(e)}")
+            return 0
+
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            marker = conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (f"migrated:{json_path}",)
+            ).fetchone()
+            if marker:
+                conn.execute("ROLLBACK")
+                return 0
+            rows = [self._row(prophecy_id, data) for prophecy_id, data in prophecies.items()]
+            conn.executemany(
+                "INSERT OR IGNORE INTO prophecies (id, text, timestamp, created_at, data)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._queue_sync(conn, rows)
+            self._index(conn, [
+                (prophecy_id, data.get("text", ""), data.get("created_at"))
+                for prophecy_id, data in prophecies.items()
+                if not conn.execute("SELECT 1 FROM search_docs WHERE id = ?", (prophecy_id,)).fetchone()
+            ])
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                (f"migrated:{json_path}", str(len(prophecies)))
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        try:
+            os.replace(json_path, json_path + ".migrated")
+        except OSError as e:
+            logger.warning(f"Could not rename legacy prophecy file {json_path}: {str(e)}")
+
+        logger.info(f"Migrated {len(prophecies)} prophecies from {json_path} into {self.path}")
+        return len(prophecies)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    # python -m prophecy_store [legacy_json_path]
+    # python -m prophecy_store --reindex
+    store = ProphecyStore(legacy_json_path=None)
+    if sys.argv[1:] == ["--reindex"]:
+        print(f"Indexed {store.rebuild_search_index()} prophecies for search")
+        sys.exit(0)
+    imported = store.migrate_json(sys.argv[1] if len(sys.argv) > 1 else "prophecies.json")
+    print(f"Imported {imported} prophecies; archive now holds {store.count()}")
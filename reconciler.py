@@ -0,0 +1,199 @@
+"""Back-fill prophecies that only reached local storage to the NEAR contract.
+
+A prophecy is archived locally only when its on-chain write fails (or the
+chain is disabled), and every archived id is queued in the store's
+sync_outbox in the same transaction. A reconciler pass works through the
+outbox, least-tried and oldest first:
+
+1. up to `digest_range` queued ids are hashed locally and compared with the
+   contract's get_prophecies_digest for the same ids in one view call; a
+   match means the whole range is already on chain,
+2. a mismatching range is split in half and compared again until each
+   part is either wholly missing or a single id, so a few missing records
+   among thousands cost a few dozen (free) view calls rather than one per
+   record, and only records the chain really lacks are re-stored,
+3. missing records are uploaded with store_prophecies_batch, `batch_size`
+   at a time and `batch_delay` seconds apart on top of the "near" governor
+   quota.
+
+Ids leave the outbox as each range is confirmed or each batch commits, so
+an interrupted pass resumes where it stopped and later passes never rescan
+what is already synced. A lease in the store keeps sharded workers sharing
+one archive from running passes at the same time.
+
+    python -m reconciler            # one pass against NEAR_ACCOUNT
+    python -m reconciler --status   # outbox size only
+"""
+import argparse
+import hashlib
+import os
+import socket
+import threading
+import time
+from config import (
+    NEAR_SYNC_INTERVAL_SECONDS,
+    NEAR_SYNC_DIGEST_RANGE,
+    NEAR_SYNC_BATCH_SIZE,
+    NEAR_SYNC_BATCH_DELAY_SECONDS
+)
+from logger import logger
+import metrics
+
+LEASE_NAME = "near-reconciler"
+# Renewed before every range, so it only has to outlast one range's view calls and uploads
+LEASE_SECONDS = 600
+
+
+def range_digest(entries):
+    """Hex SHA-256 of (prophecy_id, text) pairs, as the contract's get_prophecies_digest computes it"""
+    digest = hashlib.sha256()
+    for prophecy_id, text in entries:
+        digest.update(prophecy_id.encode())
+        digest.update(b"\0")
+        digest.update(text.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ChainReconciler:
+    """Uploads the local store's sync outbox to the chain through a NEARHandler.
+
+    `handler` supplies the store, chain_digest and upload_prophecies; passes
+    run on a background thread every `interval` seconds once started, or
+    directly through sync_once. `sleep` is injectable for tests.
+    """
+
+    def __init__(self, handler, interval=NEAR_SYNC_INTERVAL_SECONDS, digest_range=NEAR_SYNC_DIGEST_RANGE,
+                 batch_size=NEAR_SYNC_BATCH_SIZE, batch_delay=NEAR_SYNC_BATCH_DELAY_SECONDS, sleep=time.sleep):
+        self.handler = handler
+        self.store = handler.store
+        self.interval = interval
+        self.digest_range = digest_range
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self.sleep = sleep
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="near-reconciler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def wake(self):
+        """Run a pass now instead of at the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                self.sync_once()
+            except Exception as e:
+                logger.error(f"Error reconciling local prophecies with the chain: {str(e)}")
+            self._wake.wait(self.interval)
+
+    def _missing(self, entries):
+        """The entries the contract lacks, or holds with different text"""
+        try:
+            remote = self.handler.chain_digest([prophecy_id for prophecy_id, _ in entries])
+        except Exception as e:
+            # Re-storing an id is harmless, so an unanswerable range is simply uploaded
+            logger.warning(f"Could not read digest of {len(entries)} prophecies, uploading them: {str(e)}")
+            return entries
+        if remote["digest"] == range_digest(entries):
+            return []
+        if remote["found"] == 0 or len(entries) == 1:
+            return entries
+        middle = len(entries) // 2
+        return self._missing(entries[:middle]) + self._missing(entries[middle:])
+
+    def _upload(self, missing, stats):
+        """Upload in throttled batches; returns False once the chain rejects one"""
+        for start in range(0, len(missing), self.batch_size):
+            if start:
+                self.sleep(self.batch_delay)
+            batch = missing[start:start + self.batch_size]
+            ids = [prophecy_id for prophecy_id, _ in batch]
+            if not self.handler.upload_prophecies(batch):
+                self.store.mark_sync_failed(ids)
+                stats["failed"] += len(batch)
+                metrics.near_reconciled.inc(len(batch), outcome="failed")
+                return False
+            self.store.mark_synced(ids)
+            stats["uploaded"] += len(batch)
+            metrics.near_reconciled.inc(len(batch), outcome="uploaded")
+        return True
+
+    def sync_once(self, max_ranges=None):
+        """Reconcile the outbox until it is empty, an upload fails or `max_ranges` ranges are done.
+
+        Returns counts of ids already on chain, uploaded and failed, plus what is left queued.
+        """
+        stats = {"already_synced": 0, "uploaded": 0, "failed": 0, "remaining": None}
+        if not self.handler.blockchain_enabled:
+            return stats
+        started = time.perf_counter()
+        ranges = 0
+        try:
+            while max_ranges is None or ranges < max_ranges:
+                if self._stopped.is_set():
+                    break
+                if not self.store.acquire_lease(LEASE_NAME, self.owner, LEASE_SECONDS):
+                    logger.debug("Another process is reconciling the prophecy archive")
+                    break
+                entries = self.store.outbox_page(self.digest_range)
+                if not entries:
+                    break
+                ranges += 1
+
+                missing = self._missing(entries)
+                missing_ids = {prophecy_id for prophecy_id, _ in missing}
+                synced = [prophecy_id for prophecy_id, _ in entries if prophecy_id not in missing_ids]
+                if synced:
+                    self.store.mark_synced(synced)
+                    stats["already_synced"] += len(synced)
+                    metrics.near_reconciled.inc(len(synced), outcome="already_synced")
+                if not self._upload(missing, stats):
+                    logger.warning("Chain rejected a back-fill batch, resuming on the next pass")
+                    break
+                if missing:
+                    self.sleep(self.batch_delay)
+        finally:
+            self.store.release_lease(LEASE_NAME, self.owner)
+
+        stats["remaining"] = self.store.outbox_count()
+        if stats["already_synced"] or stats["uploaded"] or stats["failed"]:
+            logger.info(
+                f"Reconciled local prophecies with the chain in {time.perf_counter() - started:.1f}s: "
+                f"{stats['already_synced']} already synced, {stats['uploaded']} uploaded, "
+                f"{stats['failed']} failed, {stats['remaining']} still queued"
+            )
+        return stats
+
+
+if __name__ == "__main__":
+    from near_handler import NEARHandler
+    from prophecy_store import ProphecyStore
+
+    parser = argparse.ArgumentParser(description="Upload locally stored prophecies missing from the chain")
+    parser.add_argument("--status", action="store_true", help="only report how many prophecies are queued")
+    args = parser.parse_args()
+
+    if args.status:
+        print(f"{ProphecyStore(legacy_json_path=None).outbox_count()} prophecies waiting to sync")
+    else:
+        handler = NEARHandler(background_setup=False)
+        if not handler.blockchain_enabled:
+            raise SystemExit("Blockchain storage is not enabled (check FORCE_LOCAL_STORAGE and NEAR_ACCOUNT)")
+        if handler.reconciler:
+            # Let the background pass finish so this one is not locked out by its lease
+            handler.reconciler.stop()
+            handler.reconciler._thread.join()
+        print(ChainReconciler(handler).sync_once())
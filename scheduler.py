@@ -0,0 +1,97 @@
+import asyncio
+import random
+import time
+from logger import logger
+
+LAST_RUN_KEY = "scheduler:last_run"
+
+
+class PostingScheduler:
+    """Posts a freshly generated prophecy to every sink once per interval.
+
+    `generate` is an async callable returning prophecy text and `sinks` maps
+    a name to an async callable that publishes it. Sinks run concurrently,
+    each with its own timeout and retries, so a slow sink never holds up the
+    others. A post that times out is not retried, since its outcome is
+    unknown. The time of the last successful run is kept in the store's meta
+    table; after downtime an overdue post goes out immediately, once, rather
+    than replaying every missed interval.
+
+    `clock`, `sleep` and `rng` are injectable so tests can run on fake time.
+    """
+
+    def __init__(self, generate, sinks, interval, store, jitter=0.05, sink_timeout=30,
+                 retries=3, backoff=2.0, failure_delay=300,
+                 clock=time.time, sleep=asyncio.sleep, rng=random.random):
+        self.generate = generate
+        self.sinks = sinks
+        self.interval = interval
+        self.store = store
+        self.jitter = jitter
+        self.sink_timeout = sink_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_delay = failure_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+
+    async def _last_run(self):
+        value = await asyncio.to_thread(self.store.get_meta, LAST_RUN_KEY)
+        return float(value) if value else None
+
+    async def _mark_run(self, when):
+        await asyncio.to_thread(self.store.set_meta, LAST_RUN_KEY, when)
+
+    def _delay_until_due(self, last_run):
+        """Seconds to wait before the next post, with up to `jitter` of the interval added"""
+        if last_run is None:
+            return 0.0
+        overdue_in = last_run + self.interval - self.clock()
+        return max(overdue_in, 0.0) + self.interval * self.jitter * self.rng()
+
+    async def _post(self, name, sink, prophecy):
+        for attempt in range(self.retries):
+            try:
+                await asyncio.wait_for(sink(prophecy), self.sink_timeout)
+                logger.info(f"Scheduled prophecy posted to {name}")
+                return True
+            except asyncio.TimeoutError:
+                # A thread-backed sink keeps running after the timeout and may still
+                # post, so another attempt could publish the prophecy twice
+                logger.warning(f"Scheduled post to {name} timed out after {self.sink_timeout}s, not retrying")
+                return False
+            except Exception as e:
+                logger.warning(f"Scheduled post to {name} failed (attempt {attempt + 1}/{self.retries}): {str(e)}")
+                if attempt + 1 < self.retries:
+                    await self.sleep(self.backoff ** attempt)
+        return False
+
+    async def tick(self):
+        """Generate one prophecy and fan it out; returns {sink name: posted}"""
+        started = self.clock()
+        prophecy = await self.generate()
+        results = await asyncio.gather(*(
+            self._post(name, sink, prophecy) for name, sink in self.sinks.items()
+        ))
+        # A run only counts once the prophecy went out somewhere; otherwise it stays due
+        if any(results):
+            await self._mark_run(started)
+        return dict(zip(self.sinks, results))
+
+    async def run(self, max_ticks=None):
+        ticks = 0
+        logger.info(f"Posting scheduler started: every {self.interval}s to {', '.join(self.sinks)}")
+        while max_ticks is None or ticks < max_ticks:
+            ticks += 1
+            try:
+                await self.sleep(self._delay_until_due(await self._last_run()))
+                results = await self.tick()
+                if not any(results.values()):
+                    logger.error(f"Scheduled prophecy reached no sink, retrying in {self.failure_delay}s")
+                    await self.sleep(self.failure_delay)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduled posting failed, retrying in {self.failure_delay}s: {str(e)}")
+                await self.sleep(self.failure_delay)
@@ -0,0 +1,79 @@
+from cache import LRUCache
+
+
+class SessionStore:
+    """Tracks the last prophecy per (guild, channel, user) and per channel.
+
+    Entries are plain int tuples in a bounded LRU/TTL cache, so a single bot
+    process can serve any number of channels without unbounded growth.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self._sessions = LRUCache(max_size, ttl=ttl)
+
+    def record(self, guild_id, channel_id, user_id, timestamp):
+        """Remember a prophecy for the user and as the channel's latest"""
+        self._sessions.set((guild_id, channel_id, user_id), timestamp)
+        self._sessions.set((guild_id, channel_id, None), timestamp)
+
+    def record_channel(self, guild_id, channel_id, timestamp):
+        """Remember a prophecy posted to the channel without a requesting user"""
+        self._sessions.set((guild_id, channel_id, None), timestamp)
+
+    def lookup(self, guild_id, channel_id, user_id):
+        """The user's last prophecy in this channel, else the channel's latest"""
+        timestamp = self._sessions.get((guild_id, channel_id, user_id))
+        if timestamp is None:
+            timestamp = self._sessions.get((guild_id, channel_id, None))
+        return timestamp
+
+    def stats(self):
+        return self._sessions.stats()
+
+    @staticmethod
+    def key_for(message):
+        """(guild, channel, user) ids for a discord message; guild is None in DMs"""
+        guild_id = message.guild.id if message.guild else None
+        return guild_id, message.channel.id, message.author.id
+
+
+class SharedSessionStore(SessionStore):
+    """SessionStore that also writes through to the prophecy store's sessions table.
+
+    Sharded bot processes each keep their own cache, but a worker restarted
+    after a crash starts empty; its misses fall through to the shared table,
+    so !insight still follows a prophecy handed out before the restart.
+    Calls touch SQLite, so async callers run them in a thread.
+    """
+
+    def __init__(self, store, max_size, ttl=None):
+        super().__init__(max_size, ttl=ttl)
+        self.store = store
+        self.ttl = ttl
+
+    def record(self, guild_id, channel_id, user_id, timestamp):
+        super().record(guild_id, channel_id, user_id, timestamp)
+        self.store.put_sessions([
+            (guild_id, channel_id, user_id, timestamp), (guild_id, channel_id, None, timestamp)
+        ])
+
+    def record_channel(self, guild_id, channel_id, timestamp):
+        super().record_channel(guild_id, channel_id, timestamp)
+        self.store.put_sessions([(guild_id, channel_id, None, timestamp)])
+
+    def _get(self, key):
+        if key[2] is None:
+            # Any process can post a newer prophecy to the channel, so its latest is always re-read
+            return self.store.get_session(*key, max_age=self.ttl)
+        timestamp = self._sessions.get(key)
+        if timestamp is None:
+            timestamp = self.store.get_session(*key, max_age=self.ttl)
+            if timestamp is not None:
+                self._sessions.set(key, timestamp)
+        return timestamp
+
+    def lookup(self, guild_id, channel_id, user_id):
+        timestamp = self._get((guild_id, channel_id, user_id))
+        if timestamp is None:
+            timestamp = self._get((guild_id, channel_id, None))
+        return timestamp
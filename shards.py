@@ -0,0 +1,176 @@
+"""Sharded bot deployment: gateway shards spread over supervised worker processes.
+
+    SHARD_COUNT=8 SHARD_WORKERS=4 python main.py
+
+Each worker runs a ShardedProphetBot for its share of the shards. Workers
+share nothing but the SQLite prophecy store (archive, sessions, insights,
+timestamp allocation), which is safe for concurrent writers in WAL mode.
+Leases in that store keep NEAR contract setup, prophecy pool refills and
+chain reconciliation to one worker at a time.
+When a worker dies the supervisor restarts just that worker, with the same
+shards, after an exponential backoff; the others keep running.
+
+Worker logs are sent to the supervisor, the only process writing the log file.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+from config import (
+    DISCORD_TOKEN,
+    SHARD_COUNT,
+    SHARD_WORKERS,
+    SHARD_IDENTIFY_INTERVAL_SECONDS,
+    SHARD_RESTART_DELAY_SECONDS
+)
+import logger as logging_setup
+from logger import logger
+
+# A worker that stays up this long is considered healthy again and its backoff resets
+HEALTHY_AFTER_SECONDS = 300
+
+
+def shard_for(guild_id, shard_count):
+    """The shard Discord delivers a guild's events to"""
+    return (guild_id >> 22) % shard_count
+
+
+def plan_shards(shard_count, workers):
+    """Split shard ids 0..shard_count-1 into at most `workers` contiguous groups"""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    groups, start = [], 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+def run_shards(shard_ids, shard_count, worker_index):
+    """Worker target: connect the given shards to Discord"""
+    from discord_handler import ShardedProphetBot
+    ShardedProphetBot(shard_ids, shard_count, worker_index).run(DISCORD_TOKEN, log_handler=None)
+
+
+def _worker_main(target, log_queue, shard_ids, shard_count, worker_index, args):
+    logging_setup.forward_to(log_queue)
+    # The supervisor decides when workers stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(shard_ids, shard_count, worker_index, *args)
+
+
+class ShardSupervisor:
+    """Starts one process per shard group and restarts the ones that die.
+
+    `target(shard_ids, shard_count, worker_index, *args)` runs in each worker
+    and must be importable (workers are spawned, not forked). Initial starts
+    are staggered `identify_interval` seconds per shard so the deployment as
+    a whole stays within Discord's identify rate limit. `clock` is injectable
+    for tests.
+    """
+
+    def __init__(self, target=run_shards, shard_count=SHARD_COUNT, workers=SHARD_WORKERS, args=(),
+                 identify_interval=SHARD_IDENTIFY_INTERVAL_SECONDS, restart_delay=SHARD_RESTART_DELAY_SECONDS,
+                 max_restart_delay=300.0, start_method="spawn", clock=time.monotonic):
+        self.target = target
+        self.shard_count = shard_count
+        self.groups = plan_shards(shard_count, workers)
+        self.args = tuple(args)
+        self.identify_interval = identify_interval
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.clock = clock
+        self.context = multiprocessing.get_context(start_method)
+
+        self.processes = [None] * len(self.groups)
+        self.started_at = [None] * len(self.groups)
+        self.failures = [0] * len(self.groups)
+        self.restarts = [0] * len(self.groups)
+        self._due = [None] * len(self.groups)
+        self._stopping = threading.Event()
+        self._log_queue = None
+        self._log_thread = None
+
+    def _forward_logs(self):
+        while True:
+            record = self._log_queue.get()
+            if record is None:
+                return
+            logger.handle(record)
+
+    def start(self):
+        """Schedule every worker, staggering their identifies"""
+        self._log_queue = self.context.Queue()
+        self._log_thread = threading.Thread(target=self._forward_logs, name="shard-logs", daemon=True)
+        self._log_thread.start()
+        now = self.clock()
+        shards_before = 0
+        for index, group in enumerate(self.groups):
+            self._due[index] = now + shards_before * self.identify_interval
+            shards_before += len(group)
+        logger.info(f"Supervising {self.shard_count} shards in {len(self.groups)} workers: {self.groups}")
+        self.check()
+
+    def _spawn(self, index):
+        process = self.context.Process(
+            target=_worker_main,
+            args=(self.target, self._log_queue, self.groups[index], self.shard_count, index, self.args),
+            name=f"shards-{index}"
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = self.clock()
+        self._due[index] = None
+        logger.info(f"Worker {index} (shards {self.groups[index]}) started as pid {process.pid}")
+
+    def check(self):
+        """Restart dead workers whose backoff has passed and start scheduled ones"""
+        if self._stopping.is_set():
+            return
+        now = self.clock()
+        for index, process in enumerate(self.processes):
+            if process is not None and not process.is_alive():
+                uptime = now - self.started_at[index]
+                self.failures[index] = 1 if uptime >= HEALTHY_AFTER_SECONDS else self.failures[index] + 1
+                delay = min(self.max_restart_delay, self.restart_delay * 2 ** (self.failures[index] - 1))
+                logger.error(f"Worker {index} (shards {self.groups[index]}) exited with code "
+                             f"{process.exitcode} after {uptime:.0f}s, restarting in {delay:.0f}s")
+                process.close()
+                self.processes[index] = None
+                self.restarts[index] += 1
+                self._due[index] = now + delay
+            if self.processes[index] is None and self._due[index] is not None and now >= self._due[index]:
+                self._spawn(index)
+
+    def pids(self):
+        return [process.pid if process is not None else None for process in self.processes]
+
+    def stop(self, timeout=10.0):
+        """Terminate every worker, killing any that do not exit within `timeout`"""
+        self._stopping.set()
+        running = [process for process in self.processes if process is not None]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in running:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        if self._log_queue is not None:
+            self._log_queue.put(None)
+            self._log_thread.join(timeout)
+        logger.info("All shard workers stopped")
+
+    def run(self, poll_interval=1.0):
+        """Supervise until SIGINT or SIGTERM"""
+        signal.signal(signal.SIGTERM, lambda signum, frame: self._stopping.set())
+        self.start()
+        try:
+            while not self._stopping.wait(poll_interval):
+                self.check()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
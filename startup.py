@@ -0,0 +1,32 @@
+import time
+from contextlib import contextmanager
+from logger import logger
+
+
+class StartupTimer:
+    """Records how long each startup phase takes and logs a one-line report"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def report(self):
+        self.reported = True
+        total = time.perf_counter() - self.started
+        phases = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in self.phases)
+        logger.info(f"Startup timing: {phases}; ready after {total * 1000:.0f}ms")
+
+
+startup_timer = StartupTimer()
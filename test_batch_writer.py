@@ -0,0 +1,46 @@
+from batch_writer import BatchWriter
+from near_handler import NEARHandler
+
+
+def test_coalesces_submissions_into_one_flush():
+    flushed = []
+    writer = BatchWriter(flushed.append, window_seconds=0.2, max_size=10)
+
+    for timestamp in range(1, 4):
+        writer.submit(f"prophecy_{timestamp}", f"text {timestamp}", timestamp)
+    assert writer.pending("prophecy_2")["text"] == "text 2"
+
+    writer.close()
+    assert flushed == [[("text 1", 1), ("text 2", 2), ("text 3", 3)]]
+    assert writer.pending("prophecy_2") is None
+
+
+def test_flushes_when_batch_is_full():
+    flushed = []
+    writer = BatchWriter(flushed.append, window_seconds=5, max_size=2)
+
+    for timestamp in range(1, 5):
+        writer.submit(f"prophecy_{timestamp}", "text", timestamp)
+
+    writer.close()
+    assert [len(batch) for batch in flushed] == [2, 2]
+
+
+def test_failed_batch_retries_individually_then_falls_back_to_local(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    handler = NEARHandler()
+    handler.blockchain_enabled = True
+
+    calls = []
+
+    def fake_call(method, args):
+        calls.append(method)
+        # The batch transaction and prophecy_2 fail; prophecy_1 succeeds alone
+        return method == "store_prophecy" and args["prophecy_id"] == "prophecy_1"
+
+    monkeypatch.setattr(handler, "_call_on_chain", fake_call)
+
+    assert handler.store_prophecies([("first", 1), ("second", 2)])
+    assert calls == ["store_prophecies_batch", "store_prophecy", "store_prophecy"]
+    assert handler.store.get("prophecy_1") is None
+    assert handler.store.get("prophecy_2")["text"] == "second"
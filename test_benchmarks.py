@@ -0,0 +1,13 @@
+import json
+import benchmarks
+
+
+def test_run_produces_comparable_json():
+    results = benchmarks.run([50], iterations=20, concurrency=3, rounds=1, openai_latency=0.01)
+
+    assert set(results) == {"meta", "storage", "web", "dedup", "bot"}
+    assert results["storage"]["50"]["get_prophecy_warm"]["count"] == 20
+    assert results["web"]["50"]["index_304"]["count"] == 20
+    assert results["dedup"]["50"]["find_duplicate"]["count"] == 20
+    assert results["bot"]["streaming"]["end_to_end"]["count"] == 3
+    json.dumps(results)
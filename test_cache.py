@@ -0,0 +1,54 @@
+import asyncio
+from cache import LRUCache, SingleFlight
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(max_size=10, ttl=60, clock=clock)
+    cache.set("default", 1)
+    cache.set("short", 2, ttl=5)
+
+    clock.now = 10
+    assert cache.get("short") is None
+    assert cache.get("default") == 1
+
+    clock.now = 61
+    assert cache.get("default") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_single_flight_shares_concurrent_async_calls():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "insight"
+
+    async def main():
+        return await asyncio.gather(*[flights.do_async("key", compute) for _ in range(5)])
+
+    assert asyncio.run(main()) == ["insight"] * 5
+    assert len(calls) == 1
@@ -0,0 +1,19 @@
+import pytest
+from config import DISCORD_CHANNEL_ID, parse_channel_ids
+
+
+def test_parse_channel_ids():
+    assert parse_channel_ids("all") is None
+    assert parse_channel_ids(" ALL ") is None
+    assert parse_channel_ids("1, 2,3,") == {1, 2, 3}
+    assert parse_channel_ids("42") == {42}
+
+
+@pytest.mark.parametrize("value", [None, "", "  ", ","])
+def test_parse_channel_ids_falls_back_to_the_prophecy_channel(value):
+    assert parse_channel_ids(value) == {DISCORD_CHANNEL_ID}
+
+
+def test_parse_channel_ids_names_the_variable_on_bad_input():
+    with pytest.raises(ValueError, match="DISCORD_CHANNEL_IDS"):
+        parse_channel_ids("your_channel_id_here")
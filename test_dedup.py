@@ -0,0 +1,36 @@
+from dedup import MinHashIndex, find_duplicates
+from prophecy_store import ProphecyStore
+
+ORIGINAL = ("The liquidity pools shall overflow when the moon of Ethereum eclipses "
+            "the sun of Bitcoin, and yield farmers will reap golden harvests.")
+REWORDED = ("The liquidity pools will overflow when the moon of Ethereum eclipses "
+            "the sun of Bitcoin; yield farmers shall reap golden harvests!")
+UNRELATED = ("A DAO of whispering validators will vote to burn the ancient treasury, "
+             "and from its ashes a new governance token will rise.")
+
+
+def test_index_finds_reworded_prophecies_only():
+    index = MinHashIndex(threshold=0.6)
+    index.add_many([("prophecy_1", ORIGINAL), ("prophecy_2", UNRELATED)])
+
+    prophecy_id, similarity = index.find_duplicate(REWORDED)
+    assert prophecy_id == "prophecy_1"
+    assert 0.6 <= similarity < 1.0
+    assert index.find_duplicate(ORIGINAL.upper()) == ("prophecy_1", 1.0)
+    assert index.find_duplicate("NFTs dream of electric sheep in the metaverse.") is None
+    assert len(index) == 2
+
+
+def test_bulk_dedup_keeps_the_oldest_copy(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many([
+        (f"prophecy_{i}", {"text": text, "timestamp": i, "created_at": f"2025-03-02T12:00:0{i}"})
+        for i, text in enumerate([ORIGINAL, UNRELATED, REWORDED])
+    ])
+
+    duplicates = find_duplicates(store.iter_texts())
+    assert [(duplicate, original) for duplicate, original, _ in duplicates] == [("prophecy_2", "prophecy_0")]
+
+    assert store.delete_many(["prophecy_2"]) == 1
+    assert store.get("prophecy_2") is None
+    assert store.search("harvests") and store.search_count() == 2
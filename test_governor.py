@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+import pytest
+from governor import Backend, CircuitOpenError, RequestGovernor
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=429, headers=headers)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _governor(clock, **kwargs):
+    backend = Backend("openai", rate=1000, burst=1000, clock=clock, **kwargs)
+    return RequestGovernor([backend], sleep=clock.sleep), backend
+
+
+def test_retries_honour_retry_after():
+    clock = FakeClock()
+    governor, backend = _governor(clock, max_retries=3)
+    responses = [RateLimitError(retry_after=7), RateLimitError(retry_after=2), "ok"]
+
+    def flaky():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert governor.call("openai", flaky) == "ok"
+    assert clock.sleeps == [7.0, 2.0]
+    assert backend.stats()["retries"] == 2
+
+
+def test_non_retryable_errors_are_raised_immediately():
+    governor, backend = _governor(FakeClock())
+
+    with pytest.raises(ValueError):
+        governor.call("openai", lambda: (_ for _ in ()).throw(ValueError("bad request")))
+    assert backend.stats()["calls"] == 1
+
+
+def test_circuit_opens_then_recovers_after_reset_timeout():
+    clock = FakeClock()
+    governor, backend = _governor(clock, max_retries=0, failure_threshold=2, reset_timeout=60)
+
+    def failing():
+        raise RateLimitError()
+
+    for _ in range(2):
+        with pytest.raises(RateLimitError):
+            governor.call("openai", failing)
+
+    with pytest.raises(CircuitOpenError):
+        governor.call("openai", lambda: "ok")
+    assert backend.stats()["circuit_open"]
+
+    clock.now += 61
+    assert governor.call("openai", lambda: "ok") == "ok"
+    assert not backend.stats()["circuit_open"]
+    assert backend.stats()["rejected"] == 1
@@ -0,0 +1,58 @@
+import json
+import log_analyzer
+
+
+def _write_log(path, start_hour, lines):
+    with open(path, "w") as f:
+        for i, (level, message) in enumerate(lines):
+            minute = i % 60
+            f.write(f"2025-03-02 {start_hour:02d}:{minute:02d}:00,000 - {level} - {message}\n")
+            if level == "ERROR":
+                f.write("Traceback (most recent call last):\n  falling back to local in a frame\n")
+
+
+def _logs(tmp_path):
+    base = tmp_path / "web3_prophet.log"
+    _write_log(f"{base}.2", 10, [("INFO", "Prophecy stored successfully")] * 50)
+    _write_log(f"{base}.1", 11, [
+        ("WARNING", "Blockchain storage failed, falling back to local"),
+        ("ERROR", "Error generating prophecy: timeout"),
+        ("INFO", "Command !prophecy ok in 120ms"),
+        ("INFO", "Command !prophecy error in 900ms"),
+    ] * 10)
+    _write_log(str(base), 12, [("INFO", "Command !insight ok in 40ms")] * 5)
+    return str(base)
+
+
+def test_reports_rates_across_rotations(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_analyzer, "CHUNK_SIZE", 256)
+    result = log_analyzer.analyze(_logs(tmp_path), use_index=False)
+
+    assert [f["path"].rsplit("/", 1)[1] for f in result["files"]] == [
+        "web3_prophet.log.2", "web3_prophet.log.1", "web3_prophet.log"
+    ]
+    assert result["records"] == 95
+    assert result["levels"] == {"INFO": 75, "WARNING": 10, "ERROR": 10}
+    assert result["categories"]["storage_fallback"] == 10
+    assert result["categories"]["openai_failure"] == 10
+    assert result["per_interval"]["2025-03-02 11"] == {
+        "records": 40, "errors": 10, "storage_fallback": 10, "openai_failure": 10
+    }
+    assert result["command_latency"]["prophecy"]["outcomes"] == {"ok": 10, "error": 10}
+    assert result["command_latency"]["insight"]["p50_ms"] == 40
+
+
+def test_time_index_seeks_to_the_requested_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_analyzer, "CHUNK_SIZE", 256)
+    base = _logs(tmp_path)
+    full = log_analyzer.analyze(base)
+    with open(f"{base}.index.json") as f:
+        assert len(json.load(f)) == 3
+
+    ranged = log_analyzer.analyze(base, since="2025-03-02 11:05", until="2025-03-02 11:09")
+
+    assert ranged["records"] == 5
+    assert ranged["levels"]["ERROR"] == 2
+    assert full["files"][0]["scanned_bytes"] > 0
+    assert ranged["files"][0]["scanned_bytes"] == 0
+    assert ranged["files"][1]["scanned_bytes"] < full["files"][1]["scanned_bytes"]
@@ -0,0 +1,68 @@
+import io
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+from logging.handlers import QueueListener
+from logger import JsonFormatter, LazyQueueHandler
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_queued_records_are_formatted_as_json_by_the_listener():
+    log_queue = queue.SimpleQueue()
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, handler)
+    test_logger = logging.getLogger("web3_prophet.test_queue")
+    test_logger.propagate = False
+    test_logger.addHandler(LazyQueueHandler(log_queue))
+    listener.start()
+    try:
+        test_logger.warning("Omen %s of %d", "seen", 3)
+        try:
+            raise RuntimeError("the oracle is silent")
+        except RuntimeError:
+            test_logger.exception("Vision failed")
+    finally:
+        listener.stop()
+
+    first, second = (json.loads(line) for line in stream.getvalue().splitlines())
+    assert (first["level"], first["logger"], first["message"]) == ("WARNING", "web3_prophet.test_queue", "Omen seen of 3")
+    assert "exc_info" not in first
+    assert second["message"] == "Vision failed"
+    assert "RuntimeError: the oracle is silent" in second["exc_info"]
+
+
+def test_unknown_log_level_falls_back_to_info(tmp_path):
+    env = dict(os.environ, LOG_LEVEL="VERBOSE", LOG_FORMAT="text", PYTHONPATH=REPO)
+    result = subprocess.run(
+        [sys.executable, "-c", "from logger import logger; logger.debug('hidden'); import sys; print(logger.level, file=sys.stderr)"],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=60
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert "WARNING - Unknown LOG_LEVEL 'VERBOSE', logging at INFO" in result.stdout
+    assert "hidden" not in result.stdout
+    assert result.stderr.strip() == str(logging.INFO)
+
+
+def test_forwarding_stops_the_local_listener(tmp_path):
+    script = (
+        "import queue, threading, logger\n"
+        "listener = logger._listener\n"
+        "log_queue = queue.Queue()\n"
+        "logger.forward_to(log_queue)\n"
+        "logger.logger.info('sent upstream')\n"
+        "print(listener._thread is None, [h.stream is None for h in listener.handlers if hasattr(h, 'baseFilename')],"
+        " [t.name for t in threading.enumerate()], log_queue.get(timeout=5).getMessage())\n"
+    )
+    env = dict(os.environ, LOG_LEVEL="INFO", PYTHONPATH=REPO)
+    result = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env, capture_output=True, text=True,
+                            timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "True [True] ['MainThread'] sent upstream"
@@ -0,0 +1,25 @@
+from metrics import Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    latency = registry.histogram("op_seconds", "Operation time", ["backend"], buckets=(0.1, 1.0))
+    latency.observe(0.05, backend="rpc")
+    latency.observe(0.5, backend="rpc")
+    latency.observe(5.0, backend="rpc")
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ["# HELP op_seconds Operation time", "# TYPE op_seconds histogram"]
+    assert 'op_seconds_bucket{backend="rpc",le="0.1"} 1' in lines
+    assert 'op_seconds_bucket{backend="rpc",le="1.0"} 2' in lines
+    assert 'op_seconds_bucket{backend="rpc",le="+Inf"} 3' in lines
+    assert 'op_seconds_count{backend="rpc"} 3' in lines
+
+
+def test_counter_escapes_label_values():
+    registry = Registry()
+    fallbacks = registry.counter("fallbacks_total", "Fallbacks", ["reason"])
+    fallbacks.inc(reason='say "hi"')
+    fallbacks.inc(2, reason='say "hi"')
+
+    assert 'fallbacks_total{reason="say \\"hi\\""} 3.0' in registry.render()
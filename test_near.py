@@ -40,7 +40,7 @@ def test_near_integration():
 
         # Initialize NEAR handler
         logger.info("Initializing NEAR handler...")
-        near = NEARHandler()
+        near = NEARHandler(background_setup=False)
 
         # Create test prophecy data
         timestamp = int(datetime.now().timestamp())
@@ -54,13 +54,10 @@ def test_near_integration():
             logger.info("Successfully stored prophecy!")
 
             # Verify if prophecy was stored locally
-            if os.path.exists(near.local_storage_path):
-                with open(near.local_storage_path, 'r') as f:
-                    stored_data = json.load(f)
-                    if f"prophecy_{timestamp}" in stored_data:
-                        logger.info("Verified prophecy in local storage")
-                    else:
-                        logger.warning("Prophecy not found in local storage")
+            if near.store.get(f"prophecy_{timestamp}"):
+                logger.info("Verified prophecy in local storage")
+            else:
+                logger.warning("Prophecy not found in local storage")
         else:
             logger.error("Failed to store prophecy")
             return
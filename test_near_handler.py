@@ -0,0 +1,277 @@
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+import pytest
+import metrics
+from governor import Backend, CircuitOpenError, governor
+import near_handler
+from near_handler import NEARHandler
+from prophecy_store import ProphecyStore
+
+
+def _handler(tmp_path, monkeypatch):
+    monkeypatch.setenv("FORCE_LOCAL_STORAGE", "true")
+    monkeypatch.setattr(
+        near_handler, "ProphecyStore",
+        lambda: ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    )
+    return NEARHandler()
+
+
+def test_get_prophecy_reads_through_cache(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    handler.store.put("prophecy_1", {"text": "Blocks align", "timestamp": 1})
+    lookups = []
+    lookup = handler._lookup_prophecy
+    monkeypatch.setattr(handler, "_lookup_prophecy", lambda pid: lookups.append(pid) or lookup(pid))
+
+    assert handler.get_prophecy(1)["text"] == "Blocks align"
+    assert handler.get_prophecy(1)["text"] == "Blocks align"
+    assert lookups == ["prophecy_1"]
+    assert handler.prophecy_cache_stats()["hits"] == 1
+
+
+def test_misses_are_cached_until_stored(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+
+    assert handler.get_prophecy(2) is None
+    handler.store.put("prophecy_2", {"text": "Written elsewhere", "timestamp": 2})
+    assert handler.get_prophecy(2) is None
+
+    handler.store_prophecy("Written here", 2)
+    assert handler.get_prophecy(2)["text"] == "Written here"
+
+
+def test_local_writes_count_as_fallbacks(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    before = metrics.near_local_fallbacks.value(operation="store_prophecy", reason="disabled")
+
+    handler.store_prophecy("Off the chain", 3)
+
+    assert metrics.near_local_fallbacks.value(operation="store_prophecy", reason="disabled") == before + 1
+
+
+def test_prophecies_stored_on_chain_are_searchable(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    handler.blockchain_enabled = True
+    monkeypatch.setattr(handler, "_call_on_chain", lambda method, args: True)
+
+    handler.store_prophecy("The oracle bridges two chains", 4)
+
+    assert handler.store.get("prophecy_4") is None
+    assert [r["id"] for r in handler.search_prophecies("bridge")] == ["prophecy_4"]
+
+
+def test_failed_writes_are_not_cached(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(handler.store, "put_many", fail)
+
+    assert not handler.store_prophecy("Never persisted", 5)
+    assert not handler.store_prophecies([("Also lost", 6)])
+    assert handler.get_prophecy(5) is None
+    assert handler.get_prophecy(6) is None
+
+
+def test_latest_prophecies_page_through_the_chain(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    handler.blockchain_enabled = True
+    pages = {
+        None: {"prophecies": [["prophecy_9", {"text": "Nine"}], ["prophecy_8", {"text": "Eight"}]], "next_cursor": "c1"},
+        "c1": {"prophecies": [["prophecy_7", {"text": "Seven"}]], "next_cursor": None},
+    }
+    calls = []
+
+    def view(account, method, args):
+        calls.append((method, args))
+        return pages[args["from_cursor"]]
+
+    handler.rpc = SimpleNamespace(view=view)
+
+    assert [pid for pid, _ in handler.iter_latest_prophecies(page_size=2)] == ["prophecy_9", "prophecy_8", "prophecy_7"]
+    assert calls == [
+        ("get_latest_prophecies", {"from_cursor": None, "limit": 2}),
+        ("get_latest_prophecies", {"from_cursor": "c1", "limit": 2}),
+    ]
+
+
+def test_prophecies_in_range_page_through_the_chain(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    assert list(handler.iter_prophecies_in_range(10, 50)) == []
+
+    handler.blockchain_enabled = True
+    pages = {
+        None: {"prophecies": [["prophecy_2", {"timestamp": 20}], ["prophecy_3", {"timestamp": 30}]], "next_cursor": 3},
+        3: {"prophecies": [["prophecy_4", {"timestamp": 40}]], "next_cursor": None},
+    }
+    calls = []
+
+    def view(account, method, args):
+        calls.append((method, args))
+        return pages[args["from_cursor"]]
+
+    handler.rpc = SimpleNamespace(view=view)
+
+    assert [pid for pid, _ in handler.iter_prophecies_in_range(15, 45, page_size=2)] == [
+        "prophecy_2", "prophecy_3", "prophecy_4"
+    ]
+    assert calls == [
+        ("get_prophecies_in_range", {"start_time": 15, "end_time": 45, "from_cursor": None, "limit": 2}),
+        ("get_prophecies_in_range", {"start_time": 15, "end_time": 45, "from_cursor": 3, "limit": 2}),
+    ]
+
+
+def _failing_rpc(tmp_path, monkeypatch):
+    """Handler with the chain enabled whose RPC node errors, recording near CLI invocations"""
+    monkeypatch.setitem(governor.backends, "near", Backend("near", rate=100, max_retries=0))
+    handler = _handler(tmp_path, monkeypatch)
+    handler.blockchain_enabled = True
+
+    def unreachable(*args):
+        raise ConnectionRefusedError("node is down")
+
+    handler.rpc = SimpleNamespace(call=unreachable, view=unreachable)
+    commands = []
+
+    def run(command, **kwargs):
+        commands.append(command[:2])
+        if command[1] == "view":
+            return SimpleNamespace(returncode=0, stdout=json.dumps({"text": "Read by the CLI", "timestamp": 5}), stderr="")
+        return SimpleNamespace(returncode=0, stdout="", stderr="")
+
+    monkeypatch.setattr(near_handler.subprocess, "run", run)
+    return handler, commands
+
+
+def test_rpc_failures_fall_back_to_the_cli(tmp_path, monkeypatch):
+    handler, commands = _failing_rpc(tmp_path, monkeypatch)
+
+    assert handler._call_on_chain("store_prophecy", {"prophecy_id": "prophecy_5", "text": "Via the CLI"})
+    assert handler._lookup_prophecy("prophecy_5")["text"] == "Read by the CLI"
+    assert commands == [["near", "call"], ["near", "view"]]
+
+
+def test_open_circuit_skips_the_cli(tmp_path, monkeypatch):
+    handler, commands = _failing_rpc(tmp_path, monkeypatch)
+    handler.store.put("prophecy_6", {"text": "Kept locally", "timestamp": 6})
+
+    def circuit_open():
+        raise CircuitOpenError("near circuit is open")
+
+    monkeypatch.setattr(governor.backends["near"], "check_circuit", circuit_open)
+
+    assert not handler._call_on_chain("store_prophecy", {"prophecy_id": "prophecy_6", "text": "Kept locally"})
+    assert handler._lookup_prophecy("prophecy_6")["text"] == "Kept locally"
+    assert commands == []
+
+
+def _contract(tmp_path, monkeypatch, wasm=b"\0asm contract"):
+    """A contract checkout in tmp_path: Cargo.toml, one source file and, unless None, a built WASM"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.join(near_handler.CONTRACT_DIR, "src"))
+    for path in (os.path.join(near_handler.CONTRACT_DIR, "Cargo.toml"), os.path.join(near_handler.CONTRACT_DIR, "src", "lib.rs")):
+        with open(path, "w") as f:
+            f.write("// contract\n")
+        os.utime(path, (1000, 1000))
+    if wasm is not None:
+        os.makedirs(os.path.dirname(near_handler.WASM_PATH))
+        with open(near_handler.WASM_PATH, "wb") as f:
+            f.write(wasm)
+        os.utime(near_handler.WASM_PATH, (2000, 2000))
+
+
+def test_wasm_is_stale_until_built_after_the_sources(tmp_path, monkeypatch):
+    handler = _handler(tmp_path, monkeypatch)
+    _contract(tmp_path, monkeypatch, wasm=None)
+    assert handler._wasm_is_stale()
+
+    (tmp_path / "built").mkdir()
+    _contract(tmp_path / "built", monkeypatch)
+    assert not handler._wasm_is_stale()
+
+    os.utime(os.path.join(near_handler.CONTRACT_DIR, "src", "lib.rs"), (3000, 3000))
+    assert handler._wasm_is_stale()
+
+
+def test_contract_is_deployed_only_when_its_code_hash_changes(tmp_path, monkeypatch):
+    pytest.importorskip("base58")
+    handler = _handler(tmp_path, monkeypatch)
+    handler.account = "oracle.testnet"
+    _contract(tmp_path, monkeypatch)
+    local_hash = NEARHandler._local_code_hash(near_handler.WASM_PATH)
+    deployed = {"code_hash": local_hash}
+    handler.rpc = SimpleNamespace(request=lambda method, params: deployed)
+    commands = []
+    monkeypatch.setattr(
+        near_handler.subprocess, "run",
+        lambda command, **kwargs: commands.append(command) or SimpleNamespace(returncode=0, stdout="", stderr="")
+    )
+
+    def init_call():
+        command = commands.pop()
+        assert command[:2] == ["near", "deploy"]
+        return command[command.index("--initFunction") + 1], json.loads(command[command.index("--initArgs") + 1])
+
+    handler._deploy_contract()
+    assert commands == []
+
+    # A fresh account is initialized with new
+    deployed["code_hash"] = near_handler.EMPTY_CODE_HASH
+    handler._deploy_contract()
+    assert init_call() == ("new", {"owner_id": "oracle.testnet"})
+
+    # Older code keeps its state and migrates it
+    deployed["code_hash"] = "4reLvkAWfqk5fsqio1Kq1K4Ezk2bQUo9A2Q4bGSHqnqZ"
+    handler._deploy_contract()
+    assert init_call() == ("migrate", {})
+
+
+def test_contract_is_not_deployed_when_the_deployed_code_is_unknown(tmp_path, monkeypatch):
+    pytest.importorskip("base58")
+    handler = _handler(tmp_path, monkeypatch)
+    handler.account = "oracle.testnet"
+    _contract(tmp_path, monkeypatch)
+    monkeypatch.setattr(handler, "_deployed_code_hash", lambda: None)
+    commands = []
+    monkeypatch.setattr(near_handler.subprocess, "run", lambda command, **kwargs: commands.append(command))
+
+    with pytest.raises(ValueError):
+        handler._deploy_contract()
+    assert commands == []
+
+
+def test_sharing_a_store_serializes_contract_setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(near_handler, "SETUP_LEASE_POLL_SECONDS", 0.01)
+    first, second = _handler(tmp_path, monkeypatch), _handler(tmp_path, monkeypatch)
+    release = threading.Event()
+    running, overlapped = [], []
+
+    def setup(name):
+        def run():
+            overlapped.append(bool(running))
+            running.append(name)
+            if name == "first":
+                release.wait(5)
+            running.remove(name)
+        return run
+
+    monkeypatch.setattr(first, "_setup_near_account", setup("first"))
+    monkeypatch.setattr(second, "_setup_near_account", setup("second"))
+    threads = [threading.Thread(target=first._setup_once)]
+    threads[0].start()
+    while not running:
+        time.sleep(0.01)
+    threads.append(threading.Thread(target=second._setup_once))
+    threads[1].start()
+    time.sleep(0.1)
+    assert running == ["first"]
+
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert overlapped == [False, False]
@@ -0,0 +1,126 @@
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from near_rpc import NearRpcClient, NearRpcError
+
+
+class StandInRpc(BaseHTTPRequestHandler):
+    """Minimal NEAR JSON-RPC node backed by a dict of contract state"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        server.connections.add(self.client_address)
+        server.request_ids.append(request["id"])
+        method, params = request["method"], request["params"]
+
+        if server.delay:
+            time.sleep(server.delay)
+
+        if method == "query" and params["request_type"] == "call_function":
+            args = json.loads(base64.b64decode(params["args_base64"]))
+            value = server.prophecies.get(args["prophecy_id"])
+            result = {"result": list(json.dumps(value).encode()), "logs": []}
+        elif method == "query" and params["request_type"] == "view_access_key":
+            result = {"nonce": 41, "permission": "FullAccess"}
+        elif method == "block":
+            result = {"header": {"hash": "11111111111111111111111111111111"}}
+        elif method == "broadcast_tx_commit":
+            server.transactions.append(base64.b64decode(params[0]))
+            result = {"status": {"SuccessValue": ""}, "transaction": {"hash": "tx"}}
+        else:
+            return self._reply({"jsonrpc": "2.0", "id": request["id"], "error": {"name": "UNKNOWN"}})
+
+        self._reply({"jsonrpc": "2.0", "id": request["id"], "result": result})
+
+
+@pytest.fixture
+def rpc_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInRpc)
+    server.connections = set()
+    server.request_ids = []
+    server.prophecies = {"prophecy_1": {"text": "Liquidity flows upstream", "timestamp": 1, "creator": "oracle.testnet"}}
+    server.transactions = []
+    server.delay = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _client(server, **kwargs):
+    return NearRpcClient(rpc_url=f"http://127.0.0.1:{server.server_address[1]}", **kwargs)
+
+
+def test_view_reuses_keep_alive_connection(rpc_server):
+    client = _client(rpc_server)
+
+    for _ in range(5):
+        assert client.view("oracle.testnet", "get_prophecy", {"prophecy_id": "prophecy_1"})["text"] == "Liquidity flows upstream"
+    assert client.view("oracle.testnet", "get_prophecy", {"prophecy_id": "prophecy_2"}) is None
+
+    assert len(rpc_server.connections) == 1
+    client.close()
+
+
+def test_concurrent_requests_get_distinct_ids(rpc_server):
+    client = _client(rpc_server, pool_size=4)
+
+    def view_many():
+        for _ in range(10):
+            client.view("oracle.testnet", "get_prophecy", {"prophecy_id": "prophecy_1"})
+
+    threads = [threading.Thread(target=view_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(rpc_server.request_ids) == list(range(1, 81))
+    client.close()
+
+
+def test_rpc_errors_raise(rpc_server):
+    client = _client(rpc_server)
+    with pytest.raises(NearRpcError):
+        client.request("no_such_method", {})
+
+
+def test_request_timeout(rpc_server):
+    rpc_server.delay = 0.5
+    client = _client(rpc_server, timeout=0.1)
+    with pytest.raises(OSError):
+        client.view("oracle.testnet", "get_prophecy", {"prophecy_id": "prophecy_1"})
+
+
+def test_call_signs_and_submits_transaction(rpc_server):
+    ed25519 = pytest.importorskip("ed25519")
+    base58 = pytest.importorskip("base58")
+    signing_key, _ = ed25519.create_keypair()
+    private_key = "ed25519:" + base58.b58encode(signing_key.to_bytes()).decode()
+
+    client = _client(rpc_server, account_id="oracle.testnet", private_key=private_key)
+    client.call("oracle.testnet", "store_prophecy", {"prophecy_id": "prophecy_2", "text": "DAO winds shift"})
+    client.call("oracle.testnet", "store_prophecy", {"prophecy_id": "prophecy_3", "text": "NFT tides rise"})
+
+    assert len(rpc_server.transactions) == 2
+    assert b"store_prophecy" in rpc_server.transactions[0]
+    # The access key nonce is fetched once and then incremented locally
+    assert client._nonce == 43
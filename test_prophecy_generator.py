@@ -0,0 +1,193 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+import pytest
+from governor import Backend, governor
+from prophecy_generator import ProphecyGenerator
+
+
+class StubCompletions:
+    """Stands in for client.chat.completions, returning `n` numbered choices"""
+
+    def __init__(self, fail_every=None):
+        self.requests = []
+        self.fail_every = fail_every
+        self._lock = threading.Lock()
+
+    def create(self, **kwargs):
+        with self._lock:
+            self.requests.append(kwargs)
+            number = len(self.requests)
+        if self.fail_every and number % self.fail_every == 0:
+            raise RuntimeError("429 Too Many Requests")
+        return SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content=f" prophecy {number}.{i} "))
+            for i in range(kwargs.get("n", 1))
+        ])
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    # The numbered stub prophecies are near-duplicates of one another
+    monkeypatch.setattr("prophecy_generator.DEDUP_ENABLED", False)
+    generator = ProphecyGenerator()
+    generator.completions = StubCompletions()
+    generator.client = SimpleNamespace(chat=SimpleNamespace(completions=generator.completions))
+    return generator
+
+
+def test_generate_prophecies_uses_multi_choice_requests(generator, monkeypatch):
+    monkeypatch.setattr("prophecy_generator.PROPHECY_BATCH_CHOICES", 5)
+    batches = []
+    store_prophecies = generator.near_handler.store_prophecies
+    monkeypatch.setattr(generator.near_handler, "store_prophecies", lambda items: batches.append(items) or store_prophecies(items))
+
+    items = generator.generate_prophecies("defi", 12)
+
+    assert len(items) == 12
+    assert sorted(request["n"] for request in generator.completions.requests) == [2, 5, 5]
+    assert len(batches) == 1
+    assert len({timestamp for _, timestamp in items}) == 12
+    prophecy, timestamp = items[0]
+    assert generator.near_handler.get_prophecy(timestamp)["text"] == prophecy
+    assert generator.context.get(timestamp)["prophecy"] == prophecy
+
+
+def test_generate_prophecies_keeps_successful_requests(generator, monkeypatch):
+    monkeypatch.setattr("prophecy_generator.PROPHECY_BATCH_CHOICES", 2)
+    generator.completions.fail_every = 2
+
+    items = generator.generate_prophecies(None, 6)
+
+    assert len(items) == 4
+
+
+class StubStream:
+    """Async iterator of chat completion chunks carrying `pieces`"""
+
+    def __init__(self, pieces):
+        self.pieces = list(pieces)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.pieces:
+            raise StopAsyncIteration
+        delta = SimpleNamespace(content=self.pieces.pop(0))
+        return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def test_streamed_prophecy_is_stored_after_the_stream_completes(generator, monkeypatch):
+    requests = []
+
+    async def create(**kwargs):
+        requests.append(kwargs)
+        return StubStream(["The ", "DAO ", None, "awakens "])
+
+    generator.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    stored = []
+    monkeypatch.setattr(generator, "_store_prophecy", lambda prophecy, timestamp: stored.append(prophecy))
+    partials = []
+
+    async def on_partial(text):
+        partials.append((text, list(stored)))
+
+    prophecy, _ = asyncio.run(generator.generate_prophecy_async("dao", on_partial=on_partial))
+
+    assert requests[0]["stream"] is True
+    assert prophecy == "The DAO awakens"
+    assert [text for text, _ in partials] == ["The ", "The DAO ", "The DAO awakens "]
+    assert all(not stored_then for _, stored_then in partials)
+    assert stored == ["The DAO awakens"]
+
+
+def test_async_generation_overlaps_and_stores_off_the_loop(generator, monkeypatch):
+    # A fresh quota, so requests made by earlier tests cannot serialize these
+    monkeypatch.setitem(governor.backends, "openai", Backend("openai", rate=100, burst=4, concurrency=4))
+    in_flight, peak = 0, 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="The DAO awakens"))])
+
+    generator.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    store_threads = []
+    monkeypatch.setattr(generator, "_store_prophecy", lambda prophecy, timestamp: store_threads.append(threading.get_ident()))
+
+    async def generate_many():
+        return await asyncio.gather(*(generator.generate_prophecy_async("dao") for _ in range(4)))
+
+    results = asyncio.run(generate_many())
+
+    assert [prophecy for prophecy, _ in results] == ["The DAO awakens"] * 4
+    assert len({timestamp for _, timestamp in results}) == 4
+    assert peak == 4
+    assert len(store_threads) == 4 and threading.get_ident() not in store_threads
+
+
+def test_near_duplicates_are_regenerated_up_to_the_cap(generator, monkeypatch):
+    monkeypatch.setattr("prophecy_generator.DEDUP_ENABLED", True)
+    monkeypatch.setattr("prophecy_generator.DEDUP_MAX_RETRIES", 2)
+    repeat = "The liquidity pools shall overflow when the moon of Ethereum eclipses the sun of Bitcoin."
+    generator.near_handler.store_prophecy(repeat, 1)
+    replies = iter([repeat + "!", repeat.replace("shall", "will"), "A DAO of whispering validators burns its treasury."])
+    monkeypatch.setattr(generator, "_request_prophecy", lambda theme=None: next(replies))
+
+    prophecy, _ = generator.generate_prophecy("defi")
+    assert prophecy.startswith("A DAO")
+
+    # Once the cap is reached the last attempt is kept
+    replies = iter([repeat, repeat, repeat])
+    prophecy, timestamp = generator.generate_prophecy("defi")
+    assert prophecy == repeat
+    assert generator.near_handler.get_prophecy(timestamp)["text"] == repeat
+
+
+def test_unstored_prophecies_are_not_indexed_as_duplicates(generator, monkeypatch):
+    monkeypatch.setattr("prophecy_generator.DEDUP_ENABLED", True)
+    omen = "The liquidity pools shall overflow when the moon of Ethereum eclipses the sun of Bitcoin."
+    other = "A DAO of whispering validators burns its treasury at the stroke of the halving."
+    handler = generator.near_handler
+    store_prophecy, store_prophecies = handler.store_prophecy, handler.store_prophecies
+    monkeypatch.setattr(handler, "store_prophecy", lambda prophecy, timestamp: False)
+    monkeypatch.setattr(handler, "store_prophecies", lambda items: False)
+    monkeypatch.setattr(generator, "_request_prophecy", lambda theme=None: omen)
+    monkeypatch.setattr(generator, "_request_prophecies", lambda theme, count: [other, other + "!"])
+
+    generator.generate_prophecy("defi")
+    # The batch still drops its own repeats without indexing them
+    assert [text for text, _ in generator.generate_prophecies(None, 2)] == [other]
+    assert len(generator._duplicate_index()) == 0
+
+    monkeypatch.setattr(handler, "store_prophecy", store_prophecy)
+    monkeypatch.setattr(handler, "store_prophecies", store_prophecies)
+    prophecy, timestamp = generator.generate_prophecy("defi")
+    assert prophecy == omen
+    assert generator._find_duplicate(omen)[0] == f"prophecy_{timestamp}"
+    generator.generate_prophecies(None, 2)
+    assert generator._find_duplicate(other) is not None
+
+
+@pytest.mark.parametrize("count", [0, -1])
+def test_generate_prophecies_rejects_non_positive_counts(generator, count):
+    with pytest.raises(ValueError):
+        generator.generate_prophecies(None, count)
+    assert generator.completions.requests == []
+
+
+def test_insight_cache_counts_each_lookup_once(generator):
+    generator._remember("The DAO awakens", None, 42)
+
+    generator.get_insight(42)
+    generator.get_insight(42)
+
+    stats = generator.insight_stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert len(generator.completions.requests) == 1
@@ -0,0 +1,49 @@
+from prophecy_pool import ProphecyPool
+from prophecy_store import ProphecyStore
+
+
+def _pool(tmp_path, fetched):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+
+    def fetch(theme, count):
+        prophecies = []
+        for _ in range(count):
+            fetched.append(theme)
+            prophecies.append(f"{theme} prophecy {len(fetched)}")
+        return prophecies
+
+    return ProphecyPool(store, fetch, ["defi", "general"], size=3, low_water=2)
+
+
+def test_refill_tops_up_each_theme_and_take_is_fifo(tmp_path):
+    fetched = []
+    pool = _pool(tmp_path, fetched)
+
+    assert pool.refill() == 6
+    assert pool.levels() == {"defi": 3, "general": 3}
+    assert pool.take("defi") == "defi prophecy 1"
+    assert pool.refill() == 1
+
+
+def test_pool_survives_restart(tmp_path):
+    pool = _pool(tmp_path, [])
+    pool.refill()
+    pool.take("general")
+
+    restarted = _pool(tmp_path, [])
+    assert restarted.levels() == {"defi": 3, "general": 2}
+    assert restarted.take("general") == "general prophecy 5"
+
+
+def test_one_process_refills_at_a_time(tmp_path):
+    fetched = []
+    first = _pool(tmp_path, fetched)
+    second = _pool(tmp_path, fetched)
+
+    assert first.store.acquire_lease("prophecy-pool", first.owner, 60)
+    assert second.refill() is None
+    assert fetched == []
+
+    first.store.release_lease("prophecy-pool", first.owner)
+    assert second.refill() == 6
+    assert first.refill() == 0
@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+from prophecy_store import ProphecyStore
+
+
+def _record(text, timestamp):
+    return {"text": text, "timestamp": timestamp, "created_at": f"2025-03-02T12:00:{timestamp:02d}"}
+
+
+def test_put_and_get(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put("prophecy_1", _record("The chain remembers", 1))
+    store.put("prophecy_1", _record("The chain forgets", 1))
+
+    assert store.get("prophecy_1")["text"] == "The chain forgets"
+    assert store.get("prophecy_missing") is None
+    assert store.count() == 1
+
+
+def test_latest_orders_by_created_at(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many([(f"prophecy_{i}", _record(f"text {i}", i)) for i in (3, 1, 2)])
+
+    assert [p["timestamp"] for p in store.latest(2)] == [3, 2]
+
+
+def test_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / "prophecies.json"
+    legacy.write_text(json.dumps({"prophecy_7": _record("Old wisdom", 7)}))
+
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=str(legacy))
+    assert store.get("prophecy_7")["text"] == "Old wisdom"
+    assert not legacy.exists()
+    assert os.path.exists(str(legacy) + ".migrated")
+
+    # A second file at the same path is not re-imported
+    legacy.write_text(json.dumps({"prophecy_8": _record("Ignored", 8)}))
+    ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=str(legacy))
+    assert store.get("prophecy_8") is None
+
+
+def test_concurrent_writers_do_not_lose_data(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.checkpoint_interval = 10
+
+    def writer(offset):
+        for i in range(50):
+            store.put(f"prophecy_{offset + i}", _record("concurrent", i % 60))
+
+    threads = [threading.Thread(target=writer, args=(n * 1000,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert store.count() == 200
+
+
+def test_latest_page_walks_every_record_once(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many([(f"prophecy_{i}", _record(f"text {i}", i)) for i in range(5)])
+
+    first = store.latest_page(2)
+    second = store.latest_page(2, (first[-1][1]["created_at"], first[-1][0]))
+    assert [pid for pid, _ in first] == ["prophecy_4", "prophecy_3"]
+    assert [pid for pid, _ in second] == ["prophecy_2", "prophecy_1"]
+
+
+def test_search_ranks_by_bm25_and_follows_updates(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many([
+        ("prophecy_1", _record("Liquidity floods the bridges", 1)),
+        ("prophecy_2", _record("Liquidity, liquidity everywhere; the pools overflow with liquidity", 2)),
+        ("prophecy_3", _record("Validators dream of gas", 3)),
+    ])
+
+    assert [r["id"] for r in store.search("liquidity")] == ["prophecy_2", "prophecy_1"]
+    # Porter stemming, and every word must match
+    assert [r["id"] for r in store.search("bridge LIQUIDITY")] == ["prophecy_1"]
+    assert store.search('"AND NEAR(*') == []
+
+    store.put("prophecy_1", _record("The bridges stand empty", 1))
+    assert [r["id"] for r in store.search("liquidity")] == ["prophecy_2"]
+
+    store.index_documents([("prophecy_9", "Liquidity written on chain", "2025-03-02T12:00:09")])
+    assert store.search("chain")[0]["id"] == "prophecy_9"
+    assert store.rebuild_search_index() == 3
+    assert store.search("chain") == []
+    assert store.search_count() == 3
+
+
+def test_allocate_timestamp_is_unique_across_store_handles(tmp_path):
+    path = str(tmp_path / "p.db")
+    stores = [ProphecyStore(path=path, legacy_json_path=None) for _ in range(4)]
+    allocated = []
+
+    def allocate(store):
+        for _ in range(50):
+            allocated.append(store.allocate_timestamp(1000))
+
+    threads = [threading.Thread(target=allocate, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(allocated) == list(range(1000, 1200))
+    assert stores[0].allocate_timestamp(5000) == 5000
+
+
+def test_sessions_are_shared_and_expire(tmp_path):
+    path = str(tmp_path / "p.db")
+    writer = ProphecyStore(path=path, legacy_json_path=None)
+    reader = ProphecyStore(path=path, legacy_json_path=None)
+    writer.put_sessions([(None, 10, 20, 1001), (None, 10, None, 1001)])
+
+    assert reader.get_session(None, 10, 20) == 1001
+    assert reader.get_session(None, 10, None) == 1001
+    assert reader.get_session(None, 10, 21) is None
+    assert reader.get_session(None, 10, 20, max_age=-1) is None
+    assert reader.prune_sessions(-1) == 2
+
+
+def test_archived_records_queue_for_sync_until_confirmed(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many([(f"prophecy_{i}", _record(f"text {i}", i)) for i in (1, 2, 3)])
+    store.put("prophecy_1", _record("text one", 1))
+
+    assert store.outbox_count() == 3
+    store.mark_sync_failed(["prophecy_1"])
+    assert store.outbox_page(10) == [("prophecy_2", "text 2"), ("prophecy_3", "text 3"), ("prophecy_1", "text one")]
+    assert store.mark_synced(["prophecy_2", "prophecy_9"]) == 1
+    store.delete_many(["prophecy_3"])
+    assert store.outbox_page(10) == [("prophecy_1", "text one")]
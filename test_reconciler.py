@@ -0,0 +1,86 @@
+from prophecy_store import ProphecyStore
+from reconciler import ChainReconciler, range_digest
+
+
+class FakeChain:
+    """NEARHandler stand-in whose contract is a dict, counting view calls and uploads"""
+
+    def __init__(self, store, fail_uploads_after=None):
+        self.store = store
+        self.blockchain_enabled = True
+        self.prophecies = {}
+        self.digest_calls = 0
+        self.uploads = []
+        self.fail_uploads_after = fail_uploads_after
+
+    def chain_digest(self, prophecy_ids):
+        self.digest_calls += 1
+        stored = [(pid, self.prophecies[pid]) for pid in prophecy_ids if pid in self.prophecies]
+        return {"found": len(stored), "digest": range_digest(stored)}
+
+    def upload_prophecies(self, entries):
+        if self.fail_uploads_after is not None and len(self.uploads) >= self.fail_uploads_after:
+            return False
+        self.uploads.append(list(entries))
+        self.prophecies.update(entries)
+        return True
+
+
+def _archive(tmp_path, count):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    store.put_many(
+        (f"prophecy_{i}", {"text": f"Omen number {i}", "timestamp": i, "created_at": f"2025-03-02T12:{i:06d}"})
+        for i in range(count)
+    )
+    return store
+
+
+def test_uploads_only_what_the_chain_lacks(tmp_path):
+    store = _archive(tmp_path, 1000)
+    chain = FakeChain(store)
+    missing = {17, 404, 405, 998}
+    chain.prophecies = {f"prophecy_{i}": f"Omen number {i}" for i in range(1000) if i not in missing}
+    chain.prophecies["prophecy_500"] = "A different omen"
+    sleeps = []
+    reconciler = ChainReconciler(chain, digest_range=256, batch_size=8, batch_delay=0.5, sleep=sleeps.append)
+
+    stats = reconciler.sync_once()
+
+    assert stats == {"already_synced": 995, "uploaded": 5, "failed": 0, "remaining": 0}
+    uploaded = {pid for batch in chain.uploads for pid, _ in batch}
+    assert uploaded == {f"prophecy_{i}" for i in missing | {500}}
+    assert chain.prophecies["prophecy_500"] == "Omen number 500"
+    # Four ranges, bisected only where they differ, instead of a call per record
+    assert chain.digest_calls < 80
+    assert sleeps and set(sleeps) == {0.5}
+
+    # Nothing is rescanned once the outbox is empty
+    calls = chain.digest_calls
+    assert reconciler.sync_once()["remaining"] == 0
+    assert chain.digest_calls == calls
+
+
+def test_failed_upload_resumes_on_the_next_pass(tmp_path):
+    store = _archive(tmp_path, 50)
+    chain = FakeChain(store, fail_uploads_after=2)
+    reconciler = ChainReconciler(chain, digest_range=20, batch_size=5, batch_delay=0, sleep=lambda seconds: None)
+
+    stats = reconciler.sync_once()
+    assert (stats["uploaded"], stats["failed"], stats["remaining"]) == (10, 5, 40)
+
+    chain.fail_uploads_after = None
+    stats = reconciler.sync_once()
+    assert (stats["uploaded"], stats["remaining"]) == (40, 0)
+    assert len(chain.prophecies) == 50
+
+
+def test_lease_keeps_a_second_reconciler_out(tmp_path):
+    store = _archive(tmp_path, 10)
+    chain = FakeChain(store)
+    first = ChainReconciler(chain, sleep=lambda seconds: None)
+    second = ChainReconciler(chain, sleep=lambda seconds: None)
+
+    assert store.acquire_lease("near-reconciler", first.owner, 60)
+    assert second.sync_once()["uploaded"] == 0
+    store.release_lease("near-reconciler", first.owner)
+    assert second.sync_once()["uploaded"] == 10
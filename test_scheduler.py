@@ -0,0 +1,142 @@
+import asyncio
+from scheduler import LAST_RUN_KEY, PostingScheduler
+
+HOUR = 60 * 60
+
+
+class FakeClock:
+    """Wall clock that only moves when the scheduler sleeps"""
+
+    def __init__(self, now):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await asyncio.sleep(0)
+
+
+class MemoryMeta:
+    def __init__(self, **values):
+        self.values = dict(values)
+
+    def get_meta(self, key, default=None):
+        return self.values.get(key, default)
+
+    def set_meta(self, key, value):
+        self.values[key] = str(value)
+
+
+class StubSink:
+    def __init__(self, failures=0, delay=0):
+        self.failures = failures
+        self.delay = delay
+        self.posted = []
+
+    async def __call__(self, prophecy):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("503 Service Unavailable")
+        self.posted.append(prophecy)
+
+
+def _scheduler(clock, store, sinks, **kwargs):
+    count = iter(range(1, 100))
+
+    async def generate():
+        return f"prophecy {next(count)}"
+
+    return PostingScheduler(
+        generate, sinks, 4 * HOUR, store,
+        clock=clock, sleep=clock.sleep, rng=lambda: 0.5, **kwargs
+    )
+
+
+def test_catches_up_once_after_downtime_then_keeps_interval():
+    clock = FakeClock(now=100 * HOUR)
+    store = MemoryMeta(**{LAST_RUN_KEY: str(90 * HOUR)})
+    sink = StubSink()
+    scheduler = _scheduler(clock, store, {"discord": sink}, jitter=0.1)
+
+    asyncio.run(scheduler.run(max_ticks=2))
+
+    # Overdue by six hours: one immediate post (plus jitter), then a full interval
+    assert clock.sleeps == [0.2 * HOUR, 4.2 * HOUR]
+    assert sink.posted == ["prophecy 1", "prophecy 2"]
+    assert float(store.values[LAST_RUN_KEY]) == 104.4 * HOUR
+
+
+def test_slow_sink_times_out_without_delaying_others():
+    clock = FakeClock(now=0)
+    discord, twitter = StubSink(), StubSink(delay=5)
+    scheduler = _scheduler(clock, MemoryMeta(), {"discord": discord, "twitter": twitter},
+                           sink_timeout=0.05, retries=1)
+
+    results = asyncio.run(asyncio.wait_for(scheduler.tick(), 1))
+
+    assert results == {"discord": True, "twitter": False}
+    assert discord.posted == ["prophecy 1"]
+
+
+def test_timed_out_posts_are_not_retried():
+    clock = FakeClock(now=0)
+    sink = StubSink(delay=5)
+    scheduler = _scheduler(clock, MemoryMeta(), {"twitter": sink}, sink_timeout=0.05, retries=3)
+
+    assert asyncio.run(asyncio.wait_for(scheduler.tick(), 1)) == {"twitter": False}
+    assert clock.sleeps == []
+
+
+def test_failed_posts_are_retried_with_backoff():
+    clock = FakeClock(now=0)
+    sink = StubSink(failures=2)
+    scheduler = _scheduler(clock, MemoryMeta(), {"twitter": sink}, retries=3, backoff=2.0)
+
+    assert asyncio.run(scheduler.tick()) == {"twitter": True}
+    assert clock.sleeps == [1.0, 2.0]
+
+
+def test_run_stays_due_when_every_sink_fails():
+    clock = FakeClock(now=100 * HOUR)
+    store = MemoryMeta(**{LAST_RUN_KEY: str(90 * HOUR)})
+    sink = StubSink(failures=3)
+    scheduler = _scheduler(clock, store, {"discord": sink}, jitter=0, retries=3, backoff=1.0, failure_delay=60)
+
+    asyncio.run(scheduler.run(max_ticks=2))
+
+    # The failed post keeps the old marker, so the retry goes out after the failure delay, not an interval
+    assert clock.sleeps == [0, 1.0, 1.0, 60, 0]
+    assert sink.posted == ["prophecy 2"]
+    assert float(store.values[LAST_RUN_KEY]) == 100 * HOUR + 62
+
+
+class FlakyMeta(MemoryMeta):
+    """Meta store whose first read fails, as a locked SQLite database would"""
+
+    def __init__(self, **values):
+        super().__init__(**values)
+        self.failures = 1
+
+    def get_meta(self, key, default=None):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        return super().get_meta(key, default)
+
+
+def test_store_errors_do_not_stop_the_scheduler():
+    clock = FakeClock(now=100 * HOUR)
+    sink = StubSink()
+    scheduler = _scheduler(clock, FlakyMeta(**{LAST_RUN_KEY: str(90 * HOUR)}), {"discord": sink},
+                           jitter=0, failure_delay=60)
+
+    asyncio.run(scheduler.run(max_ticks=2))
+
+    assert clock.sleeps == [60, 0]
+    assert sink.posted == ["prophecy 1"]
@@ -0,0 +1,17 @@
+from prophecy_store import ProphecyStore
+from session_state import SharedSessionStore
+
+
+def test_shared_sessions_see_channel_prophecies_from_other_workers(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    first = SharedSessionStore(store, max_size=100)
+    second = SharedSessionStore(store, max_size=100)
+
+    first.record(1, 10, 7, 100)
+    assert second.lookup(1, 10, 8) == 100
+
+    # A newer channel prophecy from the other worker replaces the channel's latest
+    second.record_channel(1, 10, 200)
+    assert first.lookup(1, 10, 8) == 200
+    # while a user's own session still takes precedence
+    assert first.lookup(1, 10, 7) == 100
@@ -0,0 +1,180 @@
+import asyncio
+import os
+import signal
+import sqlite3
+import time
+from types import SimpleNamespace
+import pytest
+from prophecy_store import ProphecyStore
+from shards import ShardSupervisor, plan_shards, shard_for
+
+
+def test_plan_shards_splits_contiguous_groups():
+    assert plan_shards(8, 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert plan_shards(2, 4) == [[0], [1]]
+    assert plan_shards(1, 0) == [[0]]
+    assert shard_for(3 << 22, 4) == 3
+    assert shard_for((5 << 22) + 12345, 4) == 1
+
+
+class FakeGateway:
+    """Stands in for Discord's gateway: a SQLite file every process can reach.
+
+    The test dispatches events to shards, workers claim the events for their
+    shards and record what the bot sends back. SQLite rather than a
+    multiprocessing queue so a SIGKILLed worker cannot leave a lock held.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "CREATE TABLE IF NOT EXISTS connections (worker INTEGER, pid INTEGER, shards TEXT);"
+            "CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, shard INTEGER, guild INTEGER,"
+            " channel INTEGER, user INTEGER, content TEXT, taken_by INTEGER);"
+            "CREATE TABLE IF NOT EXISTS replies (event INTEGER, pid INTEGER, shard INTEGER, text TEXT);"
+        )
+
+    def connect(self, worker_index, shard_ids):
+        self.conn.execute(
+            "INSERT INTO connections VALUES (?, ?, ?)",
+            (worker_index, os.getpid(), ",".join(map(str, shard_ids)))
+        )
+
+    def connections(self):
+        return self.conn.execute("SELECT worker, pid, shards FROM connections ORDER BY rowid").fetchall()
+
+    def dispatch(self, guild, channel, user, content, shard_count):
+        return self.conn.execute(
+            "INSERT INTO events (shard, guild, channel, user, content) VALUES (?, ?, ?, ?, ?)",
+            (shard_for(guild, shard_count), guild, channel, user, content)
+        ).lastrowid
+
+    def take(self, shard_ids):
+        marks = ",".join("?" * len(shard_ids))
+        return self.conn.execute(
+            "UPDATE events SET taken_by = ? WHERE id = (SELECT min(id) FROM events"
+            f" WHERE taken_by IS NULL AND shard IN ({marks})) RETURNING id, shard, guild, channel, user, content",
+            (os.getpid(), *shard_ids)
+        ).fetchone()
+
+    def reply(self, event, shard, text):
+        self.conn.execute("INSERT INTO replies VALUES (?, ?, ?, ?)", (event, os.getpid(), shard, text))
+
+    def replies(self, event):
+        return self.conn.execute("SELECT pid, shard, text FROM replies WHERE event = ?", (event,)).fetchall()
+
+
+class FakeChannel:
+    def __init__(self, gateway, event, shard, channel_id):
+        self.gateway = gateway
+        self.event = event
+        self.shard = shard
+        self.id = channel_id
+
+    async def send(self, content=None, embed=None):
+        self.gateway.reply(self.event, self.shard, embed.description if embed else content)
+
+
+def _stub_openai():
+    count = 0
+
+    async def create(**kwargs):
+        nonlocal count
+        count += 1
+        text = f"Vision {count} from worker pid {os.getpid()}"
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=None)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+async def _serve_fake_gateway(shard_ids, shard_count, worker_index, gateway_path):
+    from discord_handler import ShardedProphetBot
+    bot = ShardedProphetBot(shard_ids, shard_count, worker_index)
+    bot.prophecy_generator.async_client = _stub_openai()
+    gateway = FakeGateway(gateway_path)
+    gateway.connect(worker_index, shard_ids)
+    while True:
+        event = gateway.take(shard_ids)
+        if event is None:
+            await asyncio.sleep(0.02)
+            continue
+        event_id, shard, guild, channel, user, content = event
+        await bot.on_message(SimpleNamespace(
+            content=content,
+            author=SimpleNamespace(id=user),
+            guild=SimpleNamespace(id=guild),
+            channel=FakeChannel(gateway, event_id, shard, channel)
+        ))
+
+
+def fake_gateway_worker(shard_ids, shard_count, worker_index, gateway_path):
+    """Supervisor target: a real ShardedProphetBot fed by the fake gateway"""
+    asyncio.run(_serve_fake_gateway(shard_ids, shard_count, worker_index, gateway_path))
+
+
+def _wait_for(supervisor, condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        supervisor.check()
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise AssertionError("timed out waiting for the shard workers")
+
+
+@pytest.fixture
+def worker_env(tmp_path, monkeypatch):
+    # Spawned workers inherit the environment and working directory
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("FORCE_LOCAL_STORAGE", "true")
+    monkeypatch.setenv("PROPHECY_DB_PATH", str(tmp_path / "prophecies.db"))
+    monkeypatch.setenv("DISCORD_CHANNEL_IDS", "all")
+    monkeypatch.setenv("STREAM_RESPONSES", "false")
+    monkeypatch.setenv("DEDUP_ENABLED", "false")
+    monkeypatch.setenv("BOT_METRICS_PORT", "0")
+    monkeypatch.setenv("SCHEDULED_POSTING_ENABLED", "false")
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    return tmp_path
+
+
+def test_crashed_worker_restarts_its_shards_and_keeps_sessions(worker_env):
+    gateway = FakeGateway(str(worker_env / "gateway.db"))
+    supervisor = ShardSupervisor(
+        fake_gateway_worker, shard_count=4, workers=2, args=(gateway.path,),
+        identify_interval=0, restart_delay=0.1
+    )
+    guild, channel, user = 3 << 22, 100, 7
+    try:
+        supervisor.start()
+        _wait_for(supervisor, lambda: len(gateway.connections()) == 2)
+        first_pids = supervisor.pids()
+
+        event = gateway.dispatch(guild, channel, user, "!prophecy", 4)
+        [(pid, shard, prophecy)] = _wait_for(supervisor, lambda: gateway.replies(event))
+        assert (pid, shard) == (first_pids[1], 3)
+        assert prophecy.startswith("Vision")
+
+        os.kill(pid, signal.SIGKILL)
+        _wait_for(supervisor, lambda: len(gateway.connections()) == 3)
+        worker, new_pid, shards = gateway.connections()[-1]
+        assert (worker, shards) == (1, "2,3")
+        assert supervisor.pids() == [first_pids[0], new_pid]
+        assert supervisor.restarts == [0, 1]
+
+        # The restarted worker finds the session in the shared store
+        event = gateway.dispatch(guild, channel, user, "!insight", 4)
+        [(pid, _, insight)] = _wait_for(supervisor, lambda: gateway.replies(event))
+        assert pid == new_pid
+        assert insight == f"Vision 1 from worker pid {new_pid}"
+
+        # Shards on the surviving worker were never interrupted
+        event = gateway.dispatch(0, channel, user, "!search vision", 4)
+        [(pid, _, _)] = _wait_for(supervisor, lambda: gateway.replies(event))
+        assert pid == first_pids[0]
+    finally:
+        supervisor.stop()
+
+    assert ProphecyStore(path=str(worker_env / "prophecies.db"), legacy_json_path=None).count() == 1
@@ -0,0 +1,135 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+import pytest
+import web_app
+from prophecy_store import ProphecyStore
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    for i in range(5):
+        store.put(f"prophecy_{i}", {
+            "text": f"Prophecy {i}", "timestamp": i, "created_at": f"2025-03-02T12:00:0{i}"
+        })
+    monkeypatch.setattr(web_app, "store", store)
+    monkeypatch.setattr(web_app, "recent_prophecies", web_app.RecentProphecies(store))
+    web_app.app.config["TESTING"] = True
+    return web_app.app.test_client()
+
+
+def test_index_revalidates_with_etag(client):
+    first = client.get("/")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+
+    web_app.store.put("prophecy_9", {"text": "New", "timestamp": 9, "created_at": "2025-03-02T12:00:09"})
+    assert client.get("/", headers={"If-None-Match": first.headers["ETag"]}).status_code == 200
+
+
+def test_deleting_a_shown_prophecy_changes_the_etag(client):
+    first = client.get("/")
+    assert "Prophecy 2" in first.get_data(as_text=True)
+
+    web_app.store.delete_many(["prophecy_2"])
+    fresh = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+    assert fresh.status_code == 200
+    assert "Prophecy 2" not in fresh.get_data(as_text=True)
+    assert fresh.headers["ETag"] != first.headers["ETag"]
+
+
+def test_fingerprinted_assets_are_cached_for_a_year(client):
+    page = client.get("/").get_data(as_text=True)
+    with web_app.app.test_request_context():
+        url = web_app.asset_url("style.css")
+    assert url in page and "?v=" in url
+
+    response = client.get(url)
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "max-age=31536000" in response.headers["Cache-Control"]
+    assert client.get("/static/style.css").headers["Cache-Control"] == "no-cache"
+
+
+def test_api_pages_with_cursor(client):
+    first = client.get("/api/prophecies?limit=3").get_json()
+    assert [p["id"] for p in first["prophecies"]] == ["prophecy_4", "prophecy_3", "prophecy_2"]
+
+    second = client.get(f"/api/prophecies?limit=3&cursor={first['next_cursor']}").get_json()
+    assert [p["id"] for p in second["prophecies"]] == ["prophecy_1", "prophecy_0"]
+    assert second["next_cursor"] is None
+    assert client.get("/api/prophecies?cursor=bogus").status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [[{}, []], ["2025-03-02T12:00:01", 7], [None, None], ["a", "b", "c"]])
+def test_api_rejects_malformed_cursor(client, cursor):
+    encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+    assert client.get(f"/api/prophecies?cursor={encoded}").status_code == 400
+
+
+def test_metrics_endpoint_reports_requests(client):
+    client.get("/api/prophecies")
+
+    response = client.get("/metrics")
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{endpoint="api_prophecies",status="200"}' in body
+    assert 'governor_queue_depth{backend="openai"} 0.0' in body
+
+
+def test_search_returns_ranked_matches(client):
+    web_app.store.put("prophecy_7", {
+        "text": "Whales circle the mempool", "timestamp": 7, "created_at": "2025-03-02T12:00:07"
+    })
+
+    body = client.get("/search?q=whale").get_json()
+    assert [r["id"] for r in body["results"]] == ["prophecy_7"]
+    assert body["next_offset"] is None
+    assert client.get("/search").status_code == 400
+
+
+def test_static_assets_are_prepared_on_first_request(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(web_app, "ensure_static_assets", lambda: calls.append(1))
+    monkeypatch.setattr(web_app, "_assets_ready", web_app.threading.Event())
+
+    client.get("/api/prophecies")
+    client.get("/api/prophecies")
+
+    assert calls == [1]
+
+
+def test_recent_prophecies_requery_only_after_a_write(tmp_path):
+    store = ProphecyStore(path=str(tmp_path / "p.db"), legacy_json_path=None)
+    for i in range(5):
+        store.put(f"prophecy_{i}", {"text": f"Prophecy {i}", "timestamp": i, "created_at": f"2025-03-02T12:00:0{i}"})
+    recent = web_app.RecentProphecies(store, limit=3)
+    statements = []
+    recent._conn.set_trace_callback(statements.append)
+
+    assert recent.get() == [
+        {"text": f"Prophecy {i}", "created_at": f"2025-03-02 12:00:0{i}"} for i in (4, 3, 2)
+    ]
+    recent.get()
+    assert sum(statement.startswith("SELECT") for statement in statements) == 1
+
+    store.put("prophecy_9", {"text": "Prophecy 9", "timestamp": 9, "created_at": "2025-03-02T12:00:09"})
+    assert [row["text"] for row in recent.get()] == ["Prophecy 9", "Prophecy 4", "Prophecy 3"]
+    assert sum(statement.startswith("SELECT") for statement in statements) == 2
+
+
+def test_import_leaves_the_working_directory_alone(tmp_path):
+    (tmp_path / "prophecies.json").write_text(json.dumps({"prophecy_1": {"text": "Kept", "timestamp": 1}}))
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", "import web_app"], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60)
+
+    assert result.returncode == 0, result.stderr
+    assert sorted(path.name for path in tmp_path.iterdir() if path.name.startswith("prophecies")) == ["prophecies.json"]
@@ -5,6 +5,7 @@ from config import (
     TWITTER_ACCESS_TOKEN,
     TWITTER_ACCESS_TOKEN_SECRET
 )
+from governor import governor
 from logger import logger
 
 class TwitterHandler:
@@ -30,7 +31,7 @@ class TwitterHandler:
                 content = content[:277] + "..."
 
             # Post tweet using v2 endpoint
-            response = self.client.create_tweet(text=content)
+            response = governor.call("twitter", self.client.create_tweet, text=content)
 
             if not response or not response.data:
                 raise Exception("No response data received from Twitter API")
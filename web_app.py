@@ -1,27 +1,167 @@
-from flask import Flask, render_template, send_from_directory
+from flask import Flask, g, jsonify, render_template, request, send_from_directory, url_for
+from datetime import datetime, timezone
+import base64
+import hashlib
 import json
-from datetime import datetime
 import os
+import shutil
+import sqlite3
+import threading
+import time
+import metrics
+from config import SEARCH_MAX_RESULTS
+from prophecy_store import ProphecyStore
+
+# Fingerprinted asset URLs never change content, so browsers may keep them for a year
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
 
 app = Flask(__name__)
+# Opened on first use, so importing this module (tests, benchmarks, the gunicorn
+# master) never creates or migrates an archive in the working directory. Tests
+# and benchmarks assign their own.
+store = None
+recent_prophecies = None
+_store_lock = threading.Lock()
 
-def load_prophecies():
-    try:
-        with open('prophecies.json', 'r') as f:
-            prophecies = json.load(f)
-            # Convert the dictionary to a list of prophecies with timestamps
-            prophecy_list = [
-                {
-                    'text': p['text'],
-                    'created_at': datetime.fromisoformat(p['created_at']).strftime('%Y-%m-%d %H:%M:%S')
-                }
-                for p in prophecies.values()
-            ]
-            # Sort by created_at in reverse order and take the latest 6
-            return sorted(prophecy_list, key=lambda x: x['created_at'], reverse=True)[:6]
-    except Exception as e:
-        print(f"Error loading prophecies: {e}")
-        return []
+
+def get_store():
+    """The prophecy store, opened on first use"""
+    global store
+    if store is None:
+        with _store_lock:
+            if store is None:
+                store = ProphecyStore()
+    return store
+
+
+def ensure_static_assets():
+    """Create the static directories and copy in the oracle image if it is missing"""
+    os.makedirs('static/js', exist_ok=True)
+    if not os.path.exists('static/goddessbot.jpg'):
+        shutil.copy('attached_assets/goddessbot.jpg', 'static/goddessbot.jpg')
+
+
+_assets_ready = threading.Event()
+_assets_lock = threading.Lock()
+
+
+class RecentProphecies:
+    """Cached, pre-formatted view of the newest prophecies.
+
+    The view holds at most `limit` display rows. It is invalidated through
+    SQLite's PRAGMA data_version, which changes whenever any other connection
+    (another thread or the bot process) commits to the store, so a page view
+    only costs one pragma until something new is written.
+    """
+
+    def __init__(self, store, limit=6):
+        self.store = store
+        self.limit = limit
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(store.path, timeout=30, check_same_thread=False)
+        self._version = None
+        self._rows = []
+        self._etag = None
+        self._last_modified = None
+
+    @staticmethod
+    def _format(prophecy):
+        return {
+            'text': prophecy['text'],
+            'created_at': datetime.fromisoformat(prophecy['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def snapshot(self):
+        """Return (rows, etag, last_modified) for the current newest prophecies.
+
+        The ETag hashes the id, created_at and text of every row shown, so a
+        deleted or edited prophecy changes it too, and every web worker derives
+        the same one from the same data.
+        """
+        with self._lock:
+            version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if version != self._version:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM prophecies ORDER BY created_at DESC LIMIT ?", (self.limit,)
+                ).fetchall()
+                prophecies = [json.loads(row[1]) for row in rows]
+                self._rows = [self._format(prophecy) for prophecy in prophecies]
+                shown = [(row[0], prophecy['created_at'], prophecy['text']) for row, prophecy in zip(rows, prophecies)]
+                self._etag = hashlib.sha1(json.dumps(shown).encode()).hexdigest()
+                # created_at is naive local time; HTTP dates are UTC
+                self._last_modified = (
+                    datetime.fromisoformat(prophecies[0]['created_at']).astimezone(timezone.utc)
+                    if rows else None
+                )
+                self._version = version
+            return list(self._rows), self._etag, self._last_modified
+
+    def get(self):
+        return self.snapshot()[0]
+
+
+def get_recent_prophecies():
+    """The index route's cached view of get_store(), built on first use"""
+    global recent_prophecies
+    if recent_prophecies is None:
+        prophecy_store = get_store()
+        with _store_lock:
+            if recent_prophecies is None:
+                recent_prophecies = RecentProphecies(prophecy_store)
+    return recent_prophecies
+
+_asset_hashes = {}
+
+@app.template_global()
+def asset_url(filename):
+    """Static URL carrying a hash of the file's content, e.g. /static/style.css?v=1a2b3c4d5e6f"""
+    path = os.path.join(app.static_folder, filename)
+    mtime = os.path.getmtime(path)
+    cached = _asset_hashes.get(filename)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            cached = (mtime, hashlib.sha256(f.read()).hexdigest()[:12])
+        _asset_hashes[filename] = cached
+    return url_for('static', filename=filename, v=cached[1])
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def prepare_static_assets():
+    # Once per process, on the first request rather than at import, so importing
+    # the app (tests, benchmarks, the gunicorn master) leaves static/ alone
+    if _assets_ready.is_set():
+        return
+    with _assets_lock:
+        if not _assets_ready.is_set():
+            ensure_static_assets()
+            _assets_ready.set()
+
+@app.after_request
+def record_request(response):
+    # Label by route rather than path so the number of series stays bounded
+    endpoint = request.endpoint or "unmatched"
+    started = g.get('request_started')
+    if started is not None:
+        metrics.http_request_seconds.observe(time.perf_counter() - started, endpoint=endpoint)
+    metrics.http_requests.inc(endpoint=endpoint, status=response.status_code)
+    return response
+
+@app.after_request
+def cache_static_assets(response):
+    if request.endpoint in ('static', 'serve_js') and response.status_code == 200:
+        if request.args.get('v'):
+            response.cache_control.public = True
+            response.cache_control.max_age = ASSET_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            # Unversioned URLs are revalidated against the ETag on every use
+            response.cache_control.no_cache = True
+    return response
 
 @app.route('/static/js/<path:filename>')
 def serve_js(filename):
@@ -33,17 +173,85 @@ def serve_js(filename):
 
 @app.route('/')
 def index():
-    prophecies = load_prophecies()
-    return render_template('index.html', prophecies=prophecies)
+    try:
+        prophecies, etag, last_modified = get_recent_prophecies().snapshot()
+    except Exception as e:
+        print(f"Error loading prophecies: {e}")
+        return render_template('index.html', prophecies=[])
 
-if __name__ == '__main__':
-    # Create necessary directories
-    os.makedirs('static/js', exist_ok=True)
+    # Answer revalidations without rendering the template
+    not_modified = request.if_none_match.contains(etag) if request.if_none_match else (
+        last_modified is not None and request.if_modified_since is not None
+        and last_modified.replace(microsecond=0) <= request.if_modified_since
+    )
+    response = app.response_class(status=304) if not_modified else app.make_response(
+        render_template('index.html', prophecies=prophecies)
+    )
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
 
-    # Copy the goddess bot image to static folder if needed
-    if not os.path.exists('static/goddessbot.jpg'):
-        import shutil
-        shutil.copy('attached_assets/goddessbot.jpg', 'static/goddessbot.jpg')
+def _encode_cursor(created_at, prophecy_id):
+    return base64.urlsafe_b64encode(json.dumps([created_at, prophecy_id]).encode()).decode()
+
+def _decode_cursor(cursor):
+    created_at, prophecy_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    # Anything else would only fail later, binding parameters in SQLite
+    if not isinstance(prophecy_id, str) or not (created_at is None or isinstance(created_at, str)):
+        raise ValueError("cursor must hold a created_at string (or null) and an id string")
+    return created_at, prophecy_id
+
+@app.route('/api/prophecies')
+def api_prophecies():
+    """Newest prophecies first; pass `next_cursor` back as `cursor` for the next page"""
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), API_MAX_PAGE_SIZE)
+    before = None
+    if request.args.get('cursor'):
+        try:
+            before = _decode_cursor(request.args['cursor'])
+        except (ValueError, TypeError):
+            return jsonify({"error": "invalid cursor"}), 400
+
+    page = get_store().latest_page(limit, before)
+    next_cursor = None
+    if len(page) == limit:
+        last_id, last = page[-1]
+        next_cursor = _encode_cursor(last.get('created_at'), last_id)
 
-    # Run the Flask app
+    return jsonify({
+        "prophecies": [
+            {
+                "id": prophecy_id,
+                "text": prophecy.get('text'),
+                "timestamp": prophecy.get('timestamp'),
+                "created_at": prophecy.get('created_at')
+            }
+            for prophecy_id, prophecy in page
+        ],
+        "next_cursor": next_cursor
+    })
+
+@app.route('/search')
+def search():
+    """Stored prophecies matching every word of `q`, best BM25 match first"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "missing query parameter q"}), 400
+    limit = min(max(request.args.get('limit', API_PAGE_SIZE, type=int), 1), SEARCH_MAX_RESULTS)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+
+    results = get_store().search(query, limit, offset)
+    return jsonify({
+        "query": query,
+        "results": results,
+        "next_offset": offset + limit if len(results) == limit else None
+    })
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return app.response_class(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+if __name__ == '__main__':
+    # Development server; production runs under gunicorn (see gunicorn.conf.py)
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file